@@ -0,0 +1,109 @@
+"""
+Point-in-time (as-of) alignment of the NAV inputs.
+
+The inputs run on different clocks: the PCF fund_date, the CBOE/Yahoo
+price_date, the MUFG FX date (no weekends/holidays) and the published NAV
+fund_date. These helpers pick, for each target date, the most recent record
+of an input dated on or before the target and no more than a tolerance
+older. They are built on pandas.merge_asof (a sorted merge), so aligning a
+single live run and years of history cost the same one pass.
+"""
+import pandas as pd
+from common import normalize_date_str
+
+# Default tolerances (calendar days a record may lag the target date)
+CHARACTERISTICS_TOLERANCE_DAYS = 7   # composition changes at most daily; allows for long holidays
+PRICE_TOLERANCE_DAYS = 0             # futures prices must be from the target date itself
+FX_TOLERANCE_DAYS = 4                # MUFG publishes no rates on weekends and JP holidays
+NAV_TOLERANCE_DAYS = 0               # published NAV is compared for the same fund date only
+
+def to_datetime(values):
+    """Convert a column of mixed date formats (20250227.0, 2025-02-27, 02/27/2025) to datetime64."""
+    values = values.astype(str)
+    mapping = {value: normalize_date_str(value) for value in values.unique()}
+    return pd.to_datetime(values.map(mapping), format="%Y-%m-%d", errors='coerce')
+
+def asof_join(targets, records, target_on='date', record_on='date', by=None, tolerance_days=0,
+              record_date_column=None):
+    """
+    Attach to each target row the most recent record dated on or before it, within a tolerance.
+
+    Args:
+        targets (pandas.DataFrame): Rows to align, one per target date (and `by` group)
+        records (pandas.DataFrame): Input records, at most one per record date (and `by` group);
+                                    other column names must not collide with targets
+        target_on (str): Date column of targets
+        record_on (str): Date column of records
+        by (list): Columns that must match exactly (e.g. ['source', 'vix_future'])
+        tolerance_days (int): Maximum age of a record relative to the target date
+        record_date_column (str): Output name for the matched record's date (YYYY-MM-DD);
+                                  None to drop it
+
+    Returns:
+        pandas.DataFrame: targets in their original order with the record columns added
+                          (NaN where no record qualifies)
+    """
+    by = list(by or [])
+    left = targets.copy()
+    left['_asof_date'] = to_datetime(left[target_on])
+    left['_asof_order'] = range(len(left))
+
+    right = records.copy()
+    right['_asof_date'] = to_datetime(right[record_on])
+    right = right.dropna(subset=['_asof_date'])
+    if record_date_column:
+        right[record_date_column] = right['_asof_date'].dt.strftime("%Y-%m-%d")
+
+    # merge_asof needs both sides sorted on the date key; targets without a date can't match
+    dated = left.dropna(subset=['_asof_date']).sort_values('_asof_date', kind='stable')
+    right = right.sort_values('_asof_date', kind='stable')
+
+    joined = pd.merge_asof(dated, right, on='_asof_date', by=by or None, direction='backward',
+                           tolerance=pd.Timedelta(days=tolerance_days))
+
+    undated = left[left['_asof_date'].isna()]
+    if not undated.empty:
+        joined = pd.concat([joined, undated], ignore_index=True)
+
+    joined = joined.sort_values('_asof_order', kind='stable').drop(columns=['_asof_date', '_asof_order'])
+    return joined.reset_index(drop=True)
+
+def select_asof(records, target_date, record_on='date', by=None, tolerance_days=0):
+    """
+    Return the records valid at one target date: per `by` group, the rows of the most
+    recent record date on or before target_date within the tolerance.
+
+    Args:
+        records (pandas.DataFrame): Input records (may hold several rows per date)
+        target_date: Target date (any format normalize_date_str understands)
+        record_on (str): Date column of records
+        by (list): Grouping columns (e.g. ['pair', 'label'])
+        tolerance_days (int): Maximum age of a record relative to target_date
+
+    Returns:
+        pandas.DataFrame: Selected rows (empty if nothing qualifies)
+    """
+    by = list(by or [])
+    if records is None or records.empty:
+        return records
+
+    dates = records[[record_on] + by].copy()
+    dates['_record_date'] = to_datetime(dates[record_on])
+    dates = dates.dropna(subset=['_record_date']).drop_duplicates(by + ['_record_date'])
+
+    if by:
+        targets = dates[by].drop_duplicates()
+    else:
+        targets = pd.DataFrame(index=[0])
+    targets['_target_date'] = normalize_date_str(target_date)
+
+    chosen = asof_join(targets, dates[by + ['_record_date']].assign(
+                           _record_key=dates['_record_date'].dt.strftime("%Y-%m-%d")),
+                       target_on='_target_date', record_on='_record_key', by=by,
+                       tolerance_days=tolerance_days)
+    chosen = chosen.dropna(subset=['_record_date'])
+
+    keyed = records.copy()
+    keyed['_record_date'] = to_datetime(keyed[record_on])
+    selected = keyed.merge(chosen[by + ['_record_date']], on=by + ['_record_date'])
+    return selected.drop(columns=['_record_date'])
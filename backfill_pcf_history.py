@@ -0,0 +1,241 @@
+import os
+import time
+import logging
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from common import setup_logging, SAVE_DIR, MissingCriticalDataError, InvalidDataError, SNAPSHOT_DATASETS, \
+    load_manifest, normalize_date_str, format_vix_data, write_master
+from pcf_reader import content_hash
+import columnar_store
+
+# Set up logging
+logger = setup_logging('pcf_backfill')
+
+ETF_MASTER = os.path.join(SAVE_DIR, "etf_characteristics_master.csv")
+VIX_MASTER = os.path.join(SAVE_DIR, "vix_futures_master.csv")
+
+def collect_pcf_files(save_dir=SAVE_DIR):
+    """
+    List every stored PCF snapshot: the pcf manifest plus any 318A-*.csv file it doesn't know.
+
+    Returns:
+        list: Dicts with timestamp, fund_date, path and sha256, ordered by timestamp
+    """
+    snapshots = {entry['timestamp']: dict(entry) for entry in load_manifest('pcf', save_dir)}
+
+    grammar = SNAPSHOT_DATASETS['pcf']
+    for name in os.listdir(save_dir):
+        match = grammar.match(name)
+        if match and match.group('timestamp') not in snapshots:
+            snapshots[match.group('timestamp')] = {
+                'timestamp': match.group('timestamp'),
+                'fund_date': normalize_date_str(match.group('fund_date')),
+                'path': os.path.join(save_dir, name)
+            }
+
+    files = [entry for entry in snapshots.values() if os.path.exists(entry['path'])]
+
+    # Hash anything the manifest didn't record a hash for, so identical copies are parsed once
+    for entry in files:
+        if not entry.get('sha256'):
+            with open(entry['path'], 'rb') as f:
+                entry['sha256'] = content_hash(f.read())
+
+    return sorted(files, key=lambda entry: entry['timestamp'])
+
+def _init_worker():
+    # Per-line parser logging from every worker would swamp the logs
+    logging.disable(logging.INFO)
+
+def _parse_pcf(path):
+    """Worker: parse one PCF file into ETF characteristics and PCF VIX prices."""
+    from etf_characteristics_parser import parse_etf_characteristics
+    from pcf_vix_extractor import extract_vix_futures_from_pcf
+
+    result = {'path': path, 'characteristics': None, 'futures': None, 'errors': []}
+    try:
+        result['characteristics'] = parse_etf_characteristics(path)
+    except Exception as e:
+        result['errors'].append(f"characteristics: {str(e)}")
+    try:
+        result['futures'] = extract_vix_futures_from_pcf(path)
+    except Exception as e:
+        result['errors'].append(f"vix futures: {str(e)}")
+    return result
+
+def parse_all(files, workers=None):
+    """
+    Parse the distinct contents of the given PCF files in a process pool.
+
+    Args:
+        files (list): Entries from collect_pcf_files()
+        workers (int): Number of worker processes (default: CPU count)
+
+    Returns:
+        dict: sha256 -> parse result
+    """
+    # One representative file per distinct content
+    unique = {}
+    for entry in files:
+        unique.setdefault(entry['sha256'], entry['path'])
+
+    workers = workers or os.cpu_count() or 1
+    shas = list(unique)
+    paths = [unique[sha] for sha in shas]
+    chunksize = max(1, len(paths) // (workers * 4))
+
+    logger.info(f"Parsing {len(paths)} distinct PCF files ({len(files)} snapshots) with {workers} workers")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        results = list(executor.map(_parse_pcf, paths, chunksize=chunksize))
+
+    return dict(zip(shas, results))
+
+def build_rows(files, results):
+    """
+    Expand parse results to one set of rows per snapshot, stamped with the snapshot's timestamp.
+
+    Returns:
+        tuple: (etf_characteristics DataFrame, PCF vix futures DataFrame, failed snapshot count)
+    """
+    characteristics_rows = []
+    futures_rows = []
+    failed = 0
+
+    for entry in files:
+        result = results[entry['sha256']]
+        if result['errors']:
+            failed += 1
+            logger.warning(f"{entry['path']} ({entry['timestamp']}): {'; '.join(result['errors'])}")
+
+        if result['characteristics']:
+            characteristics = dict(result['characteristics'])
+            characteristics['timestamp'] = entry['timestamp']
+            characteristics_rows.append(characteristics)
+
+        if result['futures']:
+            futures_data = dict(result['futures'])
+            futures_data['timestamp'] = entry['timestamp']
+            futures_rows.extend(format_vix_data(futures_data, "PCF"))
+
+    return pd.DataFrame(characteristics_rows), pd.DataFrame(futures_rows), failed
+
+def merge_into_master(new_df, master_path, date_column, source=None):
+    """
+    Merge backfilled rows into a master CSV, ordered by fund date.
+
+    Rows stored under the same timestamp (and source, when given) are replaced, so
+    running the backfill again leaves the master unchanged. Rows of one timestamp
+    stay together so the master index keeps one block per run.
+
+    Args:
+        new_df (pandas.DataFrame): Backfilled rows
+        master_path (str): Master CSV to merge into
+        date_column (str): Column holding the fund/price date
+        source (str): Only replace existing rows of this source (e.g. 'PCF')
+
+    Returns:
+        int: Number of rows in the merged master
+    """
+    new_df = new_df.copy()
+    new_df['timestamp'] = new_df['timestamp'].astype(str)
+
+    if os.path.exists(master_path):
+        master_df = pd.read_csv(master_path, dtype={'timestamp': str})
+        replaced = master_df['timestamp'].isin(set(new_df['timestamp']))
+        if source is not None:
+            replaced &= master_df['source'] == source
+        combined_df = pd.concat([master_df[~replaced], new_df], ignore_index=True)
+        combined_df = combined_df[master_df.columns.tolist() +
+                                  [col for col in new_df.columns if col not in master_df.columns]]
+    else:
+        combined_df = new_df
+
+    # Order runs by their fund date, then timestamp, keeping each run's rows in place
+    dates = combined_df[date_column].astype(str)
+    normalized = {value: normalize_date_str(value) or '' for value in dates.unique()}
+    run_date = dates.map(normalized).groupby(combined_df['timestamp']).transform('min')
+    order = pd.DataFrame({'run_date': run_date, 'timestamp': combined_df['timestamp']})
+    combined_df = combined_df.loc[order.sort_values(['run_date', 'timestamp'], kind='stable').index]
+
+    write_master(combined_df, master_path, key_column='timestamp')
+    return len(combined_df)
+
+def backfill(workers=None, characteristics=True, vix_futures=True, save_dir=SAVE_DIR):
+    """
+    Rebuild ETF characteristics and PCF VIX prices from every stored PCF file.
+
+    Args:
+        workers (int): Number of worker processes (default: CPU count)
+        characteristics (bool): Merge into etf_characteristics_master.csv
+        vix_futures (bool): Merge PCF prices into vix_futures_master.csv
+        save_dir (str): Data directory
+
+    Returns:
+        dict: Run statistics (files, distinct, failed, seconds, files_per_second)
+    """
+    start = time.perf_counter()
+
+    files = collect_pcf_files(save_dir)
+    if not files:
+        raise MissingCriticalDataError(f"No Simplex ETF 318A files found in {save_dir}.")
+
+    results = parse_all(files, workers)
+    parsed = time.perf_counter()
+
+    characteristics_df, futures_df, failed = build_rows(files, results)
+
+    if characteristics and not characteristics_df.empty:
+        master_path = os.path.join(save_dir, os.path.basename(ETF_MASTER))
+        rows = merge_into_master(characteristics_df, master_path, 'fund_date')
+        logger.info(f"Merged {len(characteristics_df)} rows into {master_path} ({rows} rows total)")
+
+    if vix_futures and not futures_df.empty:
+        master_path = os.path.join(save_dir, os.path.basename(VIX_MASTER))
+        rows = merge_into_master(futures_df, master_path, 'price_date', source='PCF')
+        logger.info(f"Merged {len(futures_df)} PCF price rows into {master_path} ({rows} rows total)")
+
+    # Refresh the columnar history store from the rebuilt masters (secondary copy)
+    if columnar_store.is_available():
+        for dataset, enabled in (('etf_characteristics', characteristics), ('vix_futures', vix_futures)):
+            if not enabled:
+                continue
+            try:
+                columnar_store.import_master(dataset, save_dir)
+            except Exception as e:
+                logger.warning(f"Could not refresh columnar store for {dataset}: {str(e)}")
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        'files': len(files),
+        'distinct': len(results),
+        'failed': failed,
+        'seconds': round(elapsed, 3),
+        'parse_seconds': round(parsed - start, 3),
+        'files_per_second': round(len(files) / elapsed, 1) if elapsed > 0 else None
+    }
+    logger.info(f"Backfill stats: {stats}")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild ETF characteristics and PCF VIX prices from all stored PCF files")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--skip-characteristics", action="store_true", help="Don't touch etf_characteristics_master.csv")
+    parser.add_argument("--skip-vix", action="store_true", help="Don't touch vix_futures_master.csv")
+    args = parser.parse_args()
+
+    try:
+        stats = backfill(workers=args.workers,
+                         characteristics=not args.skip_characteristics,
+                         vix_futures=not args.skip_vix)
+        print(f"✅ Backfilled {stats['files']} PCF files ({stats['distinct']} distinct) in {stats['seconds']}s "
+              f"- {stats['files_per_second']} files/s, {stats['failed']} with errors")
+    except (MissingCriticalDataError, InvalidDataError) as e:
+        print(f"❌ PCF backfill failed: {e}")
+        logger.error(traceback.format_exc())
+        exit(1)
+    except Exception as e:
+        print(f"❌ Unexpected error during PCF backfill: {e}")
+        logger.error(traceback.format_exc())
+        exit(1)
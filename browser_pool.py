@@ -0,0 +1,283 @@
+"""
+Shared headless Chrome for the scrapers (CBOE futures, Simplex NAV, TradingView).
+
+Each scraper used to start its own Chrome, paying the browser cold start
+(several seconds) on every run. This module starts one browser per process,
+or attaches to a long-lived one started with `python browser_pool.py --serve`,
+and hands out pages:
+
+    with browser_pool.page() as driver:
+        driver.get(url)
+
+Every page is a new tab in its own browser context (separate cookies and
+storage, created over the Chrome DevTools protocol), closed when the scrape is
+done. A WebDriver session drives one tab at a time, so pages are leased one
+after another; the browser itself stays warm between them.
+
+Playwright scrapers can attach to the daemon through cdp_endpoint().
+"""
+import os
+import json
+import time
+import socket
+import signal
+import atexit
+import argparse
+import logging
+import threading
+from contextlib import contextmanager
+from common import SAVE_DIR, MissingCriticalDataError
+
+logger = logging.getLogger('browser_pool')
+
+# Remote debugging port of the daemon browser
+DEFAULT_PORT = int(os.environ.get("BROWSER_POOL_PORT", "9222"))
+
+# Daemon state (pid and port), written by --serve
+STATE_FILE = os.path.join(SAVE_DIR, "browser_pool.json")
+
+# Seconds to wait for the page lease held by another scraper
+LEASE_TIMEOUT = 300
+
+CHROME_ARGUMENTS = [
+    "--headless=new",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--window-size=1920,1080",
+]
+
+_lock = threading.RLock()
+_lease = threading.Lock()
+_driver = None
+_attached = False
+_page = None  # (window handle, browser context id) of the open page
+
+def _chrome_options(debugging_port=None, debugger_address=None):
+    from selenium.webdriver.chrome.options import Options
+    options = Options()
+    if debugger_address:
+        options.debugger_address = debugger_address
+        return options
+    for argument in CHROME_ARGUMENTS:
+        options.add_argument(argument)
+    if debugging_port:
+        options.add_argument(f"--remote-debugging-port={debugging_port}")
+        options.add_argument(f"--user-data-dir={os.path.abspath(os.path.join(SAVE_DIR, 'browser_profile'))}")
+    return options
+
+def _port_open(port, host="127.0.0.1"):
+    try:
+        with socket.create_connection((host, port), timeout=0.5):
+            return True
+    except OSError:
+        return False
+
+def daemon_port():
+    """Return the port of a running daemon browser, or None."""
+    if not os.path.exists(STATE_FILE):
+        return None
+    try:
+        with open(STATE_FILE, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    port = state.get('port')
+    return port if port and _port_open(port) else None
+
+def cdp_endpoint():
+    """DevTools endpoint of the daemon browser (for Playwright connect_over_cdp), or None."""
+    port = daemon_port()
+    return f"http://127.0.0.1:{port}" if port else None
+
+def get_browser():
+    """
+    Return the shared WebDriver, starting Chrome or attaching to the daemon on first use.
+
+    Returns:
+        selenium.webdriver.Chrome: Shared driver (use page() to get a tab)
+    """
+    global _driver, _attached
+    with _lock:
+        if _driver is not None:
+            return _driver
+
+        from selenium import webdriver
+        start = time.time()
+        port = daemon_port()
+        if port:
+            _driver = webdriver.Chrome(options=_chrome_options(debugger_address=f"127.0.0.1:{port}"))
+            _attached = True
+            logger.info(f"Attached to daemon browser on port {port} in {time.time() - start:.2f}s")
+        else:
+            _driver = webdriver.Chrome(options=_chrome_options())
+            _attached = False
+            logger.info(f"Started headless Chrome in {time.time() - start:.2f}s")
+        return _driver
+
+def close_browser():
+    """Quit the process's browser (an attached daemon browser is left running)."""
+    global _driver
+    with _lock:
+        if _driver is None:
+            return
+        try:
+            if _attached:
+                # Only stop our chromedriver; quit() would close the daemon's tabs
+                _driver.service.stop()
+            else:
+                _driver.quit()
+            logger.info("Browser session closed")
+        except Exception as e:
+            logger.warning(f"Error closing browser: {str(e)}")
+        _driver = None
+
+atexit.register(close_browser)
+
+def open_page(user_agent=None, page_load_timeout=30):
+    """
+    Lease a fresh tab in its own browser context; release it with close_page().
+
+    Args:
+        user_agent (str): User agent override for this page
+        page_load_timeout (int): Seconds allowed for driver.get()
+
+    Returns:
+        selenium.webdriver.Chrome: The shared driver, switched to the new tab
+    """
+    global _page
+    if not _lease.acquire(timeout=LEASE_TIMEOUT):
+        raise MissingCriticalDataError(f"Timed out after {LEASE_TIMEOUT}s waiting for the shared browser.")
+
+    try:
+        driver = get_browser()
+        start = time.time()
+        context_id = None
+        try:
+            context_id = driver.execute_cdp_cmd("Target.createBrowserContext", {"disposeOnDetach": True})['browserContextId']
+            target_id = driver.execute_cdp_cmd("Target.createTarget",
+                                               {"url": "about:blank", "browserContextId": context_id})['targetId']
+            driver.switch_to.window(target_id)
+        except Exception as e:
+            # Isolated contexts need Chrome's DevTools protocol; fall back to a plain tab
+            logger.debug(f"Browser context unavailable ({str(e)}), using a plain tab")
+            context_id = None
+            driver.switch_to.new_window('tab')
+        _page = (driver.current_window_handle, context_id)
+
+        if user_agent:
+            driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": user_agent})
+        driver.set_page_load_timeout(page_load_timeout)
+        logger.debug(f"Opened page in {time.time() - start:.2f}s")
+        return driver
+    except Exception as e:
+        _lease.release()
+        # A dead browser is restarted on the next lease
+        close_browser()
+        raise MissingCriticalDataError(f"Could not open a page in the shared browser: {str(e)}") from e
+
+def close_page(driver):
+    """Close the leased tab and its browser context, and release the lease."""
+    global _page
+    try:
+        handle, context_id = _page or (None, None)
+        _page = None
+        if handle:
+            driver.switch_to.window(handle)
+            driver.close()
+        if context_id:
+            driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": context_id})
+        # Leave the driver on a live window for the next lease
+        remaining = driver.window_handles
+        if remaining:
+            driver.switch_to.window(remaining[0])
+    except Exception as e:
+        logger.warning(f"Error closing page: {str(e)}")
+        close_browser()
+    finally:
+        _lease.release()
+
+@contextmanager
+def page(user_agent=None, page_load_timeout=30):
+    """Context manager around open_page()/close_page()."""
+    driver = open_page(user_agent, page_load_timeout)
+    try:
+        yield driver
+    finally:
+        close_page(driver)
+
+def serve(port=DEFAULT_PORT):
+    """Run a browser with remote debugging enabled until SIGTERM/SIGINT (daemon mode)."""
+    from selenium import webdriver
+
+    if _port_open(port):
+        raise MissingCriticalDataError(f"Port {port} is already in use.")
+
+    start = time.time()
+    driver = webdriver.Chrome(options=_chrome_options(debugging_port=port))
+    logger.info(f"Daemon browser started on port {port} in {time.time() - start:.2f}s")
+
+    with open(STATE_FILE, "w", encoding="utf-8") as f:
+        json.dump({'pid': os.getpid(), 'port': port, 'started': time.strftime("%Y%m%d%H%M")}, f)
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+    try:
+        while not stopping.wait(5):
+            # Exit if the browser died
+            if not _port_open(port):
+                logger.error("Daemon browser is no longer reachable, exiting")
+                break
+    finally:
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Error closing daemon browser: {str(e)}")
+        if os.path.exists(STATE_FILE):
+            os.remove(STATE_FILE)
+        logger.info("Daemon browser stopped")
+
+def stop():
+    """Stop the daemon browser. Returns True if one was running."""
+    if not os.path.exists(STATE_FILE):
+        return False
+    with open(STATE_FILE, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    try:
+        os.kill(state['pid'], signal.SIGTERM)
+    except ProcessLookupError:
+        os.remove(STATE_FILE)
+        return False
+    return True
+
+if __name__ == "__main__":
+    from common import setup_logging
+    logger = setup_logging('browser_pool')
+
+    parser = argparse.ArgumentParser(description="Shared headless Chrome for the scrapers")
+    parser.add_argument("--serve", action="store_true", help="Run the daemon browser until stopped")
+    parser.add_argument("--stop", action="store_true", help="Stop the daemon browser")
+    parser.add_argument("--wait", type=float, default=0, help="Seconds to wait for the daemon to come up (status check)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Remote debugging port")
+    args = parser.parse_args()
+
+    if args.serve:
+        try:
+            serve(args.port)
+        except Exception as e:
+            print(f"❌ Daemon browser failed: {e}")
+            exit(1)
+    elif args.stop:
+        print("✅ Daemon browser stopped" if stop() else "ℹ️ No daemon browser running")
+    else:
+        deadline = time.time() + args.wait
+        port = daemon_port()
+        while port is None and time.time() < deadline:
+            time.sleep(0.5)
+            port = daemon_port()
+        if port:
+            print(f"✅ Daemon browser running on port {port}")
+        else:
+            print("❌ No daemon browser running")
+            exit(1)
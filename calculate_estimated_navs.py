@@ -8,7 +8,10 @@ import logging
 import sys
 import traceback
 
-from common import normalize_vix_ticker, find_latest_file
+import common
+from common import normalize_vix_ticker, normalize_date_str, MissingCriticalDataError
+from asof_join import select_asof, CHARACTERISTICS_TOLERANCE_DAYS, PRICE_TOLERANCE_DAYS, FX_TOLERANCE_DAYS, \
+    NAV_TOLERANCE_DAYS
 
 # Set up paths and logging
 DATA_DIR = "data"
@@ -36,24 +39,11 @@ def read_latest_file(pattern, default_cols=None):
     Returns:
         pandas.DataFrame: DataFrame with the file contents or None if file not found or error
     """
-    latest_file = find_latest_file(pattern, directory=DATA_DIR)
-    
-    if not latest_file:
-        logger.error(f"No file found matching pattern: {pattern} in directory {DATA_DIR}")
-        return None
-    
     try:
-        logger.info(f"Reading file: {latest_file}")
-        df = pd.read_csv(latest_file)
-        
-        if df.empty:
-            logger.error(f"File {latest_file} is empty")
-            return None
-            
-        return df
-    except Exception as e:
-        logger.error(f"Error reading file {latest_file}: {str(e)}")
-        logger.error(traceback.format_exc())
+        logger.info(f"Reading latest {pattern} from {DATA_DIR}")
+        return common.read_latest_file(pattern, default_cols, directory=DATA_DIR)
+    except MissingCriticalDataError as e:
+        logger.error(str(e))
         return None
 
 def list_all_data_files():
@@ -135,6 +125,80 @@ def fix_etf_characteristic_files():
         logger.error(traceback.format_exc())
         return False
 
+def _with_master_history(snapshot_df, master_name):
+    """Combine the latest snapshot with its master history, newest timestamp last per row."""
+    master_path = os.path.join(DATA_DIR, master_name)
+    frames = [snapshot_df] if snapshot_df is not None else []
+    if os.path.exists(master_path):
+        try:
+            frames.insert(0, pd.read_csv(master_path, dtype={'timestamp': str}))
+        except Exception as e:
+            logger.warning(f"Could not read {master_path} for as-of alignment: {str(e)}")
+    if not frames:
+        return None
+    
+    combined = pd.concat(frames, ignore_index=True)
+    combined['timestamp'] = combined['timestamp'].astype(str)
+    return combined.drop_duplicates().sort_values('timestamp', kind='stable')
+
+def align_inputs(vix_futures_df, etf_char_df, fx_data_df, nav_data_df):
+    """
+    Align futures prices, ETF characteristics, FX rates and published NAV to the valuation date.
+    
+    The valuation date is the latest futures price_date; each source's prices must be
+    from that date. For the other inputs the most recent record dated on or before it
+    (within the asof_join tolerances) is picked from the latest snapshot plus the
+    master history.
+    
+    Returns:
+        tuple: (vix_futures_df, etf_char_df, fx_data_df, nav_data_df) or None if a
+               required input has no record within tolerance
+    """
+    if 'price_date' not in vix_futures_df.columns:
+        logger.warning("VIX futures data has no price_date; using the latest files without alignment")
+        return vix_futures_df, etf_char_df, fx_data_df, nav_data_df
+    
+    valuation_date = max(filter(None, (normalize_date_str(d) for d in vix_futures_df['price_date'].dropna().unique())),
+                         default=None)
+    if valuation_date is None:
+        logger.error("VIX futures data has no valid price_date")
+        return None
+    logger.info(f"Valuation date (latest futures price date): {valuation_date}")
+    
+    # Drop sources whose prices are older than the valuation date
+    vix_aligned = select_asof(vix_futures_df, valuation_date, record_on='price_date', by=['source'],
+                              tolerance_days=PRICE_TOLERANCE_DAYS)
+    
+    # ETF composition in force on the valuation date (one row: the newest for that fund date)
+    etf_history = _with_master_history(etf_char_df, "etf_characteristics_master.csv")
+    etf_aligned = select_asof(etf_history, valuation_date, record_on='fund_date',
+                              tolerance_days=CHARACTERISTICS_TOLERANCE_DAYS)
+    if etf_aligned is None or etf_aligned.empty:
+        logger.error(f"No ETF characteristics dated within {CHARACTERISTICS_TOLERANCE_DAYS} days before {valuation_date}")
+        return None
+    etf_aligned = etf_aligned.tail(1).reset_index(drop=True)
+    logger.info(f"Using ETF characteristics for fund date {etf_aligned['fund_date'].iloc[0]}")
+    
+    # FX rates per label as of the valuation date (bridges weekend/holiday gaps)
+    fx_history = _with_master_history(fx_data_df, "fx_data_master.csv")
+    fx_history = fx_history[fx_history['label'].notna()] if 'label' in fx_history.columns else fx_history
+    fx_aligned = select_asof(fx_history, valuation_date, record_on='date', by=['label'],
+                             tolerance_days=FX_TOLERANCE_DAYS)
+    if fx_aligned is None or fx_aligned.empty:
+        logger.error(f"No FX rates dated within {FX_TOLERANCE_DAYS} days before {valuation_date}")
+        return None
+    fx_aligned = fx_aligned.drop_duplicates(['label'], keep='last').reset_index(drop=True)
+    
+    # Published NAV for the same date (optional)
+    nav_aligned = None
+    nav_history = _with_master_history(nav_data_df, "nav_data_master.csv")
+    if nav_history is not None and 'fund_date' in nav_history.columns:
+        nav_aligned = select_asof(nav_history, valuation_date, record_on='fund_date',
+                                  tolerance_days=NAV_TOLERANCE_DAYS)
+        nav_aligned = nav_aligned.tail(1).reset_index(drop=True) if not nav_aligned.empty else None
+    
+    return vix_aligned, etf_aligned, fx_aligned, nav_aligned
+
 def calculate_estimated_nav():
     """
     Calculate estimated NAVs based on VIX futures, ETF characteristics, and FX data
@@ -182,6 +246,12 @@ def calculate_estimated_nav():
             logger.error(f"Missing required data: {', '.join(missing_data)}")
             return None
         
+        # Align the inputs to the valuation date instead of pairing whatever files are newest
+        aligned = align_inputs(vix_futures_df, etf_char_df, fx_data_df, nav_data_df)
+        if aligned is None:
+            return None
+        vix_futures_df, etf_char_df, fx_data_df, nav_data_df = aligned
+        
         # Get current timestamp
         timestamp = datetime.now().strftime("%Y%m%d%H%M")
         
@@ -0,0 +1,209 @@
+"""
+Record/replay store for downloader responses (offline, deterministic runs).
+
+Set CASSETTE_MODE before running any downloader:
+
+    live    (default) talk to the sites, record nothing
+    record  talk to the sites and save every raw response to the cassette store
+    replay  serve the saved responses instead of the network or browser
+
+The store (CASSETTE_DIR, default data/cassettes) holds one body and one JSON
+metadata file per source and key, e.g. the MUFG CSV, the Simplex page and
+PCF files (keyed by URL), the rendered CBOE page and the batched Yahoo
+response. Replayed bodies go through the same parse code as live ones, so a
+fixed cassette gives repeatable timings:
+
+    CASSETTE_MODE=record python mufg_fx_downloader.py
+    CASSETTE_MODE=replay python mufg_fx_downloader.py
+    python cassette.py --bench       # time the parse stage of every recording
+"""
+import os
+import json
+import time
+import hashlib
+import argparse
+import logging
+from common import SAVE_DIR, MissingCriticalDataError, InvalidDataError
+
+logger = logging.getLogger('cassette')
+
+MODE_ENV = "CASSETTE_MODE"
+DIR_ENV = "CASSETTE_DIR"
+MODES = ('live', 'record', 'replay')
+
+DEFAULT_DIR = os.path.join(SAVE_DIR, "cassettes")
+
+def mode():
+    """Current mode from CASSETTE_MODE: 'live', 'record' or 'replay'."""
+    value = os.environ.get(MODE_ENV, 'live').strip().lower() or 'live'
+    if value not in MODES:
+        raise InvalidDataError(f"Invalid {MODE_ENV} '{value}' (expected one of {', '.join(MODES)})")
+    return value
+
+def store_dir():
+    return os.environ.get(DIR_ENV) or DEFAULT_DIR
+
+def _path(source, key):
+    return os.path.join(store_dir(), source, hashlib.sha1(key.encode('utf-8')).hexdigest()[:20])
+
+def save(source, key, content, headers=None, status=200):
+    """
+    Save one raw response.
+
+    Args:
+        source (str): Downloader the response belongs to ('mufg', 'cboe', ...)
+        key (str): Request key within the source (usually the URL)
+        content (bytes or str): Raw body, or rendered HTML
+        headers (dict): Response headers worth keeping (content type for decoding)
+        status (int): HTTP status
+    """
+    path = _path(source, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    is_text = isinstance(content, str)
+    body = content.encode('utf-8') if is_text else content
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(body)
+    os.replace(f"{path}.tmp", path)
+    meta = {'source': source, 'key': key, 'text': is_text, 'status': status, 'size': len(body),
+            'headers': dict(headers or {}), 'recorded': time.strftime("%Y%m%d%H%M")}
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    logger.info(f"Recorded {source} response for {key} ({len(body)} bytes)")
+
+def load(source, key):
+    """
+    Load a recorded response.
+
+    Returns:
+        tuple: (content as saved, bytes or str; metadata dict)
+
+    Raises:
+        MissingCriticalDataError: If nothing was recorded for the key
+    """
+    path = _path(source, key)
+    try:
+        with open(f"{path}.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(path, "rb") as f:
+            body = f.read()
+    except OSError:
+        raise MissingCriticalDataError(f"No {source} recording for {key} in {store_dir()} "
+                                       f"(record one with {MODE_ENV}=record)")
+    return (body.decode('utf-8') if meta.get('text') else body), meta
+
+def through(source, key, fetch):
+    """
+    Run a fetch through the cassette: replayed in replay mode, saved in record mode.
+
+    Args:
+        source (str): Downloader name
+        key (str): Request key (usually the URL)
+        fetch: Callable returning the raw body (bytes) or rendered HTML (str)
+
+    Returns:
+        bytes or str: The body
+    """
+    current = mode()
+    if current == 'replay':
+        return load(source, key)[0]
+    content = fetch()
+    if current == 'record':
+        save(source, key, content)
+    return content
+
+def entries(source=None):
+    """Metadata of the recordings in the store, optionally of one source."""
+    root = store_dir()
+    if not os.path.isdir(root):
+        return []
+    sources = [source] if source else sorted(os.listdir(root))
+    found = []
+    for name in sources:
+        directory = os.path.join(root, name)
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".json"):
+                with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+                    found.append(json.load(f))
+    return found
+
+def _parsers():
+    """Parse stage of each source: callable(content, meta)."""
+    from cboe_parser import parse_cboe_table
+    from pcf_reader import parse_pcf_content
+    from mufg_fx_downloader import parse_mufg_fx_csv
+    from yahoo_vix_downloader import parse_recording, YAHOO_TICKERS
+    return {
+        'mufg': lambda content, meta: parse_mufg_fx_csv(content),
+        'simplex_pcf': lambda content, meta: parse_pcf_content(content, meta['key']),
+        'cboe': lambda content, meta: parse_cboe_table(content),
+        'yahoo': lambda content, meta: parse_recording(content, YAHOO_TICKERS),
+    }
+
+def benchmark(rounds=20, source=None):
+    """
+    Time the parse stage on every recording that has one.
+
+    Returns:
+        list: Dicts with source, key, size, best_ms, mb_per_s, error
+    """
+    parsers = _parsers()
+    results = []
+    for meta in entries(source):
+        parse = parsers.get(meta['source'])
+        if parse is None:
+            continue
+        content, meta = load(meta['source'], meta['key'])
+        best = None
+        error = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            try:
+                parse(content, meta)
+            except Exception as e:
+                error = str(e)
+                break
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results.append({
+            'source': meta['source'],
+            'key': meta['key'],
+            'size': meta['size'],
+            'best_ms': round(best * 1000, 3) if best is not None else None,
+            'mb_per_s': round(meta['size'] / best / 1e6, 1) if best else None,
+            'error': error
+        })
+    return results
+
+if __name__ == "__main__":
+    from common import setup_logging
+    logger = setup_logging('cassette')
+
+    parser = argparse.ArgumentParser(description="Recorded downloader responses")
+    parser.add_argument("--bench", action="store_true", help="Time the parse stage on every recording")
+    parser.add_argument("--source", help="Only this source")
+    parser.add_argument("--rounds", type=int, default=20, help="Timing rounds per recording (best is reported)")
+    args = parser.parse_args()
+
+    if args.bench:
+        results = benchmark(args.rounds, args.source)
+        if not results:
+            print(f"❌ No recordings with a parse stage in {store_dir()}")
+            exit(1)
+        for result in results:
+            if result['error']:
+                print(f"{result['source']:<12} {result['key']}: FAILED ({result['error']})")
+            else:
+                print(f"{result['source']:<12} {result['key']}: {result['size']} bytes, "
+                      f"{result['best_ms']} ms ({result['mb_per_s']} MB/s)")
+        failed = [result for result in results if result['error']]
+        if failed:
+            print(f"❌ {len(failed)} of {len(results)} recordings failed to parse")
+            exit(1)
+        print(f"✅ Parsed {len(results)} recordings")
+    else:
+        recordings = entries(args.source)
+        for meta in recordings:
+            print(f"{meta['source']:<12} {meta['recorded']} {meta['size']:>9} bytes  {meta['key']}")
+        print(f"✅ {len(recordings)} recordings in {store_dir()}")
@@ -0,0 +1,263 @@
+"""
+Parser for the CBOE VIX futures page (https://www.cboe.com/tradable_products/vix/vix_futures/).
+
+The page is ~300 KB of rendered HTML with a single quotes table:
+
+    Symbol  | Expiration | Last  | Change | High  | Low   | Settlement | Volume
+    VIX     | -          | 22.56 | 2.28   | 25.53 | 25.53 | -          | -
+    VX/M5   | 06/18/2025 | 21.70 | 1.061  | 22.62 | 20.40 | 20.6395    | 51,661
+
+parse_cboe_table() cuts the <table> fragments out of the page with a regex,
+keeps the ones whose header mentions Symbol/Settlement, and parses only those
+with lxml (falling back to BeautifulSoup when lxml isn't installed or finds
+nothing). Symbols are parsed by the shared vix_contracts grammar.
+
+Run as a script to benchmark the lxml engine against the legacy full-page
+BeautifulSoup parse on saved cboe_debug.html snapshots (the file in data/ and
+its previous versions in git history) and to check that both engines agree.
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+import logging
+from vix_contracts import parse_contract
+
+try:
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+logger = logging.getLogger('cboe_parser')
+
+DEBUG_HTML = os.path.join("data", "cboe_debug.html")
+
+# Fewer contracts than this in a saved page means the layout changed
+MIN_CONTRACTS = 5
+
+# <table> fragments and the header words that identify the quotes table
+TABLE_FRAGMENT = re.compile(r'<table\b.*?</table\s*>', re.S | re.I)
+TABLE_HINT = re.compile(r'>\s*(?:Symbol|Settlement)\s*<', re.I)
+HEADER_NAMES = ['SYMBOL', 'EXPIRATION', 'SETTLEMENT', 'LAST']
+
+def contract_code(symbol):
+    """
+    Convert a CBOE futures symbol to its month code and year digit.
+
+    Returns:
+        str: e.g. 'M5' for VX/M5, VX25/M5 or VIX JUN 25; None if not a futures symbol
+    """
+    contract = parse_contract(symbol)
+    return contract.code[2:] if contract else None
+
+def _column_map(headers):
+    col_map = {}
+    for j, header in enumerate(headers):
+        header_upper = header.upper()
+        if 'SYMBOL' in header_upper:
+            col_map['symbol'] = j
+        elif 'EXPIRATION' in header_upper:
+            col_map['expiration'] = j
+        elif 'SETTLEMENT' in header_upper:
+            col_map['settlement'] = j
+        elif 'LAST' in header_upper:
+            col_map['last'] = j
+        elif 'VOLUME' in header_upper:
+            col_map['volume'] = j
+
+    # Default mappings if not found
+    if 'symbol' not in col_map:
+        col_map['symbol'] = 0  # Assume first column is symbol
+    if 'settlement' not in col_map and 'last' not in col_map:
+        # Try to find price columns by position
+        if len(headers) >= 7:
+            col_map['settlement'] = 6  # Often 7th column
+        if len(headers) >= 3:
+            col_map['last'] = 2  # Often 3rd column
+    return col_map
+
+def _price(text):
+    text = text.strip()
+    if not text or text in ('-', '0'):
+        return None
+    return float(text.replace(',', ''))
+
+def extract_prices(headers, rows):
+    """
+    Turn the text grid of the quotes table into prices.
+
+    Args:
+        headers (list): Header cell texts
+        rows (list): Lists of data cell texts
+
+    Returns:
+        dict: 'CBOE:VIX', 'CBOE:VX{m}{y}' and '/VX{m}{y}' -> settlement price (last price if
+              there is no settlement); later rows win for the same contract
+    """
+    col_map = _column_map(headers)
+    width = max(col_map.values()) + 1
+    prices = {}
+
+    for cells in rows:
+        if len(cells) < width:
+            continue
+        symbol = cells[col_map['symbol']].strip()
+        try:
+            price = _price(cells[col_map['settlement']]) if 'settlement' in col_map else None
+            if not price and 'last' in col_map:
+                price = _price(cells[col_map['last']])
+        except ValueError:
+            logger.warning(f"Non-numeric price for symbol '{symbol}': {cells}")
+            continue
+        if not symbol or not price:
+            continue
+
+        # Special case for VIX index
+        if symbol.upper() == 'VIX':
+            prices['CBOE:VIX'] = price
+            continue
+
+        code = contract_code(symbol)
+        if code:
+            prices[f"CBOE:VX{code}"] = price
+            prices[f"/VX{code}"] = price
+
+    return prices
+
+def _is_quotes_table(headers):
+    return any(header.upper() in HEADER_NAMES for header in headers)
+
+def _grids_lxml(html):
+    """Text grids of the candidate tables, parsing only the <table> fragments."""
+    for fragment in TABLE_FRAGMENT.findall(html):
+        if not TABLE_HINT.search(fragment):
+            continue
+        table = lxml.html.fragment_fromstring(fragment)
+        rows = table.xpath('.//tr')
+        if not rows:
+            continue
+        headers = [cell.text_content().strip() for cell in rows[0].xpath('./th')]
+        if not headers:
+            headers = [cell.text_content().strip() for cell in rows[0].xpath('./td')]
+        if _is_quotes_table(headers):
+            yield headers, [[cell.text_content() for cell in row.xpath('./td')] for row in rows[1:]]
+
+def _grids_soup(html):
+    """Text grids of every table on the page (legacy full-page BeautifulSoup parse)."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    for table in soup.find_all('table'):
+        header_row = table.find('tr')
+        if not header_row:
+            continue
+        headers = [th.get_text().strip() for th in header_row.find_all(['th'])]
+        if not headers and header_row.find_all(['td']):
+            headers = [td.get_text().strip() for td in header_row.find_all(['td'])]
+        if _is_quotes_table(headers):
+            yield headers, [[td.get_text() for td in row.find_all(['td'])] for row in table.find_all('tr')[1:]]
+
+ENGINES = {'lxml': _grids_lxml, 'soup': _grids_soup}
+
+def parse_cboe_table(html, engine=None):
+    """
+    Extract VIX index and futures prices from the CBOE futures page.
+
+    Args:
+        html (str): Page source
+        engine (str): 'lxml' or 'soup' (default: lxml when installed, soup as fallback)
+
+    Returns:
+        dict: Prices keyed as in extract_prices() (empty if no quotes table was found)
+    """
+    engines = [engine] if engine else (['lxml', 'soup'] if HAS_LXML else ['soup'])
+    for name in engines:
+        for headers, rows in ENGINES[name](html):
+            prices = extract_prices(headers, rows)
+            if prices:
+                logger.debug(f"Parsed {len(prices)} prices with {name} (headers: {headers})")
+                return prices
+    return {}
+
+def load_corpus(paths=None, git_history=0, git_path=DEBUG_HTML):
+    """
+    Load saved CBOE pages.
+
+    Args:
+        paths (list): HTML files (default: data/cboe_debug.html)
+        git_history (int): Also load up to this many previous versions of git_path from git
+
+    Returns:
+        list: (name, html) tuples
+    """
+    corpus = []
+    for path in paths or [git_path]:
+        with open(path, "r", encoding="utf-8") as f:
+            corpus.append((path, f.read()))
+
+    if git_history:
+        revisions = subprocess.run(["git", "log", f"-n{git_history}", "--format=%h", "--", git_path],
+                                   capture_output=True, text=True, check=True).stdout.split()
+        for revision in revisions:
+            html = subprocess.run(["git", "show", f"{revision}:{git_path}"],
+                                  capture_output=True, text=True, check=True).stdout
+            corpus.append((f"{revision}:{git_path}", html))
+    return corpus
+
+def benchmark(corpus, rounds=5):
+    """
+    Time both engines on each page and compare their output.
+
+    Returns:
+        list: Dicts with name, contracts, soup_ms, lxml_ms, speedup, match, ok
+    """
+    results = []
+    for name, html in corpus:
+        timings = {}
+        outputs = {}
+        for engine in ('soup', 'lxml'):
+            best = None
+            for _ in range(rounds):
+                start = time.perf_counter()
+                outputs[engine] = parse_cboe_table(html, engine)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[engine] = best * 1000
+
+        contracts = len([key for key in outputs['lxml'] if key.startswith('/VX')])
+        match = outputs['soup'] == outputs['lxml']
+        results.append({
+            'name': name,
+            'contracts': contracts,
+            'soup_ms': round(timings['soup'], 2),
+            'lxml_ms': round(timings['lxml'], 2),
+            'speedup': round(timings['soup'] / timings['lxml'], 1) if timings['lxml'] else None,
+            'match': match,
+            'ok': match and contracts >= MIN_CONTRACTS
+        })
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark and check the CBOE page parser on saved pages")
+    parser.add_argument("paths", nargs="*", help=f"Saved CBOE pages (default: {DEBUG_HTML})")
+    parser.add_argument("--git-history", type=int, default=0, help=f"Also check this many versions of {DEBUG_HTML} from git")
+    parser.add_argument("--rounds", type=int, default=5, help="Timing rounds per page (best is reported)")
+    args = parser.parse_args()
+
+    if not HAS_LXML:
+        print("❌ lxml is not installed")
+        sys.exit(1)
+
+    results = benchmark(load_corpus(args.paths, args.git_history), args.rounds)
+    for result in results:
+        status = "ok" if result['ok'] else ("MISMATCH" if not result['match'] else "TOO FEW CONTRACTS")
+        print(f"{result['name']}: {result['contracts']} contracts, soup {result['soup_ms']} ms, "
+              f"lxml {result['lxml_ms']} ms ({result['speedup']}x) {status}")
+
+    if all(result['ok'] for result in results):
+        print(f"✅ {len(results)} pages parsed identically by both engines")
+    else:
+        print(f"❌ {sum(not result['ok'] for result in results)} of {len(results)} pages failed the check")
+        sys.exit(1)
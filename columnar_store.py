@@ -0,0 +1,371 @@
+"""
+Partitioned columnar history store for the pipeline datasets.
+
+Every save_* function writes its run into a Parquet file partitioned by dataset
+and month of the run timestamp:
+
+    data/store/<dataset>/month=YYYY-MM/<timestamp>.parquet
+
+Columns are typed (dates as date32, prices as float64, share counts as int64)
+and repeated strings such as source, symbol and label are dictionary-encoded,
+so the full MUFG URL is stored once per file instead of once per row. Reads go
+through pyarrow.dataset, so analytics and backfills only touch the partitions
+and columns they ask for.
+
+common.read_latest_file serves the latest snapshot of a dataset from the store
+with read_run() when the store holds that run, cast back to the dtypes of the
+snapshot CSV; otherwise the CSV is read.
+
+Per-run files of a month can be merged into a single compacted.parquet with
+compact_month(); each timestamp always lives in exactly one file of its month.
+
+pyarrow is optional: without it the store is disabled and the CSV masters
+remain the only history.
+"""
+import os
+import io
+import glob
+import logging
+import traceback
+import argparse
+import pandas as pd
+from common import SAVE_DIR, InvalidDataError, MissingCriticalDataError
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the environment
+    pa = None
+
+logger = logging.getLogger('columnar_store')
+
+# Store directory inside a data directory (data/store by default)
+STORE_DIR_NAME = "store"
+COMPACTED_FILE = "compacted.parquet"
+
+# Column types per dataset: 'int', 'float', 'date', 'dict' (dictionary-encoded string)
+DATASET_COLUMNS = {
+    'vix_futures': [
+        ('timestamp', 'int'),
+        ('price_date', 'date'),
+        ('vix_future', 'dict'),
+        ('source', 'dict'),
+        ('symbol', 'dict'),
+        ('price', 'float'),
+    ],
+    'fx_data': [
+        ('timestamp', 'int'),
+        ('date', 'date'),
+        ('source', 'dict'),
+        ('pair', 'dict'),
+        ('label', 'dict'),
+        ('rate', 'float'),
+    ],
+    'nav_data': [
+        ('timestamp', 'int'),
+        ('source', 'dict'),
+        ('fund_date', 'date'),
+        ('nav', 'float'),
+        ('fund_code', 'dict'),
+    ],
+    'etf_characteristics': [
+        ('timestamp', 'int'),
+        ('fund_date', 'date'),
+        ('shares_outstanding', 'int'),
+        ('fund_cash_component', 'float'),
+        ('shares_amount_near_future', 'int'),
+        ('shares_amount_far_future', 'int'),
+        ('near_future', 'dict'),
+        ('far_future', 'dict'),
+    ],
+}
+
+# Master CSV backing each dataset (used for the initial import)
+DATASET_MASTERS = {
+    'vix_futures': "vix_futures_master.csv",
+    'fx_data': "fx_data_master.csv",
+    'nav_data': "nav_data_master.csv",
+    'etf_characteristics': "etf_characteristics_master.csv",
+}
+
+# Date formats used by the CSV files for each date column
+DATE_FORMATS = {
+    'price_date': "%Y-%m-%d",
+    'date': "%Y-%m-%d",
+    'fund_date': "%Y%m%d",
+}
+
+def is_available():
+    """Return True if pyarrow is installed and the store can be used."""
+    return pa is not None
+
+def _arrow_schema(dataset):
+    """Build the pyarrow schema for a dataset."""
+    if dataset not in DATASET_COLUMNS:
+        raise InvalidDataError(f"Unknown columnar dataset: {dataset}")
+
+    type_map = {
+        'int': pa.int64(),
+        'float': pa.float64(),
+        'date': pa.date32(),
+        'dict': pa.dictionary(pa.int32(), pa.string()),
+    }
+    return pa.schema([(name, type_map[kind]) for name, kind in DATASET_COLUMNS[dataset]])
+
+def _coerce_frame(dataset, df):
+    """
+    Coerce a DataFrame to the typed layout of a dataset.
+
+    Missing columns are filled with nulls, extra columns are dropped.
+    """
+    out = pd.DataFrame(index=df.index)
+    for name, kind in DATASET_COLUMNS[dataset]:
+        values = df[name] if name in df.columns else pd.Series([None] * len(df), index=df.index)
+        if kind == 'int':
+            out[name] = pd.to_numeric(values, errors='coerce').round().astype('Int64')
+        elif kind == 'float':
+            out[name] = pd.to_numeric(values, errors='coerce').astype('float64')
+        elif kind == 'date':
+            # fund_date may have been read back from CSV as 20250227.0
+            text = values.astype('string').str.replace(r'\.0$', '', regex=True)
+            out[name] = pd.to_datetime(text, format=DATE_FORMATS[name], errors='coerce').dt.date
+        else:
+            out[name] = values.astype('string')
+    return out.reset_index(drop=True)
+
+def _dataset_dir(dataset, save_dir=SAVE_DIR):
+    return os.path.join(save_dir, STORE_DIR_NAME, dataset)
+
+def _month_dir(dataset, month, save_dir=SAVE_DIR):
+    return os.path.join(_dataset_dir(dataset, save_dir), f"month={month}")
+
+def _month_of(timestamp):
+    """Partition month (YYYY-MM) of a YYYYMMDDHHMM run timestamp."""
+    ts = str(timestamp).split('.')[0]
+    if len(ts) < 6 or not ts[:6].isdigit():
+        raise InvalidDataError(f"Cannot derive partition month from timestamp '{timestamp}'.")
+    return f"{ts[:4]}-{ts[4:6]}"
+
+def _write_table(table, path):
+    """Write a Parquet file atomically."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    pq.write_table(table, temp_path, compression="zstd")
+    os.replace(temp_path, path)
+
+def _to_table(dataset, df):
+    return pa.Table.from_pandas(_coerce_frame(dataset, df), schema=_arrow_schema(dataset), preserve_index=False)
+
+def _read_month_files(dataset, month, save_dir=SAVE_DIR):
+    """Read all files of one month partition into a typed DataFrame."""
+    files = sorted(glob.glob(os.path.join(_month_dir(dataset, month, save_dir), "*.parquet")))
+    if not files:
+        return pd.DataFrame(columns=[name for name, _ in DATASET_COLUMNS[dataset]]), files
+    table = pa.concat_tables([pq.read_table(f, schema=_arrow_schema(dataset)) for f in files])
+    return table.to_pandas(), files
+
+def _drop_from_compacted(dataset, month, timestamps, save_dir=SAVE_DIR):
+    """Remove timestamps from a month's compacted file so they can be rewritten."""
+    compacted_path = os.path.join(_month_dir(dataset, month, save_dir), COMPACTED_FILE)
+    if not os.path.exists(compacted_path):
+        return
+    table = pq.read_table(compacted_path, schema=_arrow_schema(dataset))
+    mask = pc.is_in(table['timestamp'], value_set=pa.array(list(timestamps), type=pa.int64()))
+    if not pc.any(mask).as_py():
+        return
+    _write_table(table.filter(pc.invert(mask)), compacted_path)
+
+def write_partition(dataset, df, save_dir=SAVE_DIR):
+    """
+    Write one save run into the columnar store.
+
+    Args:
+        dataset (str): Dataset name (vix_futures, fx_data, nav_data, etf_characteristics)
+        df (pandas.DataFrame): Rows of a single run (one timestamp)
+        save_dir (str): Data directory holding the store
+
+    Returns:
+        str: Path of the written Parquet file, or None if the store is unavailable
+    """
+    if not is_available():
+        logger.warning("pyarrow is not installed - skipping columnar store write")
+        return None
+    if df is None or df.empty:
+        raise InvalidDataError(f"Cannot write an empty DataFrame to columnar dataset '{dataset}'.")
+
+    timestamps = df['timestamp'].astype(str).unique()
+    if len(timestamps) != 1:
+        raise InvalidDataError(f"Expected a single timestamp per write to '{dataset}', got {len(timestamps)}.")
+    timestamp = timestamps[0]
+    month = _month_of(timestamp)
+
+    # A re-run of a timestamp that was already compacted replaces it there
+    _drop_from_compacted(dataset, month, [int(timestamp)], save_dir)
+
+    path = os.path.join(_month_dir(dataset, month, save_dir), f"{timestamp}.parquet")
+    _write_table(_to_table(dataset, df), path)
+    return path
+
+def compact_month(dataset, month, extra_df=None, save_dir=SAVE_DIR):
+    """
+    Merge all files of a month partition (plus optional extra rows) into one file.
+
+    Rows from extra_df replace stored rows with the same timestamp.
+
+    Returns:
+        int: Number of rows in the compacted partition
+    """
+    month_df, files = _read_month_files(dataset, month, save_dir)
+    if extra_df is not None and not extra_df.empty:
+        extra_df = _coerce_frame(dataset, extra_df)
+        month_df = month_df[~month_df['timestamp'].isin(extra_df['timestamp'])]
+        month_df = pd.concat([month_df, extra_df], ignore_index=True)
+    if month_df.empty:
+        return 0
+
+    # Both parts are already typed, so build the table without coercing again
+    month_df = month_df.sort_values('timestamp', kind='stable')
+    compacted_path = os.path.join(_month_dir(dataset, month, save_dir), COMPACTED_FILE)
+    table = pa.Table.from_pandas(month_df, schema=_arrow_schema(dataset), preserve_index=False)
+    _write_table(table, compacted_path)
+    for path in files:
+        if os.path.abspath(path) != os.path.abspath(compacted_path):
+            os.remove(path)
+    return len(month_df)
+
+def import_master(dataset, save_dir=SAVE_DIR):
+    """
+    Load a *_master.csv into the store, one compacted file per month.
+
+    Re-importing is idempotent: stored rows with the same timestamps are replaced.
+
+    Returns:
+        int: Number of rows imported
+    """
+    master_path = os.path.join(save_dir, DATASET_MASTERS[dataset])
+    if not os.path.exists(master_path):
+        raise MissingCriticalDataError(f"Master CSV not found: {master_path}")
+
+    master_df = pd.read_csv(master_path, dtype={'timestamp': str})
+    master_df = master_df[master_df['timestamp'].notna()]
+    months = master_df['timestamp'].map(_month_of)
+
+    for month, month_rows in master_df.groupby(months):
+        compact_month(dataset, month, month_rows, save_dir)
+        logger.info(f"Imported {len(month_rows)} rows into {dataset}/month={month}")
+    return len(master_df)
+
+def list_months(dataset, save_dir=SAVE_DIR):
+    """Return the sorted list of month partitions stored for a dataset."""
+    dataset_dir = _dataset_dir(dataset, save_dir)
+    if not os.path.isdir(dataset_dir):
+        return []
+    return sorted(
+        name.split('=', 1)[1] for name in os.listdir(dataset_dir)
+        if name.startswith("month=") and os.listdir(os.path.join(dataset_dir, name))
+    )
+
+def read_dataset(dataset, columns=None, start_month=None, end_month=None, filter_expr=None, save_dir=SAVE_DIR):
+    """
+    Read a dataset from the store, touching only the requested partitions and columns.
+
+    Args:
+        dataset (str): Dataset name
+        columns (list): Columns to load (default: all)
+        start_month (str): First month partition to read (YYYY-MM, inclusive)
+        end_month (str): Last month partition to read (YYYY-MM, inclusive)
+        filter_expr: Optional extra pyarrow.dataset expression
+        save_dir (str): Data directory holding the store
+
+    Returns:
+        pandas.DataFrame: Typed data (dictionary columns come back as categoricals)
+    """
+    if not is_available():
+        raise MissingCriticalDataError("pyarrow is not installed - columnar store is unavailable.")
+
+    dataset_dir = _dataset_dir(dataset, save_dir)
+    if not list_months(dataset, save_dir):
+        raise MissingCriticalDataError(f"No data stored for columnar dataset '{dataset}'.")
+
+    partitioning = ds.partitioning(pa.schema([('month', pa.string())]), flavor="hive")
+    dataset_obj = ds.dataset(dataset_dir, format="parquet", partitioning=partitioning,
+                             schema=_arrow_schema(dataset).append(pa.field('month', pa.string())))
+
+    expr = None
+    if start_month:
+        expr = ds.field('month') >= start_month
+    if end_month:
+        end_expr = ds.field('month') <= end_month
+        expr = end_expr if expr is None else expr & end_expr
+    if filter_expr is not None:
+        expr = filter_expr if expr is None else expr & filter_expr
+
+    if columns is None:
+        columns = [name for name, _ in DATASET_COLUMNS[dataset]]
+    return dataset_obj.to_table(columns=columns, filter=expr).to_pandas()
+
+def _as_csv_frame(dataset, df):
+    """Typed store rows as pandas reads them from the snapshot CSV (dates as written there)."""
+    out = df[[name for name, _ in DATASET_COLUMNS[dataset]]].copy()
+    for name, kind in DATASET_COLUMNS[dataset]:
+        if kind == 'date':
+            out[name] = [value.strftime(DATE_FORMATS[name]) if value is not None and not pd.isna(value) else None
+                         for value in out[name]]
+    buffer = io.StringIO()
+    out.to_csv(buffer, index=False)
+    buffer.seek(0)
+    return pd.read_csv(buffer)
+
+def read_run(dataset, timestamp, save_dir=SAVE_DIR):
+    """
+    Read the rows of one save run, with the dtypes pd.read_csv gives its snapshot CSV.
+
+    Only the run's month partition is touched.
+
+    Args:
+        dataset (str): Dataset name
+        timestamp (str): Run timestamp (YYYYMMDDHHMM)
+        save_dir (str): Data directory holding the store
+
+    Returns:
+        pandas.DataFrame: The run's rows, or None if the store doesn't hold the run
+    """
+    if not is_available():
+        return None
+    month = _month_of(timestamp)
+    if month not in list_months(dataset, save_dir):
+        return None
+    df = read_dataset(dataset, start_month=month, end_month=month,
+                      filter_expr=ds.field('timestamp') == int(timestamp), save_dir=save_dir)
+    if df.empty:
+        return None
+    return _as_csv_frame(dataset, df)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Maintain the partitioned columnar history store")
+    parser.add_argument("--import-masters", action="store_true", help="Import all *_master.csv files into the store")
+    parser.add_argument("--compact", action="store_true", help="Compact every month partition into one file")
+    parser.add_argument("--save-dir", default=SAVE_DIR, help="Data directory holding the store (default: data)")
+    args = parser.parse_args()
+
+    if not is_available():
+        print("❌ pyarrow is not installed")
+        exit(1)
+
+    try:
+        for dataset in DATASET_COLUMNS:
+            if args.import_masters:
+                rows = import_master(dataset, args.save_dir)
+                print(f"✅ Imported {rows} rows into {dataset}")
+            if args.compact:
+                for month in list_months(dataset, args.save_dir):
+                    compact_month(dataset, month, save_dir=args.save_dir)
+                print(f"✅ Compacted {dataset}")
+    except (MissingCriticalDataError, InvalidDataError) as e:
+        print(f"❌ Columnar store maintenance failed: {e}")
+        logger.error(traceback.format_exc())
+        exit(1)
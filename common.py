@@ -1,9 +1,14 @@
 import os
+import bisect
+import csv
+import json
 import logging
 import re
 from datetime import datetime
 import pandas as pd
 import traceback
+import vix_contracts
+import vix_calendar
 
 # Custom Exceptions
 class MissingCriticalDataError(Exception):
@@ -75,15 +80,7 @@ def normalize_vix_ticker(ticker):
     """
     if not ticker or not isinstance(ticker, str):
         raise InvalidDataError(f"Invalid ticker: {ticker}. Ticker must be a non-empty string.")
-        
-    # If ticker is in format VX<letter><2-digit-year>
-    match = re.match(r'(VX[A-Z])(\d{2})$', ticker)
-    if match:
-        prefix = match.group(1)
-        year = match.group(2)
-        # Take only the last digit of the year
-        return f"{prefix}{year[-1]}"
-    return ticker
+    return vix_contracts.normalize_code(ticker)
 
 def get_yfinance_ticker_for_vix_future(contract_code):
     """
@@ -104,48 +101,13 @@ def get_yfinance_ticker_for_vix_future(contract_code):
     # Normalize the contract code first (in case it's in VXJ24 format)
     normalized_code = normalize_vix_ticker(contract_code)
     
-    # Check if it's in the standard VXM5 format
-    if not re.match(r'VX[A-Z]\d{1}$', normalized_code):
+    # Only the standard VXM5 format is accepted here
+    contract = vix_contracts.parse_contract(normalized_code)
+    if contract is None or contract.code != normalized_code:
         raise ValueError(f"Invalid contract code format: {contract_code} -> {normalized_code}")
     
-    # Extract month code and year digit
-    month_code = normalized_code[2]
-    year_digit = normalized_code[3]
-    
-    # Month code mapping (futures standard)
-    month_to_number = {
-        'F': '01',  # January
-        'G': '02',  # February
-        'H': '03',  # March
-        'J': '04',  # April
-        'K': '05',  # May
-        'M': '06',  # June
-        'N': '07',  # July
-        'Q': '08',  # August
-        'U': '09',  # September
-        'V': '10',  # October
-        'X': '11',  # November
-        'Z': '12',  # December
-    }
-    
-    if month_code not in month_to_number:
-        raise ValueError(f"Invalid month code in contract: {contract_code}")
-    
-    # Get current date information
-    current_year = datetime.now().year
-    current_decade = current_year // 10 * 10  # Gets e.g. 2020 for 2023
-    
-    # Calculate the full year
-    full_year = current_decade + int(year_digit)
-    
-    # If the calculated year is in the past, assume next decade
-    if full_year < current_year:
-        full_year += 10
-    
     # Yahoo Finance format for VIX futures
-    yahoo_ticker = f"^VIX{month_to_number[month_code]}.{full_year}"
-    
-    return yahoo_ticker
+    return vix_contracts.yahoo_ticker(contract)
 
 def get_alternative_yfinance_tickers(contract_code):
     """
@@ -167,66 +129,32 @@ def get_alternative_yfinance_tickers(contract_code):
     try:
         # Normalize the contract code first
         normalized_code = normalize_vix_ticker(contract_code)
-        
-        # Extract month code and year digit
-        if len(normalized_code) < 4:
+        contract = vix_contracts.parse_contract(normalized_code)
+        if contract is None or contract.code != normalized_code:
             return []
-            
-        month_code = normalized_code[2]
-        year_digit = normalized_code[3]
-        
-        # Month code mapping
-        month_to_number = {
-            'F': '01',  # January
-            'G': '02',  # February
-            'H': '03',  # March
-            'J': '04',  # April
-            'K': '05',  # May
-            'M': '06',  # June
-            'N': '07',  # July
-            'Q': '08',  # August
-            'U': '09',  # September
-            'V': '10',  # October
-            'X': '11',  # November
-            'Z': '12',  # December
-        }
-        
-        if month_code not in month_to_number:
-            return []
-        
-        # Get current date information
-        current_year = datetime.now().year
-        current_decade = current_year // 10 * 10
-        
-        # Calculate the full year
-        full_year = current_decade + int(year_digit)
-        
-        # If the calculated year is in the past, assume next decade
-        if full_year < current_year:
-            full_year += 10
         
         # Generate alternative ticker formats
         alternatives = []
         
         # Format 1: ^VIX<month_num>.<year>
-        alternatives.append(f"^VIX{month_to_number[month_code]}.{full_year}")
+        alternatives.append(vix_contracts.yahoo_ticker(contract))
         
         # Format 2: ^VIX<month_num><year_digit> (used by some data sources)
-        alternatives.append(f"^VIX{month_to_number[month_code]}{year_digit}")
+        alternatives.append(f"^VIX{contract.month:02d}{contract.year % 10}")
         
         # Format 3: VIX<month_num>.<year> (without the ^ prefix)
-        alternatives.append(f"VIX{month_to_number[month_code]}.{full_year}")
+        alternatives.append(f"VIX{contract.month:02d}.{contract.year}")
+        
+        # Contracts by position, rolling at expiry
+        next_contracts = get_next_vix_contracts(3)
         
-        # Format 4: Current month VIX future (VX=F)
+        # Format 4: Front month VIX future (VX=F)
         # Only add this if we're looking for the front month contract
-        current_month = datetime.now().month
-        next_month_idx = (current_month % 12) + 1
-        if month_to_number[month_code] == f"{next_month_idx:02d}":
+        if next_contracts and normalized_code == next_contracts[0]:
             alternatives.append("VX=F")
         
         # Format 5: Use position-based tickers for near months
         # Check if this is one of the next 3 contracts
-        next_contracts = get_next_vix_contracts(3)
         if normalized_code in next_contracts:
             position = next_contracts.index(normalized_code) + 1
             alternatives.append(f"^VFTW{position}")
@@ -237,45 +165,18 @@ def get_alternative_yfinance_tickers(contract_code):
     except Exception:
         return []
 
-def get_next_vix_contracts(num_contracts=3):
+def get_next_vix_contracts(num_contracts=3, on_date=None):
     """
-    Get the next N VIX futures contracts based on the current date.
+    Get the next N VIX futures contracts by position, rolling at expiry (see vix_calendar).
     
     Args:
         num_contracts (int): Number of future contracts to return
+        on_date: Date to position contracts on (default today)
         
     Returns:
         list: List of VIX futures contract codes (e.g., ['VXH5', 'VXJ5', 'VXK5'])
     """
-    current_date = datetime.now()
-    current_month = current_date.month
-    current_year = current_date.year % 10  # Last digit of year
-    
-    # Month codes used in VIX futures (reverse of MONTH_CODES)
-    month_codes = {v: k for k, v in MONTH_CODES.items()}
-    
-    contracts = []
-    
-    # Get the current month and the next N-1 months
-    for i in range(num_contracts):
-        # Calculate month and year (handling year wrap)
-        month_idx = (current_month + i) % 12
-        if month_idx == 0:  # Handle December (0 after modulo)
-            month_idx = 12
-            
-        # Calculate year digit (handle year rollover)
-        year_digit = current_year
-        if month_idx < current_month:
-            year_digit = (current_year + 1) % 10
-        
-        # Get the month code
-        month_code = month_codes.get(month_idx)
-        
-        # Create contract code
-        contract = f"VX{month_code}{year_digit}"
-        contracts.append(contract)
-    
-    return contracts
+    return [contract.code for contract in vix_calendar.contracts_on(on_date, num_contracts)]
 
 def format_vix_data(futures_data, source):
     """
@@ -326,10 +227,254 @@ def format_vix_data(futures_data, source):
     
     return records
 
+# Snapshot datasets tracked by the manifest, with the exact file name grammar of each.
+# The 12-digit group is the run timestamp (YYYYMMDDHHMM) embedded in the file name.
+SNAPSHOT_DATASETS = {
+    'vix_futures': re.compile(r'^vix_futures_(?P<timestamp>\d{12})\.csv$'),
+    'vix_futures_yahoo': re.compile(r'^vix_futures_yahoo_(?P<timestamp>\d{12})\.csv$'),
+    'cboe_vix_futures': re.compile(r'^cboe_vix_futures_(?P<timestamp>\d{12})\.csv$'),
+    'fx_data': re.compile(r'^fx_data_(?P<timestamp>\d{12})\.csv$'),
+    'nav_data': re.compile(r'^nav_data_(?P<timestamp>\d{12})\.csv$'),
+    'etf_characteristics': re.compile(r'^etf_characteristics_(?P<timestamp>\d{12})\.csv$'),
+    'pcf': re.compile(r'^318A-[A-Z]+-(?P<fund_date>\d{8})-(?P<timestamp>\d{12})\.csv$'),
+}
+
+# Glob patterns used by the scripts, mapped to their manifest dataset
+SNAPSHOT_PATTERNS = {
+    "vix_futures_*.csv": 'vix_futures',
+    "vix_futures_yahoo_*.csv": 'vix_futures_yahoo',
+    "cboe_vix_futures_*.csv": 'cboe_vix_futures',
+    "fx_data_*.csv": 'fx_data',
+    "nav_data_*.csv": 'nav_data',
+    "etf_characteristics_*.csv": 'etf_characteristics',
+    "318A-*.csv": 'pcf',
+    "318A*.csv": 'pcf',
+}
+
+# Column holding the data date in each snapshot (used only when seeding a manifest)
+SNAPSHOT_DATE_COLUMNS = {
+    'vix_futures': 'price_date',
+    'vix_futures_yahoo': 'price_date',
+    'cboe_vix_futures': 'price_date',
+    'fx_data': 'date',
+    'nav_data': 'fund_date',
+    'etf_characteristics': 'fund_date',
+}
+
+MANIFEST_DIR_NAME = "manifests"
+
+# In-process cache of loaded manifests: path -> (mtime_ns, entries)
+_manifest_cache = {}
+
+def _manifest_path(dataset, directory=SAVE_DIR):
+    return os.path.join(directory, MANIFEST_DIR_NAME, f"{dataset}.json")
+
+def normalize_date_str(value):
+    """
+    Normalize a date value (YYYYMMDD, YYYY-MM-DD, MM/DD/YYYY, 20250227.0) to YYYY-MM-DD.
+    
+    Returns:
+        str: Date in YYYY-MM-DD format or None if the value is empty/unparseable
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    text = str(value).strip()
+    if text.endswith('.0'):
+        text = text[:-2]
+    if re.match(r'^\d{8}$', text):
+        return f"{text[:4]}-{text[4:6]}-{text[6:]}"
+    if re.match(r'^\d{4}-\d{2}-\d{2}$', text):
+        return text
+    match = re.match(r'^(\d{1,2})/(\d{1,2})/(\d{4})$', text)
+    if match:
+        month, day, year = match.groups()
+        return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+    return None
+
+def _scan_snapshots(dataset, directory=SAVE_DIR, known=()):
+    """Directory scan used to seed a missing manifest, skipping the run timestamps in known."""
+    grammar = SNAPSHOT_DATASETS[dataset]
+    entries = []
+    if not os.path.isdir(directory):
+        return entries
+    for name in os.listdir(directory):
+        match = grammar.match(name)
+        if not match or match.group('timestamp') in known:
+            continue
+        groups = match.groupdict()
+        path = os.path.join(directory, name)
+        fund_date = groups.get('fund_date')
+        date_column = SNAPSHOT_DATE_COLUMNS.get(dataset)
+        if fund_date is None and date_column:
+            try:
+                dates = pd.read_csv(path, usecols=[date_column], dtype=str)[date_column].dropna()
+                fund_date = dates.max() if not dates.empty else None
+            except Exception:
+                fund_date = None
+        entries.append({
+            'timestamp': groups['timestamp'],
+            'fund_date': normalize_date_str(fund_date),
+            'path': path
+        })
+    entries.sort(key=lambda entry: entry['timestamp'])
+    return entries
+
+def _write_manifest(dataset, entries, directory=SAVE_DIR):
+    """Atomically replace a dataset manifest."""
+    path = _manifest_path(dataset, directory)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({'dataset': dataset, 'snapshots': entries}, f, indent=1)
+    os.replace(temp_path, path)
+    _manifest_cache[path] = (os.stat(path).st_mtime_ns, entries)
+
+def load_manifest(dataset, directory=SAVE_DIR):
+    """
+    Load the ordered snapshot list of a dataset.
+    
+    A missing manifest is seeded once from the file names in the directory
+    (sorted by the embedded timestamp, never by mtime).
+    
+    Args:
+        dataset (str): Dataset name (see SNAPSHOT_DATASETS)
+        directory (str): Data directory
+        
+    Returns:
+        list: Snapshot entries ({'timestamp', 'fund_date', 'path', ...}) oldest first
+    """
+    if dataset not in SNAPSHOT_DATASETS:
+        raise InvalidDataError(f"Unknown snapshot dataset: {dataset}")
+    
+    path = _manifest_path(dataset, directory)
+    if not os.path.exists(path):
+        entries = _scan_snapshots(dataset, directory)
+        if entries:
+            logging.info(f"Seeding manifest for {dataset} with {len(entries)} snapshots")
+            _write_manifest(dataset, entries, directory)
+        return entries
+    
+    mtime_ns = os.stat(path).st_mtime_ns
+    cached = _manifest_cache.get(path)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
+    
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)['snapshots']
+    _manifest_cache[path] = (mtime_ns, entries)
+    return entries
+
+def register_snapshot(dataset, path, timestamp, fund_date=None, directory=SAVE_DIR, **extra):
+    """
+    Record a newly written snapshot in the dataset manifest (atomic update).
+    
+    A snapshot with the same timestamp replaces the existing entry.
+    
+    Args:
+        dataset (str): Dataset name (see SNAPSHOT_DATASETS)
+        path (str): Path of the snapshot file
+        timestamp (str): Run timestamp (YYYYMMDDHHMM)
+        fund_date: Date the data is for (fund date, price date or FX date)
+        directory (str): Data directory holding the manifest
+        **extra: Additional fields stored with the entry
+        
+    Returns:
+        dict: The stored manifest entry
+    """
+    timestamp = str(timestamp).split('.')[0]
+    if not re.match(r'^\d{12}$', timestamp):
+        raise InvalidDataError(f"Invalid snapshot timestamp '{timestamp}' for dataset {dataset}.")
+    
+    entries = list(load_manifest(dataset, directory))
+    entry = {'timestamp': timestamp, 'fund_date': normalize_date_str(fund_date), 'path': path}
+    entry.update(extra)
+    
+    timestamps = [e['timestamp'] for e in entries]
+    pos = bisect.bisect_left(timestamps, timestamp)
+    if pos < len(entries) and entries[pos]['timestamp'] == timestamp:
+        entries[pos] = entry
+    else:
+        entries.insert(pos, entry)
+    
+    _write_manifest(dataset, entries, directory)
+    return entry
+
+def _newest_on_disk(dataset, directory=SAVE_DIR):
+    """Newest run timestamp among the dataset's snapshot file names (None if there are none)."""
+    if not os.path.isdir(directory):
+        return None
+    grammar = SNAPSHOT_DATASETS[dataset]
+    matches = (grammar.match(name) for name in os.listdir(directory))
+    return max((match.group('timestamp') for match in matches if match), default=None)
+
+def _sync_manifest(dataset, entries, directory=SAVE_DIR):
+    """
+    Add snapshots written without register_snapshot (copied in, restored, older scripts).
+    
+    Only the newest file name is compared with the manifest, so the check costs one
+    directory listing; when it isn't recorded, the unrecorded files are scanned in.
+    
+    Returns:
+        list: The manifest entries, updated if needed
+    """
+    newest = _newest_on_disk(dataset, directory)
+    known = {entry['timestamp'] for entry in entries}
+    if newest is None or newest in known:
+        return entries
+    
+    missing = _scan_snapshots(dataset, directory, known)
+    logging.warning(f"{len(missing)} {dataset} snapshots in {directory} were not in the manifest, adding them")
+    entries = sorted(list(entries) + missing, key=lambda entry: entry['timestamp'])
+    _write_manifest(dataset, entries, directory)
+    return entries
+
+def find_latest_snapshot(dataset, as_of=None, as_of_fund_date=None, directory=SAVE_DIR):
+    """
+    Find the latest snapshot of a dataset, optionally as of a point in time.
+    
+    Snapshot files newer than the newest manifest entry are added to the
+    manifest first (see _sync_manifest).
+    
+    Args:
+        dataset (str): Dataset name (see SNAPSHOT_DATASETS)
+        as_of: Latest snapshot taken at or before this run timestamp
+               (YYYYMMDDHHMM string or datetime); binary search
+        as_of_fund_date: Latest snapshot whose fund_date is on or before this date
+        directory (str): Data directory
+        
+    Returns:
+        dict: Manifest entry, or None if no snapshot qualifies
+    """
+    entries = _sync_manifest(dataset, load_manifest(dataset, directory), directory)
+    if not entries:
+        return None
+    
+    end = len(entries)
+    if as_of is not None:
+        if isinstance(as_of, datetime):
+            as_of = as_of.strftime("%Y%m%d%H%M")
+        timestamps = [e['timestamp'] for e in entries]
+        end = bisect.bisect_right(timestamps, str(as_of))
+    
+    fund_date_limit = normalize_date_str(as_of_fund_date) if as_of_fund_date is not None else None
+    
+    # Walk back from the newest candidate, skipping snapshots whose file is gone
+    for entry in reversed(entries[:end]):
+        if fund_date_limit and (not entry.get('fund_date') or entry['fund_date'] > fund_date_limit):
+            continue
+        if os.path.exists(entry['path']):
+            return entry
+    return None
+
 def find_latest_file(pattern, directory=SAVE_DIR):
     """
     Find the latest file matching a pattern in a directory.
     
+    Known snapshot patterns (see SNAPSHOT_PATTERNS) are resolved through the
+    dataset manifest, ordered by the timestamp embedded in the file name, so
+    "vix_futures_*.csv" no longer picks up vix_futures_yahoo_* or the master CSV.
+    Other patterns fall back to a glob ordered by embedded timestamp, then mtime.
+    
     Args:
         pattern (str): File pattern to match (e.g., "vix_futures_*.csv")
         directory (str): Directory to search in
@@ -338,6 +483,11 @@ def find_latest_file(pattern, directory=SAVE_DIR):
         str: Path to the latest file or None if no files found
     """
     try:
+        dataset = SNAPSHOT_PATTERNS.get(pattern)
+        if dataset:
+            entry = find_latest_snapshot(dataset, directory=directory)
+            return entry['path'] if entry else None
+        
         import glob
         
         # Get full pattern path
@@ -349,21 +499,41 @@ def find_latest_file(pattern, directory=SAVE_DIR):
         if not matching_files:
             return None
         
-        # Sort by modification time (newest first)
-        matching_files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
+        def sort_key(path):
+            match = re.search(r'(\d{12})', os.path.basename(path))
+            return (match.group(1) if match else "", os.path.getmtime(path))
         
         # Return the latest file
-        return matching_files[0]
+        return max(matching_files, key=sort_key)
     
     except Exception as e:
         logging.error(f"Error finding files with pattern {pattern}: {str(e)}")
         logging.error(traceback.format_exc())
         return None
 
+def _read_from_store(pattern, latest_file, directory):
+    """Rows of a snapshot from the columnar store, or None if it doesn't hold that run."""
+    dataset = SNAPSHOT_PATTERNS.get(pattern)
+    match = SNAPSHOT_DATASETS[dataset].match(os.path.basename(latest_file)) if dataset else None
+    if not match:
+        return None
+    import columnar_store
+    if dataset not in columnar_store.DATASET_COLUMNS:
+        return None
+    try:
+        return columnar_store.read_run(dataset, match.group('timestamp'), save_dir=directory)
+    except Exception as e:
+        logging.warning(f"Falling back to CSV for {latest_file}, columnar store read failed: {str(e)}")
+        return None
+
 def read_latest_file(pattern, default_cols=None, directory=SAVE_DIR):
     """
     Read the latest file matching the pattern into a pandas DataFrame.
     
+    The latest snapshot is resolved through the manifest; when the columnar
+    store holds that run, its rows are read from the store (with the dtypes
+    of the snapshot CSV), otherwise the CSV itself is read.
+    
     Args:
         pattern (str): File pattern to match (e.g., "vix_futures_*.csv")
         default_cols (list): Default column list if file doesn't exist
@@ -377,6 +547,10 @@ def read_latest_file(pattern, default_cols=None, directory=SAVE_DIR):
     if not latest_file:
         raise MissingCriticalDataError(f"No file found for pattern '{pattern}' in directory '{directory}'.")
     
+    df = _read_from_store(pattern, latest_file, directory)
+    if df is not None:
+        return df
+    
     try:
         df = pd.read_csv(latest_file)
         if df.empty:
@@ -388,49 +562,236 @@ def read_latest_file(pattern, default_cols=None, directory=SAVE_DIR):
         logging.error(traceback.format_exc())
         raise MissingCriticalDataError(f"Error reading file {latest_file}: {str(e)}")
 
-def map_position_to_contract(position):
+def map_position_to_contract(position, on_date=None):
     """
     Map a VIX futures position (1st, 2nd, 3rd month) to the actual contract code.
     
     Args:
         position (int): Position (1=front month, 2=second month, etc.)
+        on_date: Date to position contracts on (default today)
         
     Returns:
         str: VIX futures contract code (e.g., VXH5, VXJ5)
     """
-    if position < 1:
-        raise ValueError(f"Invalid position: {position} (must be >= 1)")
-    
-    # Get the next N VIX futures contracts
-    next_contracts = get_next_vix_contracts(position)
-    
-    # Return the contract at the specified position (1-indexed)
-    if position <= len(next_contracts):
-        return next_contracts[position-1]
-    else:
-        # If position is beyond what we calculated, calculate more
-        next_contracts = get_next_vix_contracts(position)
-        return next_contracts[position-1]
+    return vix_calendar.contract_at(position, on_date).code
 
-def map_contract_to_position(contract_code):
+def map_contract_to_position(contract_code, on_date=None):
     """
     Map a VIX futures contract code to its position (1st, 2nd, 3rd month).
     
     Args:
         contract_code (str): VIX futures contract code (e.g., VXH5, VXJ5)
+        on_date: Date to position contracts on (default today)
         
     Returns:
         int: Position (1=front month, 2=second month, etc.) or None if not found
     """
-    # Normalize the contract code
-    normalized_code = normalize_vix_ticker(contract_code)
+    # Look ahead 6 months
+    return vix_calendar.position_of(normalize_vix_ticker(contract_code), on_date, max_position=6)
+
+def _master_index_path(master_path):
+    """Path of the timestamp index sidecar kept next to a master CSV."""
+    return f"{master_path}.idx"
+
+def _save_master_index(master_path, index):
+    """Atomically write the index sidecar for a master CSV."""
+    index_path = _master_index_path(master_path)
+    temp_path = f"{index_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(temp_path, index_path)
+
+def _build_master_index(master_path, key_column):
+    """
+    Scan a master CSV once and record the byte offset of every key block.
+    
+    A block is a run of consecutive rows sharing the same key value (one block
+    per save run for the *_master.csv files).
+    
+    Args:
+        master_path (str): Path to the master CSV
+        key_column (str): Column used to identify a save run (e.g., 'timestamp')
+        
+    Returns:
+        dict: Index with the header columns, file size and ordered key blocks
+    """
+    blocks = []
+    with open(master_path, "rb") as f:
+        header_line = f.readline()
+        columns = next(csv.reader([header_line.decode("utf-8-sig")]))
+        columns = [col.strip() for col in columns]
+        if key_column not in columns:
+            raise InvalidDataError(f"Key column '{key_column}' not found in master CSV '{master_path}'.")
+        key_idx = columns.index(key_column)
+        
+        last_key = None
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            fields = next(csv.reader([line.decode("utf-8")]))
+            key = fields[key_idx].strip() if key_idx < len(fields) else ""
+            if key != last_key:
+                blocks.append([key, offset])
+                last_key = key
+        size = f.tell()
+    
+    return {
+        'key_column': key_column,
+        'columns': columns,
+        'size': size,
+        'blocks': blocks
+    }
+
+def load_master_index(master_path, key_column='timestamp'):
+    """
+    Load the index sidecar of a master CSV, rebuilding it if it is missing or stale.
     
-    # Get the next several contracts to search
-    next_contracts = get_next_vix_contracts(6)  # Look ahead 6 months
+    The index is considered stale when the recorded file size no longer matches
+    the master CSV (e.g., after a git merge or a manual edit).
     
-    # Find the position
-    if normalized_code in next_contracts:
-        return next_contracts.index(normalized_code) + 1  # 1-indexed
+    Args:
+        master_path (str): Path to the master CSV
+        key_column (str): Column used to identify a save run
+        
+    Returns:
+        dict: Index dictionary, or None if the master CSV does not exist
+    """
+    if not os.path.exists(master_path):
+        return None
     
-    # Not found in the next 6 months
-    return None
+    index_path = _master_index_path(master_path)
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get('size') == os.path.getsize(master_path) and index.get('key_column') == key_column:
+                return index
+        except (ValueError, OSError) as e:
+            logging.warning(f"Ignoring unreadable master index {index_path}: {str(e)}")
+    
+    logging.info(f"Rebuilding master index for {master_path}")
+    index = _build_master_index(master_path, key_column)
+    _save_master_index(master_path, index)
+    return index
+
+def read_master_keys(master_path, key_column='timestamp'):
+    """
+    Return the ordered list of distinct key values stored in a master CSV
+    without reading the CSV itself.
+    """
+    index = load_master_index(master_path, key_column)
+    if index is None:
+        return []
+    return list(dict.fromkeys(key for key, _ in index['blocks']))
+
+def _rewrite_master(df, master_path, key_column):
+    """Slow path: full read-filter-rewrite of a master CSV, followed by a fresh index."""
+    master_df = pd.read_csv(master_path, dtype={key_column: str})
+    new_keys = set(df[key_column].astype(str))
+    master_df = master_df[~master_df[key_column].astype(str).isin(new_keys)]
+    combined_df = pd.concat([master_df, df], ignore_index=True)
+    combined_df.to_csv(master_path, index=False)
+    _save_master_index(master_path, _build_master_index(master_path, key_column))
+
+def write_master(df, master_path, key_column='timestamp'):
+    """
+    Atomically replace a master CSV with the given rows and rebuild its index.
+    
+    Used by bulk jobs (backfills) that rebuild history; regular runs use append_to_master.
+    
+    Args:
+        df (pandas.DataFrame): Complete master content, rows of one key kept together
+        master_path (str): Path to the master CSV
+        key_column (str): Column used to identify a save run
+        
+    Returns:
+        str: Path to the master CSV
+    """
+    temp_path = f"{master_path}.tmp"
+    df.to_csv(temp_path, index=False)
+    os.replace(temp_path, master_path)
+    _save_master_index(master_path, _build_master_index(master_path, key_column))
+    return master_path
+
+def append_to_master(df, master_path, key_column='timestamp'):
+    """
+    Append a batch of rows to a master CSV without rewriting its history.
+    
+    Rows already stored under the same key (a re-run of the same timestamp) are
+    replaced. When that key is the last block in the file - the normal re-run
+    case - the file is truncated at the block offset and the new rows are
+    appended, so the cost is independent of the size of the master. Only a
+    re-run of an older key or a schema change falls back to a full rewrite.
+    
+    Args:
+        df (pandas.DataFrame): Rows to store, all sharing one key value
+        master_path (str): Path to the master CSV
+        key_column (str): Column used to identify a save run
+        
+    Returns:
+        str: Path to the master CSV
+    """
+    if df is None or df.empty:
+        raise InvalidDataError(f"Cannot append an empty DataFrame to master CSV '{master_path}'.")
+    if key_column not in df.columns:
+        raise InvalidDataError(f"Key column '{key_column}' missing from data for master CSV '{master_path}'.")
+    
+    keys = df[key_column].astype(str).unique()
+    if len(keys) != 1:
+        raise InvalidDataError(f"Expected a single '{key_column}' value per append to '{master_path}', got {len(keys)}.")
+    key = keys[0]
+    
+    # Create new master file
+    if not os.path.exists(master_path) or os.path.getsize(master_path) == 0:
+        df.to_csv(master_path, index=False)
+        _save_master_index(master_path, _build_master_index(master_path, key_column))
+        return master_path
+    
+    index = load_master_index(master_path, key_column)
+    columns = index['columns']
+    
+    # New columns cannot be appended under the existing header
+    if any(col not in columns for col in df.columns):
+        logging.info(f"Schema change detected for {master_path}, rewriting master CSV")
+        _rewrite_master(df, master_path, key_column)
+        return master_path
+    
+    blocks = index['blocks']
+    key_offsets = [offset for block_key, offset in blocks if block_key == key]
+    write_offset = index['size']
+    
+    if key_offsets:
+        if len(key_offsets) == 1 and blocks[-1][0] == key:
+            # Re-run of the latest save: drop the last block and write it again
+            write_offset = key_offsets[0]
+            blocks = blocks[:-1]
+        else:
+            logging.info(f"Replacing older key {key} in {master_path}, rewriting master CSV")
+            _rewrite_master(df, master_path, key_column)
+            return master_path
+    
+    payload = df.reindex(columns=columns).to_csv(index=False, header=False).encode("utf-8")
+    
+    with open(master_path, "r+b") as f:
+        # Make sure the previous row is newline-terminated before appending
+        if write_offset > 0:
+            f.seek(write_offset - 1)
+            if f.read(1) != b"\n":
+                f.seek(write_offset)
+                f.write(b"\n")
+                write_offset += 1
+        f.seek(write_offset)
+        f.write(payload)
+        f.truncate()
+        size = f.tell()
+    
+    blocks.append([key, write_offset])
+    index['blocks'] = blocks
+    index['size'] = size
+    _save_master_index(master_path, index)
+    
+    return master_path
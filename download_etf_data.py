@@ -1,10 +1,11 @@
 import os
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
 from datetime import datetime
 import traceback
-from common import setup_logging, SAVE_DIR, MissingCriticalDataError, InvalidDataError
+from common import setup_logging, SAVE_DIR, MissingCriticalDataError, InvalidDataError, register_snapshot
+from pcf_reader import read_pcf_bytes, remember_path, store_blob, blob_path, write_snapshot
+import http_client
 
 # Set up logging
 logger = setup_logging('etf_downloader')
@@ -13,8 +14,12 @@ def download_simplex_etf_data():
     """
     Download ETF data file for Simplex ETF 318A (CSV/PCF format)
     
+    The page and the file are fetched conditionally over the shared HTTP
+    client; unchanged (304) responses reuse the links and Fund Date parsed
+    on the previous run.
+    
     Returns:
-        str: Path to downloaded file
+        str: Path to the timestamped snapshot file
     """
     try:
         logger.info("Downloading Simplex ETF 318A data")
@@ -22,29 +27,28 @@ def download_simplex_etf_data():
         # URL of the Simplex ETF page
         url = "https://www.simplexasset.com/etf/eng/etf.html"
         
-        # Get the HTML content while bypassing SSL verification
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        # Suppress SSL warnings
+        # Suppress SSL warnings (the page is fetched without SSL verification)
         import urllib3
         urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
         
         logger.debug(f"Requesting URL: {url}")
-        response = requests.get(url, headers=headers, verify=False)
-        response.raise_for_status()
-        
-        # Parse the HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
+        page = http_client.fetch(url, verify=False, source='simplex_page')
         
-        # Find download links for ETF 318A (either CSV or PCF)
-        links = []
-        for input_tag in soup.find_all("input", {"type": "image"}):
-            onclick = input_tag.get("onclick", "")
-            if "318A" in onclick:
-                file_link = onclick.split("'")[1]
-                links.append((file_link, "PCF" if ".pcf" in file_link.lower() else "CSV"))
+        if page.not_modified and page.parsed:
+            logger.info("Simplex ETF page not modified since the last run, reusing its download links")
+            links = [tuple(link) for link in page.parsed]
+        else:
+            # Parse the HTML
+            soup = BeautifulSoup(page.content, 'html.parser')
+            
+            # Find download links for ETF 318A (either CSV or PCF)
+            links = []
+            for input_tag in soup.find_all("input", {"type": "image"}):
+                onclick = input_tag.get("onclick", "")
+                if "318A" in onclick:
+                    file_link = onclick.split("'")[1]
+                    links.append((file_link, "PCF" if ".pcf" in file_link.lower() else "CSV"))
+            http_client.store_parsed(page, links)
         
         if not links:
             raise MissingCriticalDataError("No ETF 318A download links found on the Simplex webpage.")
@@ -58,41 +62,48 @@ def download_simplex_etf_data():
                 file_url = f"https://www.simplexasset.com/etf/{link}"
                 
             logger.info(f"Downloading {format_type} from URL: {file_url}")
-            file_response = requests.get(file_url, headers=headers, verify=False)
-            file_response.raise_for_status()
-            
-            # Temporary save path
-            temp_path = os.path.join(SAVE_DIR, f"temp_318A.csv")
-            
-            with open(temp_path, "wb") as file:
-                file.write(file_response.content)
-            
-            # Try to read the file to extract Fund Date
-            try:
-                df = pd.read_csv(temp_path)
-                raw_fund_date_val = None
-                if 'Fund Date' in df.columns and len(df) > 0:
-                    raw_fund_date_val = df["Fund Date"].iloc[0]
-                    fund_date = str(raw_fund_date_val).replace("/", "").strip()
-                    if fund_date.lower() == "nan" or not fund_date: # Check for empty string after strip
-                        raise InvalidDataError(f"Extracted Fund Date is missing or invalid: '{raw_fund_date_val}' from file {temp_path}")
-                else:
-                    raise MissingCriticalDataError(f"'Fund Date' column not found or empty in downloaded file {temp_path}")
-            except Exception as e: # Catch pandas errors or our own above
-                # If it's already one of our custom errors, re-raise, otherwise wrap it.
-                if isinstance(e, (MissingCriticalDataError, InvalidDataError)):
-                    raise
-                raise InvalidDataError(f"Could not extract valid Fund Date from downloaded file {temp_path}: {str(e)}") from e
+            file_response = http_client.fetch(file_url, verify=False, source='simplex_pcf')
             
             # Get current date-time
             current_datetime = datetime.now().strftime("%Y%m%d%H%M")
             
-            # Define final file name
+            pcf = None
+            cached = file_response.parsed if file_response.not_modified else None
+            if cached and os.path.exists(blob_path(cached['sha256'])):
+                # Unchanged file: its blob is already stored, skip the parse
+                fund_date, sha256 = cached['fund_date'], cached['sha256']
+                blob = blob_path(sha256)
+                logger.info(f"PCF file not modified since the last run (sha256 {sha256[:12]}), reusing {blob}")
+            else:
+                # Parse the downloaded content once to extract Fund Date (shared with later stages)
+                try:
+                    pcf = read_pcf_bytes(file_response.content, file_url)
+                    fund_date = pcf.header['fund_date']
+                    if not fund_date:
+                        raise MissingCriticalDataError(f"'Fund Date' column not found or empty in downloaded file {file_url}")
+                except Exception as e: # Catch parse errors or our own above
+                    # If it's already one of our custom errors, re-raise, otherwise wrap it.
+                    if isinstance(e, (MissingCriticalDataError, InvalidDataError)):
+                        raise
+                    raise InvalidDataError(f"Could not extract valid Fund Date from downloaded file {file_url}: {str(e)}") from e
+                
+                # Store the payload once per content
+                sha256 = pcf.sha256
+                blob, is_new = store_blob(file_response.content, sha256)
+                remember_path(blob, pcf)
+                if not is_new:
+                    logger.info(f"PCF content unchanged (sha256 {sha256[:12]}), reusing {blob}")
+                http_client.store_parsed(file_response, {'fund_date': fund_date, 'sha256': sha256})
+            
+            # Timestamped snapshot with the blob's content (a hard link where possible)
             final_filename = f"318A-{format_type}-{fund_date}-{current_datetime}.csv"
             final_path = os.path.join(SAVE_DIR, final_filename)
+            write_snapshot(blob, final_path)
+            if pcf is not None:
+                remember_path(final_path, pcf)
             
-            # Rename file to final filename
-            os.rename(temp_path, final_path)
+            # Record the snapshot in the manifest
+            register_snapshot('pcf', final_path, current_datetime, fund_date=fund_date, sha256=sha256)
             
             logger.info(f"ETF {format_type} file saved successfully to: {final_path}")
             return final_path
@@ -1,31 +1,26 @@
 import os
 import pandas as pd
-import glob
-import re
 from datetime import datetime
 import logging
-from common import setup_logging, SAVE_DIR, MONTH_CODES, normalize_vix_ticker, MissingCriticalDataError, InvalidDataError
+from common import setup_logging, SAVE_DIR, normalize_vix_ticker, MissingCriticalDataError, InvalidDataError, \
+    append_to_master, register_snapshot, find_latest_snapshot
+from pcf_reader import read_pcf
+from vix_contracts import parse_contract
+import columnar_store
 
 # Set up logging
 logger = setup_logging('etf_characteristics')
 
 def find_latest_etf_file():
     """Find the latest Simplex ETF 318A file in the data directory."""
-    file_patterns = [
-        os.path.join(SAVE_DIR, "318A-*.csv"),
-        os.path.join(SAVE_DIR, "318A*.csv")
-    ]
+    # Resolved through the PCF manifest by the timestamp in the filename
+    entry = find_latest_snapshot('pcf')
     
-    all_files = []
-    for pattern in file_patterns:
-        all_files.extend(glob.glob(pattern))
-    
-    if not all_files:
+    if entry is None:
         logger.error("No Simplex ETF 318A files found")
         return None
     
-    # Get the most recent file based on the timestamp in the filename
-    latest_file = max(all_files, key=os.path.getmtime)
+    latest_file = entry['path']
     logger.info(f"Found latest Simplex ETF file: {latest_file}")
     return latest_file
 
@@ -42,76 +37,25 @@ def extract_vix_future_code(code, name):
     """
     if pd.isna(code) and pd.isna(name):
         return None
-        
-    code_str = str(code) if not pd.isna(code) else ""
-    name_str = str(name) if not pd.isna(name) else ""
     
-    # Define patterns to match VIX futures
-    patterns = [
-        # Pattern for direct VX codes like VXH5 or VXH25
-        re.compile(r'VX([A-Z])(\d{1,2})', re.IGNORECASE),
-        
-        # Pattern for CBOEVIX YYMM format (e.g., CBOEVIX 2503 for March 2025)
-        re.compile(r'CBOEVIX\s*(\d{4})', re.IGNORECASE),
-        
-        # Pattern for VIX FUTURE MMM-YY format (e.g., VIX FUTURE MAR-25)
-        re.compile(r'VIX\s*(?:FUT|FUTURE)\s*(\w{3})[-\s]*(\d{2})', re.IGNORECASE)
-    ]
-    
-    # Check both code and name for matches
-    for text in [code_str, name_str]:
-        for pattern in patterns:
-            match = pattern.search(text)
-            if match:
-                # Process based on which pattern matched
-                if pattern == patterns[0]:  # VXH5/VXH25 pattern
-                    month_letter = match.group(1)
-                    year_digits = match.group(2)
-                    
-                    # Normalize to use only last digit of year
-                    year_digit = year_digits[-1] if len(year_digits) > 0 else year_digits
-                    return f"VX{month_letter}{year_digit}"
-                    
-                elif pattern == patterns[1]:  # CBOEVIX 2503 format
-                    yymm = match.group(1)
-                    if len(yymm) == 4:
-                        year = yymm[:2]
-                        month = int(yymm[2:])
-                        
-                        # Map month number to VIX futures month code
-                        month_map = {
-                            1: 'F', 2: 'G', 3: 'H', 4: 'J', 5: 'K', 6: 'M',
-                            7: 'N', 8: 'Q', 9: 'U', 10: 'V', 11: 'X', 12: 'Z'
-                        }
-                        
-                        if month in month_map:
-                            # Use only last digit of year
-                            return f"VX{month_map[month]}{year[-1]}"
-                            
-                elif pattern == patterns[2]:  # VIX FUTURE MAR-25 format
-                    month_str = match.group(1).upper()
-                    year = match.group(2)
-                    
-                    # Convert month name to code
-                    month_map = {
-                        'JAN': 'F', 'FEB': 'G', 'MAR': 'H', 'APR': 'J', 
-                        'MAY': 'K', 'JUN': 'M', 'JUL': 'N', 'AUG': 'Q',
-                        'SEP': 'U', 'OCT': 'V', 'NOV': 'X', 'DEC': 'Z'
-                    }
-                    
-                    if month_str in month_map:
-                        # Use only last digit of year
-                        return f"VX{month_map[month_str]}{year[-1]}"
+    # Check both code and name for a contract symbol (VXH5, CBOEVIX 2503, VIX FUTURE MAR-25, ...)
+    for text in [code, name]:
+        if pd.isna(text):
+            continue
+        contract = parse_contract(str(text))
+        if contract is not None:
+            return contract.code
     
     # If we get here, no valid VIX future code was found
     return None
 
-def parse_etf_characteristics(file_path=None):
+def parse_etf_characteristics(file_path=None, timestamp=None):
     """
     Parse ETF characteristics from PCF file using a simplified approach
     
     Args:
         file_path: Path to PCF file (optional, will find latest if not provided)
+        timestamp: Timestamp to record (YYYYMMDDHHMM, default now; backfills pass the PCF's own)
     
     Returns:
         dict: Dictionary with ETF characteristics
@@ -125,13 +69,12 @@ def parse_etf_characteristics(file_path=None):
         
         logger.info(f"Parsing ETF characteristics from PCF file: {file_path}")
         
-        # Check if file exists
-        if not os.path.exists(file_path):
-            raise MissingCriticalDataError(f"PCF file not found: {file_path}")
+        # Tokenize the file once; header and holdings below come from the same parse
+        pcf = read_pcf(file_path)
         
         # Initialize characteristics
         characteristics = {
-            'timestamp': datetime.now().strftime("%Y%m%d%H%M"),
+            'timestamp': timestamp or datetime.now().strftime("%Y%m%d%H%M"),
             'fund_date': None,
             'shares_outstanding': None,
             'fund_cash_component': None,
@@ -141,61 +84,38 @@ def parse_etf_characteristics(file_path=None):
             'far_future': None     # Changed from 'far_future_code' to 'far_future'
         }
         
-        # 1. Read the header section (first 2 rows) to get fund info
+        # 1. Header section (first 2 rows) holds the fund info
         try:
-            header_df = pd.read_csv(file_path, nrows=2)
-            logger.info(f"Header columns: {header_df.columns.tolist()}")
+            header = pcf.header
+            logger.info(f"Header columns: {list(pcf.raw_header)}")
             
-            # Extract fund date
-            if 'Fund Date' in header_df.columns and not header_df['Fund Date'].isna().all():
-                fund_date = str(header_df['Fund Date'].iloc[0]).strip()
-                # Convert format if needed (sometimes it's YYYYMMDD, sometimes MM/DD/YYYY)
-                if '/' in fund_date:
-                    date_parts = fund_date.split('/')
-                    if len(date_parts) == 3:
-                        # Convert MM/DD/YYYY to YYYYMMDD
-                        fund_date = f"{date_parts[2]}{date_parts[0].zfill(2)}{date_parts[1].zfill(2)}"
-                characteristics['fund_date'] = fund_date
-                logger.info(f"Found fund date: {fund_date}")
+            # Fund date is normalized to YYYYMMDD by the reader
+            if header['fund_date']:
+                characteristics['fund_date'] = header['fund_date']
+                logger.info(f"Found fund date: {header['fund_date']}")
             else:
                 raise MissingCriticalDataError("Fund Date not found in PCF header.")
             
             # Extract shares outstanding
-            if 'Shares Outstanding' in header_df.columns and not header_df['Shares Outstanding'].isna().all():
-                shares_value = header_df['Shares Outstanding'].iloc[0]
-                try:
-                    # Convert from float to int if it's a number with decimal
-                    if isinstance(shares_value, float):
-                        characteristics['shares_outstanding'] = int(shares_value)
-                    else:
-                        shares_str = str(shares_value).strip()
-                        characteristics['shares_outstanding'] = int(float(shares_str))
-                    logger.info(f"Found shares outstanding: {characteristics['shares_outstanding']}")
-                except (ValueError, TypeError):
-                    raise InvalidDataError(f"Could not convert Shares Outstanding '{shares_value}' to integer.")
+            if header['shares_outstanding'] is not None:
+                characteristics['shares_outstanding'] = header['shares_outstanding']
+                logger.info(f"Found shares outstanding: {characteristics['shares_outstanding']}")
             else:
                 raise MissingCriticalDataError("Shares Outstanding not found in PCF header.")
             
             # Extract fund cash component
-            if 'Fund Cash Component' in header_df.columns and not header_df['Fund Cash Component'].isna().all():
-                cash_str = str(header_df['Fund Cash Component'].iloc[0]).strip()
-                try:
-                    characteristics['fund_cash_component'] = float(cash_str)
-                    logger.info(f"Found fund cash component: {cash_str}")
-                except ValueError:
-                    raise InvalidDataError(f"Could not convert Fund Cash Component '{cash_str}' to float.")
+            if header['fund_cash_component'] is not None:
+                characteristics['fund_cash_component'] = header['fund_cash_component']
+                logger.info(f"Found fund cash component: {header['fund_cash_component']}")
             else:
                 raise MissingCriticalDataError("Fund Cash Component not found in PCF header.")
         except Exception as e:
             raise InvalidDataError(f"Error parsing PCF header: {str(e)}")
         
-        # 2. Read the holding section (starting from row 4)
+        # 2. Holding section (starting from row 4)
         try:
-            # Skip the first 3 rows (header section and blank row)
-            holdings_df = pd.read_csv(file_path, skiprows=3)
+            holdings_df = pcf.holdings
             logger.info(f"Holdings columns: {holdings_df.columns.tolist()}")
-            holdings_df.columns = holdings_df.columns.str.strip()
-            logger.info(f"Stripped holdings columns: {holdings_df.columns.tolist()}") # Log the new column names
             
             # Look for the CBOEVIX futures in the holdings
             futures_rows = []
@@ -280,32 +200,14 @@ def parse_etf_characteristics(file_path=None):
             # It has been removed.
             
             # Sort futures by contract date/code
+            # Resolve contract years relative to the fund date, so backfilled files sort correctly
+            as_of_year = int(characteristics['fund_date'][:4]) if characteristics.get('fund_date') else None
             def sort_vix_futures(item):
                 code, _, _, _ = item
-                if not code or len(code) < 4:
-                    return "ZZZ999"  # Sort unknown codes last
-                
-                # Extract month and year
-                month_code = code[2]
-                year_digit = code[3]
-                
-                # Convert month code to number (1-12)
-                month_num = 0
-                for key, value in MONTH_CODES.items():
-                    if key == month_code:
-                        month_num = value
-                        break
-                
-                # Create sortable string: YYYYMM
-                current_year = datetime.now().year
-                decade = int(current_year / 10) * 10
-                full_year = decade + int(year_digit)
-                
-                # If the resulting year is in the past, assume next decade
-                if full_year < current_year:
-                    full_year += 10
-                
-                return f"{full_year}{month_num:02d}"
+                contract = parse_contract(code, as_of_year)
+                if contract is None:
+                    return (9999, 99)  # Sort unknown codes last
+                return (contract.year, contract.month)
             
             # Sort futures by contract date (nearest first)
             sorted_futures = sorted(futures_rows, key=sort_vix_futures)
@@ -343,13 +245,14 @@ def parse_etf_characteristics(file_path=None):
         logger.error(f"Exception details:", exc_info=True)
         raise InvalidDataError(f"Overall error parsing ETF characteristics from {file_path}: {str(e)}") from e
 
-def save_etf_characteristics(characteristics, save_dir=SAVE_DIR):
+def save_etf_characteristics(characteristics, save_dir=SAVE_DIR, source_sha256=None):
     """
     Save ETF characteristics to CSV file
     
     Args:
         characteristics: Dictionary with ETF characteristics
         save_dir: Directory to save the file
+        source_sha256: Content hash of the PCF file the characteristics were parsed from
     
     Returns:
         str: Path to saved file
@@ -366,26 +269,26 @@ def save_etf_characteristics(characteristics, save_dir=SAVE_DIR):
     daily_file = os.path.join(save_dir, f"etf_characteristics_{timestamp}.csv")
     df.to_csv(daily_file, index=False)
     
+    # Record the snapshot in the manifest
+    register_snapshot('etf_characteristics', daily_file, timestamp,
+                      fund_date=characteristics.get('fund_date'), directory=save_dir,
+                      source_sha256=source_sha256)
+    
     # Master file path
     master_file = os.path.join(save_dir, "etf_characteristics_master.csv")
     
-    # Append to master file if it exists, otherwise create it
-    if os.path.exists(master_file):
-        try:
-            master_df = pd.read_csv(master_file)
-            
-            # Avoid duplicate timestamp entries
-            master_df = master_df[master_df['timestamp'] != timestamp]
-            
-            # Append new data
-            combined_df = pd.concat([master_df, df], ignore_index=True)
-            combined_df.to_csv(master_file, index=False)
-        except Exception as e:
-            logger.error(f"Error updating master CSV: {str(e)}")
-            # If error, just write new file
-            df.to_csv(master_file, index=False)
-    else:
-        df.to_csv(master_file, index=False)
+    # Append to master file (re-runs with the same timestamp replace their row)
+    try:
+        append_to_master(df, master_file, key_column='timestamp')
+    except Exception as e:
+        logger.error(f"Error updating master CSV: {str(e)}")
+        raise InvalidDataError(f"Failed to write to master CSV '{master_file}': {str(e)}") from e
+    
+    # Columnar history store (secondary copy, never fails the run)
+    try:
+        columnar_store.write_partition('etf_characteristics', df, save_dir)
+    except Exception as e:
+        logger.warning(f"Could not write ETF characteristics to columnar store: {str(e)}")
     
     logger.info(f"Saved ETF characteristics to {daily_file} and {master_file}")
     return daily_file
@@ -395,9 +298,23 @@ def process_etf_characteristics():
     logger.info("Starting ETF characteristics processing")
     
     try:
-        characteristics = parse_etf_characteristics()
+        pcf_entry = find_latest_snapshot('pcf')
+        if pcf_entry is None:
+            raise MissingCriticalDataError("No Simplex ETF 318A file found.")
+        
+        # Skip the parse when the latest PCF content was already processed
+        source_sha256 = pcf_entry.get('sha256')
+        latest = find_latest_snapshot('etf_characteristics')
+        if source_sha256 and latest and latest.get('source_sha256') == source_sha256:
+            logger.info(f"PCF content unchanged (sha256 {source_sha256[:12]}), "
+                        f"characteristics already saved in {latest['path']}")
+            return True
+        
+        characteristics = parse_etf_characteristics(pcf_entry['path'])
         if characteristics: # Should always be true if no exception
-            file_path = save_etf_characteristics(characteristics)
+            # Memoized: the file was read once by parse_etf_characteristics
+            source_sha256 = read_pcf(pcf_entry['path']).sha256
+            file_path = save_etf_characteristics(characteristics, source_sha256=source_sha256)
             if file_path:
                 logger.info(f"Successfully saved ETF characteristics to {file_path}")
                 return True
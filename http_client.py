@@ -0,0 +1,189 @@
+"""
+Shared HTTP client for the requests-based downloaders (MUFG FX, Simplex page and PCF).
+
+One requests.Session per process keeps connections alive and pooled per
+host, so repeated downloads from the same site reuse the TCP/TLS connection.
+
+fetch() makes conditional GETs: the ETag and Last-Modified validators of
+every response are kept in an on-disk cache (data/http_cache/, one entry per
+URL, with the body) and sent back as If-None-Match / If-Modified-Since on the
+next run. A 304 Not Modified returns the cached body with not_modified=True.
+The cache is not committed; in CI each job restores and saves it with
+actions/cache (keyed per job), so runs after the first can get 304s.
+Callers can store what they parsed from a response with store_parsed(); on
+a 304 it comes back as result.parsed, so the parse stage is skipped:
+
+    result = http_client.fetch(url)
+    data = result.parsed if result.not_modified and result.parsed is not None else parse(result.content)
+    http_client.store_parsed(result, data)
+
+Requests go through the cassette store (see cassette.py): in record mode the
+full bodies are saved per source, in replay mode they are served from it
+without touching the network.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import namedtuple
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+from common import SAVE_DIR
+import cassette
+
+logger = logging.getLogger('http_client')
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# Validator cache: per URL, <sha1 of url>.json (validators, parsed data) and the body
+CACHE_DIR = os.path.join(SAVE_DIR, "http_cache")
+
+# Seconds allowed for connect and read
+HTTP_TIMEOUT = 30
+
+# Connections kept per host, and retries of failed connects / 5xx on GET
+POOL_SIZE = 4
+RETRIES = 2
+
+# content: bytes; status: HTTP status of the request (304 on a cache hit);
+# parsed: data stored with store_parsed() for this body, or None
+HTTPResult = namedtuple('HTTPResult', ['url', 'status', 'content', 'not_modified', 'headers', 'parsed'])
+
+_session = None
+_session_lock = threading.Lock()
+_cache_lock = threading.Lock()
+
+def get_session():
+    """
+    Return the process-wide pooled session (created on first use).
+
+    Returns:
+        requests.Session: Session with keep-alive connection pools and connect retries
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers['User-Agent'] = USER_AGENT
+            retry = Retry(total=RETRIES, connect=RETRIES, read=0, backoff_factor=0.5,
+                          status_forcelist=(502, 503, 504), allowed_methods=frozenset(['GET', 'HEAD']))
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+def _cache_path(url, cache_dir):
+    return os.path.join(cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+def _write_atomic(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+def _load_entry(url, cache_dir):
+    """Cached validators and body of a URL, or (None, None)."""
+    path = _cache_path(url, cache_dir)
+    try:
+        with open(f"{path}.json", "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        with open(path, "rb") as f:
+            return entry, f.read()
+    except (OSError, ValueError):
+        return None, None
+
+def _save_entry(url, entry, cache_dir, content=None):
+    path = _cache_path(url, cache_dir)
+    if content is not None:
+        _write_atomic(path, content)
+    _write_atomic(f"{path}.json", json.dumps(dict(entry, url=url), indent=1).encode('utf-8'))
+
+def decode(content, headers):
+    """Decode a body like requests' Response.text (charset from Content-Type, else detected)."""
+    encoding = requests.utils.get_encoding_from_headers(CaseInsensitiveDict(headers or {}))
+    if not encoding:
+        encoding = requests.compat.chardet.detect(content)['encoding'] or 'utf-8'
+    return content.decode(encoding, errors='replace')
+
+def fetch(url, headers=None, verify=True, timeout=HTTP_TIMEOUT, conditional=True, cache_dir=CACHE_DIR,
+          source='http'):
+    """
+    GET a URL over the pooled session, conditionally when validators are cached.
+
+    Args:
+        url (str): URL to fetch
+        headers (dict): Extra request headers
+        verify (bool): Verify TLS certificates
+        timeout (float): Seconds allowed for connect and read
+        conditional (bool): Use the validator cache (False: plain GET, nothing cached)
+        cache_dir (str): Validator cache directory
+        source (str): Cassette source name of the downloader
+
+    Returns:
+        HTTPResult: Response body (the cached one on 304) and whether it is unchanged
+
+    Raises:
+        requests.exceptions.RequestException: On connection errors and HTTP error statuses
+    """
+    recording = cassette.mode()
+    if recording == 'replay':
+        content, meta = cassette.load(source, url)
+        return HTTPResult(url, meta['status'], content, False, CaseInsensitiveDict(meta['headers']), None)
+    # Recordings hold full bodies
+    conditional = conditional and recording == 'live'
+
+    request_headers = dict(headers or {})
+    with _cache_lock:
+        entry, cached_body = _load_entry(url, cache_dir) if conditional else (None, None)
+    if entry:
+        if entry.get('etag'):
+            request_headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            request_headers['If-Modified-Since'] = entry['last_modified']
+
+    start = time.time()
+    response = get_session().get(url, headers=request_headers, verify=verify, timeout=timeout)
+
+    if response.status_code == 304 and cached_body is not None:
+        logger.info(f"{url} not modified ({time.time() - start:.2f}s), using cached body")
+        return HTTPResult(url, 304, cached_body, True, response.headers, entry.get('parsed'))
+
+    response.raise_for_status()
+    logger.debug(f"Fetched {url}: {response.status_code}, {len(response.content)} bytes in {time.time() - start:.2f}s")
+
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
+    if recording == 'record':
+        kept = {name: response.headers[name] for name in ('Content-Type', 'ETag', 'Last-Modified') if name in response.headers}
+        cassette.save(source, url, response.content, headers=kept, status=response.status_code)
+    elif conditional and (etag or last_modified):
+        with _cache_lock:
+            _save_entry(url, {'etag': etag, 'last_modified': last_modified, 'parsed': None,
+                              'fetched': time.strftime("%Y%m%d%H%M")}, cache_dir, response.content)
+    return HTTPResult(url, response.status_code, response.content, False, response.headers, None)
+
+def store_parsed(result, parsed, cache_dir=CACHE_DIR):
+    """
+    Remember data parsed from a fetched body (JSON-serializable), returned as result.parsed on a 304.
+
+    Does nothing if the response carried no validators (or was replayed).
+    """
+    if cassette.mode() == 'replay':
+        return
+    with _cache_lock:
+        path = f"{_cache_path(result.url, cache_dir)}.json"
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return
+        if entry.get('parsed') == parsed:
+            return
+        entry['parsed'] = parsed
+        _save_entry(result.url, entry, cache_dir)
@@ -0,0 +1,215 @@
+"""
+1-minute bar cache for valuing the basket at an exact instant (e.g. the 15:00 JST TSE close).
+
+Closes of 1-minute Yahoo bars are kept per symbol under data/intraday/ (one CSV
+of bar start times in epoch seconds and closes, and one JSON file with the
+time range already fetched) and held in memory as sorted numpy arrays:
+
+    data/intraday/USDJPY_X.csv     time,close
+    data/intraday/USDJPY_X.json    {"symbol": "USDJPY=X", "covered_start": 1792040400, "covered_end": 1792062000}
+
+price_at() finds the last bar that closed at or before an instant with a
+binary search, so once the bars are cached a valuation is an O(log n) local
+lookup. Only the part of the LOOKBACK window before the instant that isn't
+covered yet is fetched, and the last SETTLE_SECONDS before now are never
+marked covered (those bars are still forming); an empty response marks
+nothing covered. Yahoo serves 1-minute bars for the last YAHOO_MINUTE_DAYS
+days only; older instants return None unless their bars were cached at the
+time.
+
+    python intraday_bars.py USDJPY=X ^VFTW1 318A.T --at "2026-10-15 15:00"
+"""
+import os
+import re
+import json
+import logging
+import argparse
+import threading
+from collections import namedtuple, defaultdict
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytz
+from common import SAVE_DIR
+from price_utils import get_market_data
+
+logger = logging.getLogger('intraday_bars')
+
+INTRADAY_DIR = os.path.join(SAVE_DIR, "intraday")
+
+BAR_SECONDS = 60
+
+# Seconds of bars fetched before an instant, and the oldest bar accepted as its price
+LOOKBACK = 6 * 3600
+MAX_STALENESS = 15 * 60
+
+# Most recent seconds never marked as fetched (bars still forming)
+SETTLE_SECONDS = 120
+
+# Days of 1-minute history Yahoo serves
+YAHOO_MINUTE_DAYS = 29
+
+# times: int64 bar start times (epoch seconds, ascending); closes: float64
+Bars = namedtuple('Bars', ['times', 'closes'])
+
+_bars = {}
+_symbol_locks = defaultdict(threading.Lock)
+
+def _symbol_path(symbol, directory=INTRADAY_DIR):
+    return os.path.join(directory, re.sub(r'[^A-Za-z0-9.-]', '_', symbol))
+
+def epoch_seconds(value, tz='Asia/Tokyo'):
+    """Epoch seconds of a datetime or string; naive values are taken in tz (JST by default)."""
+    value = pd.Timestamp(value)
+    if value.tzinfo is None:
+        value = value.tz_localize(tz)
+    return int(value.timestamp())
+
+def load(symbol, directory=INTRADAY_DIR):
+    """
+    Cached bars and metadata of a symbol.
+
+    Returns:
+        tuple: (Bars, metadata dict); empty Bars and None if nothing is cached
+    """
+    key = (directory, symbol)
+    if key in _bars:
+        return _bars[key]
+    path = _symbol_path(symbol, directory)
+    try:
+        with open(f"{path}.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        frame = pd.read_csv(f"{path}.csv", dtype={'time': np.int64, 'close': np.float64})
+        bars = Bars(frame['time'].to_numpy(), frame['close'].to_numpy())
+    except (OSError, ValueError, KeyError):
+        bars, meta = Bars(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)), None
+    _bars[key] = (bars, meta)
+    return bars, meta
+
+def _save(symbol, bars, meta, directory=INTRADAY_DIR):
+    path = _symbol_path(symbol, directory)
+    os.makedirs(directory, exist_ok=True)
+    pd.DataFrame({'time': bars.times, 'close': bars.closes}).to_csv(f"{path}.csv.tmp", index=False)
+    os.replace(f"{path}.csv.tmp", f"{path}.csv")
+    with open(f"{path}.json.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(f"{path}.json.tmp", f"{path}.json")
+    _bars[(directory, symbol)] = (bars, meta)
+
+def _merge(bars, times, closes):
+    """Merge new bars into sorted arrays (new values win on equal times)."""
+    all_times = np.concatenate([times, bars.times])
+    all_closes = np.concatenate([closes, bars.closes])
+    # np.unique keeps the first occurrence, i.e. the new bar
+    unique_times, first = np.unique(all_times, return_index=True)
+    return Bars(unique_times, all_closes[first])
+
+def _fetch_minutes(symbol, start, end):
+    """1-minute closes in [start, end) as (times, closes) arrays."""
+    data = get_market_data().history(symbol, pd.Timestamp(start, unit='s'), pd.Timestamp(end, unit='s'),
+                                     interval='1m')
+    if data is None or data.empty or 'Close' not in data.columns:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    close = data['Close'].dropna()
+    index = close.index.tz_convert('UTC').tz_localize(None) if close.index.tz is not None else close.index
+    return index.values.astype('datetime64[s]').astype(np.int64), close.to_numpy(dtype=np.float64)
+
+def ensure(symbol, start, end, fetch=_fetch_minutes, directory=INTRADAY_DIR, now=None):
+    """
+    Make sure the bars of [start, end) (epoch seconds) are cached, fetching only what is missing.
+
+    A window touching the covered range extends it; a window apart from it
+    is fetched on its own and becomes the covered range (bars outside it are kept).
+
+    Returns:
+        Bars: All cached bars of the symbol
+    """
+    now = int(now if now is not None else datetime.now(pytz.utc).timestamp())
+    end = min(end, now)
+    start = max(start, now - YAHOO_MINUTE_DAYS * 86400)
+    with _symbol_locks[(directory, symbol)]:
+        bars, meta = load(symbol, directory)
+        if start >= end:
+            return bars
+        covered_start, covered_end = (meta['covered_start'], meta['covered_end']) if meta else (None, None)
+        if meta and start >= covered_start and end <= covered_end:
+            return bars
+
+        if meta and start <= covered_end and end >= covered_start:
+            # Overlapping or adjacent: fetch the missing head and/or tail in one request
+            fetch_start = start if start < covered_start else covered_end
+            fetch_end = end if end > covered_end else covered_start
+            new_start, new_end = min(start, covered_start), max(end, covered_end)
+        else:
+            fetch_start, fetch_end = start, end
+            new_start, new_end = start, end
+
+        logger.info(f"Fetching {symbol} 1-minute bars {pd.Timestamp(fetch_start, unit='s')} to "
+                    f"{pd.Timestamp(fetch_end, unit='s')} UTC")
+        times, closes = fetch(symbol, fetch_start, fetch_end)
+        if len(times) == 0:
+            # yfinance answers errors and rate limits with an empty frame: retry next time
+            logger.warning(f"No 1-minute bars returned for {symbol}, leaving the range uncovered")
+            return bars
+        bars = _merge(bars, times, closes)
+        meta = {
+            'symbol': symbol,
+            'covered_start': int(new_start),
+            'covered_end': int(min(new_end, now - SETTLE_SECONDS)),
+            'updated': datetime.now().strftime("%Y%m%d%H%M")
+        }
+        _save(symbol, bars, meta, directory)
+        return bars
+
+def price_at(symbol, when, max_staleness=MAX_STALENESS, fetch=_fetch_minutes, directory=INTRADAY_DIR):
+    """
+    Price of a symbol at an instant: close of the last 1-minute bar that ended at or before it.
+
+    Args:
+        symbol (str): Yahoo ticker
+        when: Instant (datetime or string; naive values are JST)
+        max_staleness (int): Oldest accepted bar end, in seconds before the instant
+        fetch: Callable (symbol, start, end epoch seconds) -> (times, closes) arrays
+        directory (str): Cache directory
+
+    Returns:
+        tuple: (price, end time of the bar as UTC Timestamp) or (None, None) if no recent bar
+    """
+    instant = epoch_seconds(when)
+    bars = ensure(symbol, instant - LOOKBACK, instant + 1, fetch, directory)
+    # Bars are stamped with their start time: the bar ending at the instant started a minute before
+    i = np.searchsorted(bars.times, instant - BAR_SECONDS, side='right') - 1
+    if i < 0:
+        return None, None
+    bar_end = int(bars.times[i]) + BAR_SECONDS
+    if instant - bar_end > max_staleness or np.isnan(bars.closes[i]):
+        return None, None
+    return float(bars.closes[i]), pd.Timestamp(bar_end, unit='s', tz='UTC')
+
+def reset():
+    """Drop the in-memory arrays (reloaded from disk on next use)."""
+    _bars.clear()
+
+if __name__ == "__main__":
+    from common import setup_logging
+    logger = setup_logging('intraday_bars')
+
+    parser = argparse.ArgumentParser(description="Prices at an instant from cached 1-minute bars")
+    parser.add_argument("symbols", nargs='+', help="Yahoo tickers (e.g. USDJPY=X ^VFTW1 318A.T)")
+    parser.add_argument("--at", default=None, help="Instant in JST, 'YYYY-MM-DD HH:MM' (default: today 15:00)")
+    args = parser.parse_args()
+
+    jst = pytz.timezone('Asia/Tokyo')
+    when = pd.Timestamp(args.at) if args.at else pd.Timestamp(datetime.now(jst).date()) + pd.Timedelta(hours=15)
+    when = when.tz_localize(jst) if when.tzinfo is None else when
+
+    failed = False
+    for symbol in args.symbols:
+        price, bar_time = price_at(symbol, when)
+        if price is None:
+            print(f"❌ {symbol}: no 1-minute bar within {MAX_STALENESS // 60} minutes before {when}")
+            failed = True
+        else:
+            print(f"✅ {symbol}: {price:.4f} (bar ending {bar_time.tz_convert(jst)})")
+    if failed:
+        exit(1)
@@ -6,7 +6,9 @@ import logging
 import traceback
 import re
 import io
-from common import MissingCriticalDataError, InvalidDataError
+from common import MissingCriticalDataError, InvalidDataError, append_to_master, register_snapshot
+import columnar_store
+import http_client
 
 # Set up paths and logging
 DATA_DIR = "data"
@@ -75,10 +77,97 @@ def extract_date_from_csv(content):
     except Exception as e:
         raise InvalidDataError(f"Error extracting date: {str(e)}") from e
 
+def parse_mufg_fx_csv(raw_content):
+    """
+    Parse the MUFG spot rate CSV
+    
+    Args:
+        raw_content: CSV file content as bytes
+    
+    Returns:
+        tuple: (date in YYYY-MM-DD format, USDJPY rates in STANDARD_LABELS order)
+    """
+    # Try different encodings until we find one that works
+    encodings = ['shift_jis', 'iso-8859-1', 'utf-8', 'cp932']
+    content = None
+    
+    for encoding in encodings:
+        try:
+            content = raw_content.decode(encoding, errors='replace')
+            logger.info(f"Successfully decoded CSV with {encoding} encoding")
+            break
+        except Exception as e:
+            logger.warning(f"Failed to decode with {encoding}: {str(e)}")
+    
+    if not content:
+        raise InvalidDataError("Could not decode CSV with any available encoding (shift_jis, iso-8859-1, utf-8, cp932).")
+    
+    # Save raw file for debugging
+    raw_file_path = os.path.join(DATA_DIR, "mufg_fx_raw.csv")
+    with open(raw_file_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    logger.info(f"Saved raw CSV to: {raw_file_path}")
+    
+    # Extract date from CSV content - no fallback
+    csv_date = extract_date_from_csv(content) # This will now raise InvalidDataError on failure
+    
+    # Parse the CSV data
+    lines = content.strip().split('\n')
+    
+    # Look for USD data pattern in each line
+    usd_line = None
+    numeric_values = []
+    
+    for line in lines:
+        # Check if line contains USD or ドル (dollar in Japanese)
+        if "USD" in line or "ドル" in line or "dollar" in line.lower():
+            logger.info(f"Found USD line: {line}")
+            usd_line = line
+            
+            # Extract numeric values from the line
+            # Pattern to match numbers with optional commas and decimal points
+            matches = re.findall(r'(\d+(?:[,.]\d+)?)', line)
+            
+            if matches:
+                numeric_values = []
+                for match in matches:
+                    try:
+                        # Replace commas and convert to float
+                        num_value = float(match.replace(',', ''))
+                        numeric_values.append(num_value)
+                    except ValueError:
+                        continue
+                
+                logger.info(f"Extracted numeric values: {numeric_values}")
+                
+                # If we found enough values that look like exchange rates
+                if len(numeric_values) >= 4 and any(100 <= val <= 200 for val in numeric_values):
+                    break
+    
+    if not usd_line:
+        raise MissingCriticalDataError("USD line not found in MUFG FX CSV data.")
+    # It's possible numeric_values is empty even if usd_line is found, if regex fails.
+    if not numeric_values:
+        raise MissingCriticalDataError("No numeric values suitable for FX rates found in MUFG USD line.")
+    
+    # Based on the screenshot, we need to align values correctly with labels
+    # Extract values that look like exchange rates (typically between 100-200 for USD/JPY)
+    exchange_rates = [val for val in numeric_values if 100 <= val <= 200]
+    
+    logger.info(f"Filtered exchange rates: {exchange_rates}")
+    
+    if len(exchange_rates) < len(STANDARD_LABELS):
+        raise MissingCriticalDataError(f"Not enough valid exchange rates found in MUFG data. Expected at least {len(STANDARD_LABELS)}, got {len(exchange_rates)}. Rates found: {exchange_rates}")
+    
+    return csv_date, exchange_rates[:len(STANDARD_LABELS)]
+
 def download_mufg_fx_rates():
     """
     Download USDJPY FX rates from MUFG Bank website
     
+    The CSV is fetched conditionally; when MUFG reports it unchanged (304) the
+    rates parsed on the previous run are reused without decoding it again.
+    
     Returns:
         list: List of dictionaries with FX rate data or None if download fails
     """
@@ -87,115 +176,36 @@ def download_mufg_fx_rates():
         logger.info(f"Downloading FX rates from: {url}")
         
         # Request the CSV file
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+        result = http_client.fetch(url, source='mufg')
         
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        # Try different encodings until we find one that works
-        encodings = ['shift_jis', 'iso-8859-1', 'utf-8', 'cp932']
-        content = None
-        
-        for encoding in encodings:
-            try:
-                content = response.content.decode(encoding, errors='replace')
-                logger.info(f"Successfully decoded CSV with {encoding} encoding")
-                break
-            except Exception as e:
-                logger.warning(f"Failed to decode with {encoding}: {str(e)}")
-        
-        if not content:
-            raise InvalidDataError("Could not decode CSV with any available encoding (shift_jis, iso-8859-1, utf-8, cp932).")
-        
-        # Save raw file for debugging
-        raw_file_path = os.path.join(DATA_DIR, "mufg_fx_raw.csv")
-        with open(raw_file_path, "w", encoding="utf-8") as f:
-            f.write(content)
-        logger.info(f"Saved raw CSV to: {raw_file_path}")
-        
-        # Extract date from CSV content - no fallback
-        csv_date = extract_date_from_csv(content) # This will now raise InvalidDataError on failure
-        # If extract_date_from_csv could still theoretically return None (it shouldn't after its changes):
-        # if csv_date is None:
-        #     raise MissingCriticalDataError("Date extraction failed - cannot proceed without a valid date.")
-        
-        # Parse the CSV data
-        lines = content.strip().split('\n')
+        if result.not_modified and result.parsed:
+            logger.info("MUFG FX CSV not modified since the last run, reusing the parsed rates")
+            csv_date, exchange_rates = result.parsed['date'], result.parsed['rates']
+        else:
+            csv_date, exchange_rates = parse_mufg_fx_csv(result.content)
+            http_client.store_parsed(result, {'date': csv_date, 'rates': exchange_rates})
         
         # Get current timestamp
         timestamp = datetime.now().strftime("%Y%m%d%H%M")
         
-        # Look for USD data pattern in each line
-        usd_line = None
-        numeric_values = []
+        # Create a list of dictionaries for each rate
+        fx_data_list = []
         
-        for line in lines:
-            # Check if line contains USD or ドル (dollar in Japanese)
-            if "USD" in line or "ドル" in line or "dollar" in line.lower():
-                logger.info(f"Found USD line: {line}")
-                usd_line = line
-                
-                # Extract numeric values from the line
-                # Pattern to match numbers with optional commas and decimal points
-                matches = re.findall(r'(\d+(?:[,.]\d+)?)', line)
-                
-                if matches:
-                    numeric_values = []
-                    for match in matches:
-                        try:
-                            # Replace commas and convert to float
-                            num_value = float(match.replace(',', ''))
-                            numeric_values.append(num_value)
-                        except ValueError:
-                            continue
-                    
-                    logger.info(f"Extracted numeric values: {numeric_values}")
-                    
-                    # If we found enough values that look like exchange rates
-                    if len(numeric_values) >= 4 and any(100 <= val <= 200 for val in numeric_values):
-                        break
+        # Match standard labels with the exchange rates
+        for label, rate in zip(STANDARD_LABELS, exchange_rates):
+            fx_data = {
+                'timestamp': timestamp,
+                'date': csv_date,
+                'source': url,
+                'pair': 'USDJPY',
+                'label': label,
+                'rate': rate
+            }
+            fx_data_list.append(fx_data)
+            logger.info(f"Mapped {label} to rate {rate}")
         
-        # Process the data if we found USD line and numeric values
-        if usd_line and numeric_values:
-            # Create a list of dictionaries for each rate
-            fx_data_list = []
-            
-            # Based on the screenshot, we need to align values correctly with labels
-            # Extract values that look like exchange rates (typically between 100-200 for USD/JPY)
-            exchange_rates = [val for val in numeric_values if 100 <= val <= 200]
-            
-            logger.info(f"Filtered exchange rates: {exchange_rates}")
-            
-            if len(exchange_rates) < len(STANDARD_LABELS):
-                raise MissingCriticalDataError(f"Not enough valid exchange rates found in MUFG data. Expected at least {len(STANDARD_LABELS)}, got {len(exchange_rates)}. Rates found: {exchange_rates}")
-            
-            # Match standard labels with the exchange rates
-            for i, label in enumerate(STANDARD_LABELS):
-                if i < len(exchange_rates):
-                    fx_data = {
-                        'timestamp': timestamp,
-                        'date': csv_date,
-                        'source': url,
-                        'pair': 'USDJPY',
-                        'label': label,
-                        'rate': exchange_rates[i]
-                    }
-                    fx_data_list.append(fx_data)
-                    logger.info(f"Mapped {label} to rate {exchange_rates[i]}")
-            
-            logger.info(f"Created {len(fx_data_list)} FX rate entries with date {csv_date}")
-            return fx_data_list
-        else:
-            if not usd_line:
-                raise MissingCriticalDataError("USD line not found in MUFG FX CSV data.")
-            # It's possible numeric_values is empty even if usd_line is found, if regex fails.
-            if not numeric_values:
-                 raise MissingCriticalDataError("No numeric values suitable for FX rates found in MUFG USD line.")
-            # If both are true, it implies some other logic failure if this path is reached.
-            # However, the primary check for not enough rates (below) is more specific.
-            # For now, the above two are sufficient.
+        logger.info(f"Created {len(fx_data_list)} FX rate entries with date {csv_date}")
+        return fx_data_list
     
     except (requests.exceptions.RequestException, InvalidDataError, MissingCriticalDataError) as e:
         logger.error(f"Failed to download or parse MUFG FX rates: {str(e)}")
@@ -232,32 +242,26 @@ def save_fx_rates(fx_data_list):
     df.to_csv(daily_file, index=False)
     logger.info(f"Saved daily FX data to {daily_file}")
     
+    # Record the snapshot in the manifest
+    fx_date = df['date'].max() if 'date' in df.columns else None
+    register_snapshot('fx_data', daily_file, timestamp, fund_date=fx_date, directory=DATA_DIR)
+    
     # Master CSV path
     master_file = os.path.join(DATA_DIR, "fx_data_master.csv")
     
-    # Append to master file if it exists, otherwise create it
-    if os.path.exists(master_file):
-        try:
-            existing_df = pd.read_csv(master_file)
-            
-            # Check if this timestamp already exists in the master file
-            if timestamp in existing_df['timestamp'].values:
-                # Remove the existing entries with this timestamp
-                existing_df = existing_df[existing_df['timestamp'] != timestamp]
-            
-            # Append new data
-            combined_df = pd.concat([existing_df, df], ignore_index=True)
-            combined_df.to_csv(master_file, index=False)
-            logger.info(f"Updated master FX data file {master_file}")
-        except Exception as e:
-            logger.error(f"Error updating master CSV: {str(e)}")
-            # If error, just write new file
-            df.to_csv(master_file, index=False)
-            logger.info(f"Created new master FX data file {master_file}")
-    else:
-        # Create new master file
-        df.to_csv(master_file, index=False)
-        logger.info(f"Created new master FX data file {master_file}")
+    # Append to master file (re-runs with the same timestamp replace their rows)
+    try:
+        append_to_master(df, master_file, key_column='timestamp')
+        logger.info(f"Updated master FX data file {master_file}")
+    except Exception as e:
+        logger.error(f"Error updating master CSV: {str(e)}")
+        raise InvalidDataError(f"Failed to write to master CSV '{master_file}': {str(e)}") from e
+    
+    # Columnar history store (secondary copy, never fails the run)
+    try:
+        columnar_store.write_partition('fx_data', df, DATA_DIR)
+    except Exception as e:
+        logger.warning(f"Could not write FX data to columnar store: {str(e)}")
     
     return daily_file, master_file
 
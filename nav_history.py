@@ -0,0 +1,251 @@
+"""
+Batch estimated-NAV engine over the full master history.
+
+Aligns etf_characteristics_master, fx_data_master and nav_data_master to the
+price dates of vix_futures_master with as-of joins (see asof_join) and computes
+the estimated NAV per share for every valuation date x USDJPY rate label x VIX
+price source in one pass of array operations, using the same formula as
+calculate_estimated_navs:
+
+    nav_usd = (near_price * near_shares + far_price * far_shares) * 1000 + cash
+    estimated_nav_per_share = nav_usd * usdjpy_rate / shares_outstanding
+
+Results are kept in an append-only history, estimated_navs_history.csv, with
+one block of rows per nav_date.
+"""
+import os
+import time
+import argparse
+import traceback
+import numpy as np
+import pandas as pd
+from common import setup_logging, SAVE_DIR, MissingCriticalDataError, InvalidDataError, normalize_date_str, \
+    append_to_master, write_master, read_master_keys
+from vix_contracts import normalize_series
+from asof_join import asof_join, CHARACTERISTICS_TOLERANCE_DAYS, PRICE_TOLERANCE_DAYS, FX_TOLERANCE_DAYS, \
+    NAV_TOLERANCE_DAYS
+
+# Set up logging
+logger = setup_logging('nav_history')
+
+HISTORY_FILE = "estimated_navs_history.csv"
+
+# Multiplier of a VIX futures contract
+CONTRACT_MULTIPLIER = 1000
+
+HISTORY_COLUMNS = [
+    'nav_date', 'usdjpy_rate_type', 'price_source', 'fund_date', 'fx_date',
+    'shares_outstanding', 'shares_near_future', 'shares_far_future', 'fund_cash_component',
+    'near_future', 'far_future', 'near_future_price', 'far_future_price', 'usdjpy_rate',
+    'nav_usd', 'estimated_nav', 'estimated_nav_per_share', 'published_nav',
+    'characteristics_timestamp', 'prices_timestamp', 'fx_timestamp'
+]
+
+def _to_iso_dates(values):
+    """Normalize a column of mixed date formats (20250227.0, 2025-02-27, ...) to YYYY-MM-DD."""
+    values = values.astype(str)
+    mapping = {value: normalize_date_str(value) for value in values.unique()}
+    return values.map(mapping)
+
+def _latest_per(df, keys):
+    """Keep the row of the newest timestamp for each key combination."""
+    return df.sort_values('timestamp', kind='stable').drop_duplicates(keys, keep='last')
+
+def load_inputs(save_dir=SAVE_DIR):
+    """
+    Read the four master files, reduced to the newest observation per date.
+
+    Returns:
+        dict: DataFrames 'characteristics', 'prices', 'fx' and 'nav' (nav may be empty)
+    """
+    def read_master(name, columns):
+        path = os.path.join(save_dir, name)
+        if not os.path.exists(path):
+            return None
+        return pd.read_csv(path, usecols=columns, dtype={'timestamp': str})
+
+    characteristics = read_master("etf_characteristics_master.csv", [
+        'timestamp', 'fund_date', 'shares_outstanding', 'fund_cash_component',
+        'shares_amount_near_future', 'shares_amount_far_future', 'near_future', 'far_future'])
+    prices = read_master("vix_futures_master.csv", ['timestamp', 'price_date', 'vix_future', 'source', 'price'])
+    fx = read_master("fx_data_master.csv", ['timestamp', 'date', 'pair', 'label', 'rate'])
+    nav = read_master("nav_data_master.csv", ['timestamp', 'fund_date', 'nav'])
+
+    missing = [name for name, df in (('ETF characteristics', characteristics), ('VIX futures', prices),
+                                     ('FX rate', fx)) if df is None or df.empty]
+    if missing:
+        raise MissingCriticalDataError(f"Missing required master data: {', '.join(missing)}")
+
+    # ETF characteristics: one composition per fund date
+    characteristics = characteristics.dropna(subset=['fund_date', 'shares_outstanding', 'fund_cash_component',
+                                                     'near_future', 'far_future']).copy()
+    characteristics['date'] = _to_iso_dates(characteristics['fund_date'])
+    characteristics = _latest_per(characteristics.dropna(subset=['date']), ['date'])
+    characteristics = characteristics[(characteristics['shares_outstanding'] > 0) &
+                                      (characteristics['shares_amount_near_future'] > 0) &
+                                      (characteristics['shares_amount_far_future'] > 0)].copy()
+    characteristics['near_future'] = normalize_series(characteristics['near_future'].astype(str))
+    characteristics['far_future'] = normalize_series(characteristics['far_future'].astype(str))
+
+    # VIX futures prices: newest price per date, source and contract
+    prices = prices.dropna(subset=['price_date', 'vix_future', 'source', 'price'])
+    prices = prices[prices['vix_future'] != 'VIX'].copy()
+    prices['date'] = _to_iso_dates(prices['price_date'])
+    prices['vix_future'] = normalize_series(prices['vix_future'].astype(str))
+    prices = _latest_per(prices.dropna(subset=['date']), ['date', 'source', 'vix_future'])
+
+    # FX: newest valid USDJPY rate per date and label
+    fx = fx[(fx['pair'] == 'USDJPY') & fx['label'].notna() & (fx['rate'] > 0)].copy()
+    fx['date'] = _to_iso_dates(fx['date'])
+    fx = _latest_per(fx.dropna(subset=['date']), ['date', 'label'])
+
+    # Published NAV (optional): newest value per fund date
+    if nav is None:
+        nav = pd.DataFrame(columns=['timestamp', 'date', 'nav'])
+    else:
+        nav = nav.dropna(subset=['fund_date', 'nav']).copy()
+        nav['date'] = _to_iso_dates(nav['fund_date'])
+        nav = _latest_per(nav.dropna(subset=['date']), ['date'])
+
+    return {'characteristics': characteristics, 'prices': prices, 'fx': fx, 'nav': nav}
+
+def compute_history(inputs, characteristics_tolerance_days=CHARACTERISTICS_TOLERANCE_DAYS,
+                    price_tolerance_days=PRICE_TOLERANCE_DAYS, fx_tolerance_days=FX_TOLERANCE_DAYS,
+                    nav_tolerance_days=NAV_TOLERANCE_DAYS):
+    """
+    Compute estimated NAVs for every valuation date x FX label x price source.
+
+    Valuation dates are the futures price dates of each source. Each input is
+    aligned to them as of that date (see asof_join): the latest ETF composition,
+    contract prices, FX rate per label and published NAV dated on or before the
+    valuation date, within the given tolerances.
+
+    Args:
+        inputs (dict): Output of load_inputs()
+        *_tolerance_days (int): Maximum age of each input relative to the valuation date
+
+    Returns:
+        pandas.DataFrame: One row per combination with every input aligned, HISTORY_COLUMNS order
+    """
+    prices = inputs['prices']
+
+    # One target per price date and source
+    targets = prices[['date', 'source']].drop_duplicates().rename(columns={'date': 'nav_date'})
+
+    # ETF composition in force on the valuation date
+    characteristics = inputs['characteristics'][[
+        'date', 'timestamp', 'shares_outstanding', 'fund_cash_component',
+        'shares_amount_near_future', 'shares_amount_far_future', 'near_future', 'far_future'
+    ]].rename(columns={'timestamp': 'characteristics_timestamp',
+                       'shares_amount_near_future': 'shares_near_future',
+                       'shares_amount_far_future': 'shares_far_future'})
+    rows = asof_join(targets, characteristics, target_on='nav_date', record_on='date',
+                     tolerance_days=characteristics_tolerance_days, record_date_column='fund_date')
+    rows = rows.dropna(subset=['fund_date']).drop(columns=['date'])
+
+    # Near and far contract prices from the same source (both legs must be priced)
+    for leg in ('near', 'far'):
+        leg_prices = prices[['date', 'source', 'vix_future', 'price', 'timestamp']].rename(columns={
+            'date': f'{leg}_price_date', 'vix_future': f'{leg}_future',
+            'price': f'{leg}_future_price', 'timestamp': f'{leg}_timestamp'})
+        rows = asof_join(rows, leg_prices, target_on='nav_date', record_on=f'{leg}_price_date',
+                         by=['source', f'{leg}_future'], tolerance_days=price_tolerance_days)
+        rows = rows.dropna(subset=[f'{leg}_future_price'])
+
+    # Every FX label, as of the valuation date (bridges weekend/holiday gaps)
+    fx = inputs['fx'][['date', 'label', 'rate', 'timestamp']].rename(columns={
+        'date': 'fx_record_date', 'label': 'usdjpy_rate_type', 'rate': 'usdjpy_rate',
+        'timestamp': 'fx_timestamp'})
+    labels = fx[['usdjpy_rate_type']].drop_duplicates()
+    rows = asof_join(rows.merge(labels, how='cross'), fx, target_on='nav_date', record_on='fx_record_date',
+                     by=['usdjpy_rate_type'], tolerance_days=fx_tolerance_days, record_date_column='fx_date')
+    rows = rows.dropna(subset=['usdjpy_rate'])
+
+    # Published NAV for comparison (optional)
+    nav = inputs['nav'][['date', 'nav']].rename(columns={'date': 'nav_fund_date', 'nav': 'published_nav'})
+    rows = asof_join(rows, nav, target_on='nav_date', record_on='nav_fund_date',
+                     tolerance_days=nav_tolerance_days)
+
+    # Array arithmetic over every row at once
+    near_price = rows['near_future_price'].to_numpy(dtype=float)
+    far_price = rows['far_future_price'].to_numpy(dtype=float)
+    near_shares = rows['shares_near_future'].to_numpy(dtype=float)
+    far_shares = rows['shares_far_future'].to_numpy(dtype=float)
+    cash = rows['fund_cash_component'].to_numpy(dtype=float)
+    fx_rate = rows['usdjpy_rate'].to_numpy(dtype=float)
+    shares_outstanding = rows['shares_outstanding'].to_numpy(dtype=float)
+
+    nav_usd = (near_price * near_shares + far_price * far_shares) * CONTRACT_MULTIPLIER + cash
+    nav_jpy = nav_usd * fx_rate
+
+    rows['nav_usd'] = nav_usd
+    rows['estimated_nav'] = nav_jpy
+    rows['estimated_nav_per_share'] = nav_jpy / shares_outstanding
+    rows['prices_timestamp'] = np.maximum(rows['near_timestamp'].astype(str), rows['far_timestamp'].astype(str))
+
+    rows = rows.rename(columns={'source': 'price_source'})
+    rows = rows.sort_values(['nav_date', 'usdjpy_rate_type', 'price_source'], kind='stable')
+    return rows[HISTORY_COLUMNS].reset_index(drop=True)
+
+def update_history(save_dir=SAVE_DIR, full=False):
+    """
+    Compute the full history and append the dates the history file doesn't have yet.
+
+    The most recent stored date is always recomputed (its inputs may have been
+    refreshed since); older dates are only written by a full rebuild.
+
+    Args:
+        save_dir (str): Data directory
+        full (bool): Rewrite the whole history file
+
+    Returns:
+        dict: Run statistics (dates, rows, appended_dates, compute_seconds)
+    """
+    inputs = load_inputs(save_dir)
+
+    start = time.perf_counter()
+    history = compute_history(inputs)
+    compute_seconds = time.perf_counter() - start
+
+    if history.empty:
+        raise InvalidDataError("No fund date has ETF characteristics, futures prices and FX rates together.")
+
+    history_path = os.path.join(save_dir, HISTORY_FILE)
+    known_dates = [] if full or not os.path.exists(history_path) else read_master_keys(history_path, 'nav_date')
+
+    if not known_dates:
+        write_master(history, history_path, key_column='nav_date')
+        appended = history['nav_date'].unique().tolist()
+    else:
+        refresh_from = known_dates[-1]
+        known = set(known_dates[:-1])
+        appended = [date for date in history['nav_date'].unique() if date >= refresh_from and date not in known]
+        for nav_date, date_rows in history[history['nav_date'].isin(appended)].groupby('nav_date', sort=True):
+            append_to_master(date_rows, history_path, key_column='nav_date')
+
+    stats = {
+        'dates': int(history['nav_date'].nunique()),
+        'rows': len(history),
+        'appended_dates': len(appended),
+        'compute_seconds': round(compute_seconds, 4)
+    }
+    logger.info(f"Estimated NAV history updated: {stats}")
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute estimated NAVs over the full master history")
+    parser.add_argument("--full", action="store_true", help="Rewrite the whole history file")
+    args = parser.parse_args()
+
+    try:
+        stats = update_history(full=args.full)
+        print(f"✅ {stats['rows']} estimates over {stats['dates']} dates computed in "
+              f"{stats['compute_seconds'] * 1000:.1f} ms, {stats['appended_dates']} dates written")
+    except (MissingCriticalDataError, InvalidDataError) as e:
+        print(f"❌ NAV history update failed: {e}")
+        logger.error(traceback.format_exc())
+        exit(1)
+    except Exception as e:
+        print(f"❌ Unexpected error during NAV history update: {e}")
+        logger.error(traceback.format_exc())
+        exit(1)
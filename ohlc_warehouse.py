@@ -0,0 +1,185 @@
+"""
+Local daily-bar warehouse for Yahoo symbols.
+
+Daily OHLC bars are kept per symbol under data/ohlc/ (one CSV of bars and one
+JSON file with the exchange timezone and the date range already fetched):
+
+    data/ohlc/USDJPY_X.csv     timestamp,Open,High,Low,Close,Volume
+    data/ohlc/USDJPY_X.json    {"symbol": "USDJPY=X", "timezone": "Europe/London",
+                                "covered_start": "2026-09-01", "covered_end": "2026-10-15"}
+
+history() serves a window from disk and only fetches what the covered range
+lacks: the tail since the last complete day, the head before the first
+fetched day, or, for a window apart from the covered range, everything in
+between in one request so the range stays contiguous. An empty response
+(yfinance's answer to errors and rate limits) marks nothing covered, and
+the current day is never marked covered (its bar is still moving), so a
+repeated run costs one small tail fetch and a replay of past dates none.
+
+    python ohlc_warehouse.py USDJPY=X --start 2026-09-01
+"""
+import os
+import re
+import json
+import logging
+import argparse
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+import pandas as pd
+from common import SAVE_DIR
+
+logger = logging.getLogger('ohlc_warehouse')
+
+WAREHOUSE_DIR = os.path.join(SAVE_DIR, "ohlc")
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+_symbol_locks = defaultdict(threading.Lock)
+
+def _symbol_path(symbol, directory=WAREHOUSE_DIR):
+    return os.path.join(directory, re.sub(r'[^A-Za-z0-9.-]', '_', symbol))
+
+def _day(value):
+    """Date of a 'YYYY-MM-DD' string, datetime or Timestamp (time of day dropped)."""
+    value = pd.Timestamp(value)
+    return (value.tz_localize(None) if value.tzinfo else value).normalize()
+
+def load(symbol, directory=WAREHOUSE_DIR):
+    """
+    Stored bars and metadata of a symbol.
+
+    Returns:
+        tuple: (DataFrame indexed by bar time in the exchange timezone, metadata dict);
+               (None, None) if nothing is stored
+    """
+    path = _symbol_path(symbol, directory)
+    try:
+        with open(f"{path}.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        bars = pd.read_csv(f"{path}.csv")
+    except (OSError, ValueError):
+        return None, None
+    index = pd.to_datetime(bars.pop('timestamp'), utc=True)
+    bars.index = pd.DatetimeIndex(index).tz_convert(meta['timezone']) if meta.get('timezone') else \
+        pd.DatetimeIndex(index)
+    bars.index.name = 'Date'
+    return bars, meta
+
+def _save(symbol, bars, meta, directory=WAREHOUSE_DIR):
+    path = _symbol_path(symbol, directory)
+    os.makedirs(directory, exist_ok=True)
+    out = bars[[column for column in BAR_COLUMNS if column in bars.columns]].copy()
+    out.insert(0, 'timestamp', bars.index.tz_convert('UTC').strftime('%Y-%m-%dT%H:%M:%SZ')
+               if bars.index.tz is not None else bars.index.strftime('%Y-%m-%dT%H:%M:%S'))
+    out.to_csv(f"{path}.csv.tmp", index=False)
+    os.replace(f"{path}.csv.tmp", f"{path}.csv")
+    with open(f"{path}.json.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(f"{path}.json.tmp", f"{path}.json")
+
+def _local_dates(index):
+    """Exchange-local dates of a bar index (as naive midnight timestamps)."""
+    return (index.tz_localize(None) if index.tz is not None else index).normalize()
+
+def _missing_range(meta, start, end):
+    """
+    Date range to fetch so the covered range spans [start, end).
+
+    Returns:
+        tuple: (fetch_start, fetch_end), or None if [start, end) is covered
+    """
+    if not meta or not meta.get('covered_start'):
+        return start, end
+    covered_start = pd.Timestamp(meta['covered_start'])
+    covered_end = pd.Timestamp(meta['covered_end'])
+    if start >= covered_start and end <= covered_end:
+        return None
+    # A window apart from the covered range is fetched together with the gap
+    fetch_start = start if start < covered_start else covered_end
+    fetch_end = end if end > covered_end else covered_start
+    return fetch_start, fetch_end
+
+def history(symbol, start, end, fetch, directory=WAREHOUSE_DIR, today=None):
+    """
+    Daily bars of a symbol in [start, end), like yf.Ticker(symbol).history(start=start, end=end).
+
+    Args:
+        symbol (str): Yahoo ticker
+        start, end: Window ('YYYY-MM-DD' strings or datetimes; end exclusive)
+        fetch: Callable (symbol, start 'YYYY-MM-DD', end 'YYYY-MM-DD') -> daily bars DataFrame
+        directory (str): Warehouse directory
+        today: Current date (default: today); its bar is fetched but never marked final
+
+    Returns:
+        DataFrame: The bars, indexed by bar time in the exchange timezone
+    """
+    start, end = _day(start), _day(end)
+    today = _day(today if today is not None else datetime.now())
+    with _symbol_locks[(directory, symbol)]:
+        bars, meta = load(symbol, directory)
+        missing = _missing_range(meta, start, end)
+        if missing is not None:
+            fetch_start, fetch_end = missing
+            logger.info(f"Fetching {symbol} daily bars {fetch_start:%Y-%m-%d} to {fetch_end:%Y-%m-%d}")
+            fetched = fetch(symbol, fetch_start.strftime('%Y-%m-%d'), fetch_end.strftime('%Y-%m-%d'))
+            fetched = fetched[[column for column in BAR_COLUMNS if column in fetched.columns]]
+            if fetched.empty:
+                # yfinance answers errors and rate limits with an empty frame: retry next time
+                logger.warning(f"No daily bars returned for {symbol} {fetch_start:%Y-%m-%d} to "
+                               f"{fetch_end:%Y-%m-%d}, leaving the range uncovered")
+                return _window(bars, start, end)
+            if bars is None or bars.empty:
+                bars = fetched
+            else:
+                if fetched.index.tz is not None and bars.index.tz is not None:
+                    fetched = fetched.tz_convert(bars.index.tz)
+                bars = pd.concat([bars, fetched])
+                bars = bars[~bars.index.duplicated(keep='last')].sort_index()
+
+            # Only complete days count as covered; the current day is fetched again next time
+            covered_start = fetch_start if not meta else min(fetch_start, pd.Timestamp(meta['covered_start']))
+            covered_end = min(fetch_end, today) if not meta else \
+                max(pd.Timestamp(meta['covered_end']), min(fetch_end, today))
+            meta = {
+                'symbol': symbol,
+                'timezone': str(bars.index.tz) if bars.index.tz is not None else (meta or {}).get('timezone'),
+                'covered_start': covered_start.strftime('%Y-%m-%d'),
+                'covered_end': max(covered_start, covered_end).strftime('%Y-%m-%d'),
+                'updated': datetime.now().strftime("%Y%m%d%H%M")
+            }
+            _save(symbol, bars, meta, directory)
+
+    return _window(bars, start, end)
+
+def _window(bars, start, end):
+    """Bars whose exchange-local date is in [start, end)."""
+    if bars is None or bars.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    dates = _local_dates(bars.index)
+    return bars[(dates >= start) & (dates < end)]
+
+if __name__ == "__main__":
+    from common import setup_logging
+    from price_utils import get_market_data
+    logger = setup_logging('ohlc_warehouse')
+
+    parser = argparse.ArgumentParser(description="Fill and show the local daily-bar warehouse")
+    parser.add_argument("symbols", nargs='+', help="Yahoo tickers (e.g. USDJPY=X ^VFTW1)")
+    parser.add_argument("--start", default=(datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'),
+                        help="First date (default: 30 days ago)")
+    parser.add_argument("--end", default=(datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d'),
+                        help="End date, exclusive (default: tomorrow)")
+    args = parser.parse_args()
+
+    failed = False
+    for symbol in args.symbols:
+        try:
+            bars = get_market_data().history(symbol, args.start, args.end)
+        except Exception as e:
+            print(f"❌ {symbol}: {e}")
+            failed = True
+            continue
+        print(f"✅ {symbol}: {len(bars)} daily bars from {args.start} to {args.end}")
+    if failed:
+        exit(1)
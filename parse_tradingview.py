@@ -8,6 +8,8 @@ from datetime import datetime, timedelta, timezone
 
 from playwright.async_api import async_playwright
 
+from browser_pool import cdp_endpoint
+
 # List of the first two VIX futures in the cycle: M5 (June 2025) and N5 (July 2025)
 CONTRACTS = ["VXM2025", "VXN2025"]
 
@@ -75,17 +77,25 @@ async def scrape_contract(page, contract_code):
 
 
 async def main():
-    # 1. Launch browser once, reuse the same page for all contracts
+    # 1. Attach to the shared daemon browser if one is running, else launch once;
+    #    reuse the same page (in its own context) for all contracts
     async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+        endpoint = cdp_endpoint()
+        if endpoint:
+            browser = await p.chromium.connect_over_cdp(endpoint)
+        else:
+            browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context()
+        page = await context.new_page()
 
         results = []
         for contract in CONTRACTS:
             data = await scrape_contract(page, contract)
             results.append(data)
 
-        await browser.close()
+        await context.close()
+        if not endpoint:
+            await browser.close()
 
     # 2. Build a UTC‐based filename
     now_utc = datetime.now(timezone.utc)
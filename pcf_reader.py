@@ -0,0 +1,291 @@
+"""
+Single-pass reader for Simplex 318A PCF (portfolio composition file) CSVs.
+
+A PCF file has a fund header block followed by a holdings block:
+
+    ETF Code,ETF Name  ,Fund Cash Component,Shares Outstanding,Fund Date,,
+    318A,SIMPLEX VIX Short-Term Futures ETF,1973294597,2040000,20250606,,
+    ,,,,,,
+    Code,Name  ,ISIN,Exchange,Currency,Shares Amount,Stock Price
+    2506,CBOEVIX 2506,,CME,USD,447,19.1474
+
+read_pcf() tokenizes the file once into a typed header dict and a holdings
+DataFrame. Parsed results are memoized by the SHA-256 of the file content, so
+every stage of a run (download, fund date, VIX prices, characteristics) shares
+one parse and an unchanged file is not read again.
+
+Downloaded PCF payloads are stored once per content in data/pcf_blobs/<sha256>.csv.
+Each download still writes its timestamped 318A-<format>-<fund date>-<timestamp>.csv
+snapshot, hard-linked to the blob where the filesystem allows it (git stores
+identical contents once either way), and the pcf manifest records its hash.
+"""
+import os
+import io
+import csv
+import shutil
+import hashlib
+import logging
+from collections import OrderedDict, namedtuple
+import pandas as pd
+from common import SAVE_DIR, MissingCriticalDataError, InvalidDataError
+
+logger = logging.getLogger('pcf_reader')
+
+# Parsed PCF: header is a dict of typed fund fields, raw_header maps the stripped
+# header column names to their raw string values, holdings has stripped column names.
+# Treat the holdings DataFrame as read-only: it is shared by every caller.
+PCFData = namedtuple('PCFData', ['path', 'sha256', 'header', 'raw_header', 'holdings'])
+
+# Header columns and the typed field each one is parsed into
+HEADER_FIELDS = {
+    'ETF Code': ('etf_code', str),
+    'ETF Name': ('etf_name', str),
+    'Fund Cash Component': ('fund_cash_component', float),
+    'Shares Outstanding': ('shares_outstanding', int),
+    'Fund Date': ('fund_date', 'date'),
+}
+
+# Holdings columns converted to numbers when present
+NUMERIC_HOLDINGS_COLUMNS = ['Shares Amount', 'Stock Price']
+
+# Content-addressed storage for downloaded PCF payloads
+BLOB_DIR = os.path.join(SAVE_DIR, "pcf_blobs")
+
+# Number of parsed files kept in memory
+CACHE_SIZE = 32
+
+# sha256 -> PCFData
+_parsed_cache = OrderedDict()
+# path -> (size, mtime_ns, sha256), lets an unchanged file skip the read entirely
+_path_index = {}
+
+def content_hash(content):
+    """Return the SHA-256 hex digest of the raw file bytes."""
+    return hashlib.sha256(content).hexdigest()
+
+def parse_fund_date(value):
+    """
+    Normalize a PCF Fund Date (YYYYMMDD, MM/DD/YYYY or any pandas-parsable date) to YYYYMMDD.
+
+    Raises:
+        InvalidDataError: If the value can't be parsed as a date
+    """
+    text = str(value).strip()
+    if text.endswith('.0'):
+        text = text[:-2]
+
+    if text.isdigit() and len(text) == 8:
+        return text
+
+    if '/' in text:
+        date_parts = text.split('/')
+        if len(date_parts) == 3 and all(part.isdigit() for part in date_parts):
+            month, day, year = date_parts
+            return f"{year}{month.zfill(2)}{day.zfill(2)}"
+
+    try:
+        return pd.to_datetime(text).strftime("%Y%m%d")
+    except Exception:
+        raise InvalidDataError(f"Could not parse Fund Date string '{text}'.")
+
+def format_fund_date(fund_date):
+    """Convert a YYYYMMDD fund date to YYYY-MM-DD."""
+    return f"{fund_date[:4]}-{fund_date[4:6]}-{fund_date[6:]}"
+
+def _parse_number(value, kind, column):
+    text = str(value).strip().replace('$', '').replace(',', '')
+    try:
+        number = float(text)
+    except ValueError:
+        raise InvalidDataError(f"Could not convert {column} '{value}' to {kind.__name__}.")
+    return int(number) if kind is int else number
+
+def _parse_header(header_row, value_row):
+    """Build the raw and typed header dicts from the first two rows."""
+    raw_header = {}
+    for name, value in zip(header_row, value_row):
+        name = name.strip()
+        if name and name not in raw_header:
+            raw_header[name] = value.strip()
+
+    header = {}
+    for column, (field, kind) in HEADER_FIELDS.items():
+        value = raw_header.get(column, '')
+        if value == '':
+            header[field] = None
+        elif kind == 'date':
+            header[field] = parse_fund_date(value)
+        elif kind is str:
+            header[field] = value
+        else:
+            header[field] = _parse_number(value, kind, column)
+
+    return header, raw_header
+
+def _parse_holdings(columns, rows):
+    """Build the holdings DataFrame, converting the numeric columns."""
+    columns = [col.strip() for col in columns]
+    width = len(columns)
+    # Pad/trim ragged rows to the header width
+    rows = [(row + [''] * width)[:width] for row in rows]
+    holdings = pd.DataFrame(rows, columns=columns)
+    holdings = holdings.replace('', None)
+
+    for column in NUMERIC_HOLDINGS_COLUMNS:
+        if column not in holdings.columns:
+            continue
+        values = holdings[column].str.strip().str.replace(r'[$,]', '', regex=True)
+        numeric = pd.to_numeric(values, errors='coerce')
+        bad = numeric.isna() & values.notna()
+        if bad.any():
+            raise InvalidDataError(
+                f"Non-numeric {column} value(s) in PCF holdings: {holdings.loc[bad, column].tolist()}")
+        holdings[column] = numeric
+
+    return holdings
+
+def parse_pcf_content(content, path=None, sha256=None):
+    """
+    Tokenize PCF file content into a PCFData (no memoization).
+
+    Args:
+        content (bytes): Raw file content
+        path (str): Source path, for messages and the result
+
+    Returns:
+        PCFData: Parsed file
+    """
+    text = content.decode('utf-8-sig', errors='replace')
+    rows = list(csv.reader(io.StringIO(text)))
+
+    if len(rows) < 2:
+        raise MissingCriticalDataError(f"PCF file {path} has no header block.")
+
+    header_row = [cell.strip() for cell in rows[0]]
+    if 'ETF Code' not in header_row or 'ETF Name' not in header_row:
+        raise InvalidDataError(f"File {path} does not match expected PCF structure (missing 'ETF Code' or 'ETF Name' columns).")
+
+    header, raw_header = _parse_header(rows[0], rows[1])
+
+    # The holdings block starts at the first row whose leading cells are Code,Name
+    holdings_start = None
+    for i in range(2, len(rows)):
+        cells = [cell.strip() for cell in rows[i][:2]]
+        if cells == ['Code', 'Name']:
+            holdings_start = i
+            break
+    if holdings_start is None:
+        raise MissingCriticalDataError(f"Could not locate securities/holdings section in PCF file {path}.")
+
+    holding_rows = [row for row in rows[holdings_start + 1:] if any(cell.strip() for cell in row)]
+    holdings = _parse_holdings(rows[holdings_start], holding_rows)
+
+    return PCFData(path, sha256 or content_hash(content), header, raw_header, holdings)
+
+def read_pcf(file_path):
+    """
+    Read and parse a PCF file, memoized by content hash.
+
+    Args:
+        file_path (str): Path to a 318A PCF CSV file
+
+    Returns:
+        PCFData: Parsed file (shared, do not modify)
+    """
+    if not file_path or not os.path.exists(file_path):
+        raise MissingCriticalDataError(f"PCF file not found: {file_path}")
+
+    stat = os.stat(file_path)
+    known = _path_index.get(file_path)
+    if known and known[:2] == (stat.st_size, stat.st_mtime_ns) and known[2] in _parsed_cache:
+        _parsed_cache.move_to_end(known[2])
+        pcf = _parsed_cache[known[2]]
+        return pcf if pcf.path == file_path else pcf._replace(path=file_path)
+
+    with open(file_path, 'rb') as f:
+        content = f.read()
+
+    pcf = read_pcf_bytes(content, file_path)
+    _path_index[file_path] = (stat.st_size, stat.st_mtime_ns, pcf.sha256)
+    return pcf
+
+def read_pcf_bytes(content, path=None):
+    """
+    Parse PCF content already in memory (e.g. a fresh download), memoized by content hash.
+
+    Args:
+        content (bytes): Raw file content
+        path (str): Path the content was (or will be) saved to
+
+    Returns:
+        PCFData: Parsed file (shared, do not modify)
+    """
+    sha256 = content_hash(content)
+    cached = _parsed_cache.get(sha256)
+    if cached is not None:
+        _parsed_cache.move_to_end(sha256)
+        if path and cached.path != path:
+            cached = cached._replace(path=path)
+        return cached
+
+    pcf = parse_pcf_content(content, path, sha256)
+    logger.debug(f"Parsed PCF {path} ({sha256[:12]}): {len(pcf.holdings)} holdings")
+
+    _parsed_cache[sha256] = pcf
+    while len(_parsed_cache) > CACHE_SIZE:
+        _parsed_cache.popitem(last=False)
+    return pcf
+
+def remember_path(file_path, pcf):
+    """Associate a saved file with an already parsed PCF so read_pcf() skips re-reading it."""
+    stat = os.stat(file_path)
+    _path_index[file_path] = (stat.st_size, stat.st_mtime_ns, pcf.sha256)
+    if pcf.sha256 not in _parsed_cache:
+        _parsed_cache[pcf.sha256] = pcf
+
+def blob_path(sha256, blob_dir=BLOB_DIR):
+    """Path of the content-addressed copy of a PCF payload."""
+    return os.path.join(blob_dir, f"{sha256}.csv")
+
+def store_blob(content, sha256=None, blob_dir=BLOB_DIR):
+    """
+    Store a PCF payload once under its content hash.
+
+    Args:
+        content (bytes): Raw file content
+        sha256 (str): Precomputed content hash (optional)
+        blob_dir (str): Blob directory
+
+    Returns:
+        tuple: (blob path, True if the blob was newly written)
+    """
+    sha256 = sha256 or content_hash(content)
+    path = blob_path(sha256, blob_dir)
+    if os.path.exists(path):
+        return path, False
+
+    os.makedirs(blob_dir, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(content)
+    os.replace(temp_path, path)
+    return path, True
+
+def write_snapshot(blob, snapshot_path):
+    """
+    Write a timestamped PCF snapshot with the content of a stored blob.
+
+    The snapshot is a hard link to the blob, or a copy where linking isn't supported.
+
+    Args:
+        blob (str): Blob path (see store_blob)
+        snapshot_path (str): Snapshot file to create
+    """
+    temp_path = f"{snapshot_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    try:
+        os.link(blob, temp_path)
+    except OSError:
+        shutil.copyfile(blob, temp_path)
+    os.replace(temp_path, snapshot_path)
@@ -1,4 +1,6 @@
 import os
+import math
+import asyncio
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta, time
@@ -8,16 +10,25 @@ import logging
 import argparse
 import traceback
 import sys
-import yfinance as yf
+from concurrent.futures import ThreadPoolExecutor
 
 # Import shared utility functions
-from price_utils import get_daily_price_limits, get_closing_price, get_tse_closing_time
+from price_utils import get_daily_price_limits, get_closing_price, get_tse_closing_time, get_market_data, \
+    compute_breach_thresholds, check_breach, VIX_MULTIPLIER
+import ticker_routing
+import intraday_bars
 from common import setup_logging, SAVE_DIR, get_yfinance_ticker_for_vix_future, normalize_vix_ticker, \
     get_next_vix_contracts
 
 # Set up logging
 logger = setup_logging('limits_alerter')
 
+# Threads for the concurrent quote lookups of the monitor (shared by all watchers)
+MONITOR_WORKERS = 16
+
+# Seconds to wait for any ticker format of one contract
+LOOKUP_TIMEOUT = 30
+
 
 def get_etf_composition(date):
     """
@@ -239,6 +250,74 @@ def get_latest_us_market_time(reference_time):
     return market_time
 
 
+def get_position_map(composition):
+    """
+    Map the futures in a composition to their contract positions (1 = front month).
+
+    Args:
+        composition: Dictionary mapping futures tickers to weights
+
+    Returns:
+        dict: Normalized ticker -> position, or None if a contract is not among the next 6
+    """
+    # Use position-based tickers for contracts
+    next_contracts = get_next_vix_contracts(6)  # Get up to 6 upcoming contracts
+
+    position_map = {}
+    for futures_ticker in composition.keys():
+        normalized_ticker = normalize_vix_ticker(futures_ticker)
+        if normalized_ticker in next_contracts:
+            position = next_contracts.index(normalized_ticker) + 1  # 1-indexed
+            position_map[normalized_ticker] = position
+            logger.info(f"Determined {normalized_ticker} is contract position {position}")
+        else:
+            logger.error(f"Could not determine position for {normalized_ticker}")
+            return None
+    return position_map
+
+def get_latest_ticker_price(ticker_str):
+    """Most current price of a Yahoo ticker (fast_info), stamped with the time it was fetched."""
+    return get_market_data().last_price(ticker_str)
+
+def get_closest_ticker_price(ticker_str, start_date, end_date, reference_time):
+    """
+    Price of a Yahoo ticker at reference_time.
+
+    Uses the close of the 1-minute bar ending at reference_time (see intraday_bars);
+    when Yahoo no longer has minute bars for it, the daily close nearest to it
+    within [start_date, end_date).
+
+    Returns:
+        tuple: (price, timestamp) or (None, None) if there is no data in the range
+    """
+    try:
+        price, bar_time = intraday_bars.price_at(ticker_str, reference_time)
+    except Exception as e:
+        logger.warning(f"Error getting 1-minute bars for {ticker_str}: {str(e)}")
+        price = None
+    if price is not None:
+        return price, bar_time.tz_convert(reference_time.tzinfo)
+    logger.warning(f"No 1-minute bar for {ticker_str} at {reference_time}, using the nearest daily close")
+
+    data = get_market_data().history(ticker_str, start_date, end_date).copy()
+    if data.empty or 'Close' not in data.columns or len(data['Close']) == 0:
+        logger.warning(f"No historical data for {ticker_str}")
+        return None, None
+
+    # Find the closest price to reference_time
+    if data.index.tz is None:
+        data.index = data.index.tz_localize('UTC')
+
+    ref_tz = reference_time.tzinfo
+    data.index = data.index.tz_convert(ref_tz)
+
+    time_diffs = abs(data.index - reference_time)
+    closest_idx = time_diffs.argmin()
+    # Fix the FutureWarning by using iloc[0]
+    close = data['Close'].iloc[closest_idx]
+    price = float(close.iloc[0] if hasattr(close, 'iloc') else close)
+    return price, data.index[closest_idx]
+
 def get_vix_futures_prices(composition, reference_time, label=""):
     """
     Get VIX futures prices from Yahoo Finance using only position-based tickers.
@@ -271,28 +350,18 @@ def get_vix_futures_prices(composition, reference_time, label=""):
             # If this is exactly at 15:00 JST, it's TSE closing time
             if reference_time.hour == 15 and reference_time.minute == 0:
                 logger.info("Using TSE closing time for initial prices - need historical data")
-                # For TSE closing, we'll need to get historical data (not latest price)
-                # For this case, we'll fall back to a date-based lookup
+                # For TSE closing, we'll need historical data (not latest price):
+                # the 1-minute bar ending at 15:00, or the nearest daily close as a fallback
                 use_latest_price = False
                 lookback_days = 7
                 start_date = (reference_time - timedelta(days=lookback_days)).strftime('%Y-%m-%d')
                 end_date = reference_time.strftime('%Y-%m-%d')
                 logger.info(f"Historical data date range: {start_date} to {end_date}")
 
-        # Use position-based tickers for contracts
-        next_contracts = get_next_vix_contracts(6)  # Get up to 6 upcoming contracts
-
         # First, determine position mapping for the futures we need
-        position_map = {}
-        for futures_ticker in composition.keys():
-            normalized_ticker = normalize_vix_ticker(futures_ticker)
-            if normalized_ticker in next_contracts:
-                position = next_contracts.index(normalized_ticker) + 1  # 1-indexed
-                position_map[normalized_ticker] = position
-                logger.info(f"Determined {normalized_ticker} is contract position {position}")
-            else:
-                logger.error(f"Could not determine position for {normalized_ticker}")
-                return None, None
+        position_map = get_position_map(composition)
+        if position_map is None:
+            return None, None
 
         # Get prices for all futures in composition
         for normalized_ticker, position in position_map.items():
@@ -301,64 +370,35 @@ def get_vix_futures_prices(composition, reference_time, label=""):
                 # Use only these two position-based ticker formats - no fallbacks
                 specific_tickers = [f"^VXIND{position}", f"^VFTW{position}"]
 
-                price_found = False
-                for ticker_str in specific_tickers:
-                    try:
-                        logger.info(f"Getting price for {normalized_ticker} using {ticker_str}")
-
-                        if use_latest_price:
-                            # Get the most current price using fast_info
-                            ticker = yf.Ticker(ticker_str)
-                            price = ticker.fast_info.last_price
-                            # For latest prices, use current timestamp
-                            price_date = datetime.now()
-                        else:
-                            # For historical data (TSE closing time), use date-based lookup
-                            data = yf.download(ticker_str, start=start_date, end=end_date, progress=False)
-                            if not data.empty and 'Close' in data.columns and len(data['Close']) > 0:
-                                # Find the closest price to reference_time
-                                if data.index.tz is None:
-                                    data.index = data.index.tz_localize('UTC')
-
-                                ref_tz = reference_time.tzinfo
-                                data.index = data.index.tz_convert(ref_tz)
-
-                                time_diffs = abs(data.index - reference_time)
-                                closest_idx = time_diffs.argmin()
-                                # Fix the FutureWarning by using iloc[0]
-                                price = float(
-                                    data['Close'].iloc[closest_idx].iloc[0] if hasattr(data['Close'].iloc[closest_idx],
-                                                                                       'iloc') else data['Close'].iloc[
-                                        closest_idx])
-                                price_date = data.index[closest_idx]
-                            else:
-                                logger.warning(f"No historical data for {ticker_str}")
-                                continue
-
-                        # Validate price
-                        if pd.isna(price) or price <= 0:
-                            logger.warning(f"Invalid price for {ticker_str}: {price}")
-                            continue
-
-                        futures_prices[normalized_ticker] = price
-                        # Store details about the price
-                        price_details[normalized_ticker] = {
-                            'price': price,
-                            'timestamp': price_date,
-                            'source': ticker_str,
-                            'position': position
-                        }
-                        logger.info(
-                            f"Found price for {normalized_ticker} using {ticker_str}: {price:.4f} (from {price_date})")
-                        price_found = True
-                        break
-                    except Exception as e:
-                        logger.warning(f"Failed to get price for {ticker_str}: {str(e)}")
+                if use_latest_price:
+                    lookup = get_latest_ticker_price
+                else:
+                    lookup = lambda ticker_str: get_closest_ticker_price(ticker_str, start_date, end_date,
+                                                                         reference_time)
+
+                # Best-known format first (see ticker_routing); the first valid price wins
+                logger.info(f"Getting price for {normalized_ticker} using {', '.join(specific_tickers)}")
+                price, price_date, ticker_str, elapsed = ticker_routing.routed_lookup(
+                    ticker_routing.route_key(normalized_ticker, position), specific_tickers, lookup,
+                    timeout=LOOKUP_TIMEOUT, logger=logger)
 
                 # No VIX index fallback - strict failure if position-based tickers don't work
-                if not price_found:
+                if price is None:
                     logger.error(f"Could not find price for {normalized_ticker} using any ticker format")
                     return None, None
+
+                futures_prices[normalized_ticker] = price
+                # Store details about the price
+                price_details[normalized_ticker] = {
+                    'price': price,
+                    'timestamp': price_date,
+                    'source': ticker_str,
+                    'position': position,
+                    'latency': elapsed
+                }
+                logger.info(
+                    f"Found price for {normalized_ticker} using {ticker_str}: {price:.4f} (from {price_date}, "
+                    f"{elapsed:.2f}s)")
             else:
                 logger.error(f"Position {position} for {normalized_ticker} is beyond supported range")
                 return None, None
@@ -418,32 +458,17 @@ def get_exchange_rate(reference_time, label=""):
                 end_date = reference_time.strftime('%Y-%m-%d')
                 logger.info(f"Historical data date range: {start_date} to {end_date}")
 
-        usdjpy = yf.Ticker("USDJPY=X")
-
         if use_latest_price:
             # Get the most current exchange rate using fast_info
-            exchange_rate = usdjpy.fast_info.last_price
-            rate_date = datetime.now()
+            exchange_rate, rate_date = get_market_data().last_price("USDJPY=X")
         else:
-            # For historical data (TSE closing time), use date-based lookup
-            fx_data = usdjpy.history(start=start_date, end=end_date)
+            # For TSE closing time, the rate at exactly that minute
+            exchange_rate, rate_date = get_closest_ticker_price("USDJPY=X", start_date, end_date, reference_time)
 
-            if len(fx_data) == 0:
+            if exchange_rate is None:
                 logger.error(f"No USD/JPY data found for the specified period")
                 return None, None
 
-            # Find the closest rate to reference_time
-            if fx_data.index.tz is None:
-                fx_data.index = fx_data.index.tz_localize('UTC')
-
-            ref_tz = reference_time.tzinfo
-            fx_data.index = fx_data.index.tz_convert(ref_tz)
-
-            time_diffs = abs(fx_data.index - reference_time)
-            closest_idx = time_diffs.argmin()
-            exchange_rate = float(fx_data['Close'].iloc[closest_idx])
-            rate_date = fx_data.index[closest_idx]
-
         if pd.isna(exchange_rate) or exchange_rate <= 0:
             logger.error(f"Invalid exchange rate: {exchange_rate}")
             return None, None
@@ -516,7 +541,7 @@ def calculate_basket_value(composition, futures_prices, exchange_rate, price_det
                     return None
 
                 # VIX futures are 1000 times the index
-                contract_multiplier = 1000
+                contract_multiplier = VIX_MULTIPLIER
                 component_value_usd = price * weight * contract_multiplier
                 basket_value_usd += component_value_usd
                 total_weight += weight
@@ -637,86 +662,291 @@ def check_for_alerts(current_value, initial_value, price_limits, closing_price,
         return False
 
 
-def monitor_basket_value(composition, initial_basket_value, price_limits, closing_price,
-                         initial_price_details, initial_rate_details, check_interval=60):
-    """Start continuous monitoring of the basket value."""
-    logger.info(f"Starting monitoring. Will check every {check_interval} seconds.")
+def get_latest_position_price(normalized_ticker, position):
+    """
+    Latest price of one contract from its position-based tickers (^VXIND and ^VFTW, best-known first).
 
+    Returns:
+        tuple: (price, details) or (None, None) if neither ticker has a valid price
+    """
+    price, price_date, ticker_str, elapsed = ticker_routing.routed_lookup(
+        ticker_routing.route_key(normalized_ticker, position), [f"^VXIND{position}", f"^VFTW{position}"],
+        get_latest_ticker_price, timeout=LOOKUP_TIMEOUT, logger=logger)
+    if price is None:
+        logger.error(f"Could not find price for {normalized_ticker} using any ticker format")
+        return None, None
+    return price, {'price': price, 'timestamp': price_date, 'source': ticker_str, 'position': position,
+                   'latency': elapsed}
+
+def get_latest_exchange_rate():
+    """
+    Latest USD/JPY rate.
+
+    Returns:
+        tuple: (exchange_rate, details) or (None, None) if failure
+    """
     try:
-        alert_counter = 0
-        max_alerts = 5
+        exchange_rate, rate_date = get_market_data().last_price("USDJPY=X")
+    except Exception as e:
+        logger.error(f"Error getting exchange rate: {str(e)}")
+        return None, None
+    if pd.isna(exchange_rate) or exchange_rate <= 0:
+        logger.error(f"Invalid exchange rate: {exchange_rate}")
+        return None, None
+    return exchange_rate, {'rate': exchange_rate, 'timestamp': rate_date, 'source': 'USDJPY=X'}
 
-        while alert_counter < max_alerts:
-            current_time = datetime.now()
-            us_market_time = get_latest_us_market_time(current_time)
+async def fetch_basket_quotes(composition):
+    """
+    Fetch the latest price of every contract and USD/JPY concurrently.
 
-            # Get current futures prices and exchange rate
-            current_futures_prices, current_price_details = get_vix_futures_prices(
-                composition,
-                us_market_time,
-                label="MONITOR"
-            )
+    yfinance is blocking, so each lookup runs in the default thread pool; the
+    cycle takes as long as the slowest lookup instead of the sum of all of them.
 
-            if not current_futures_prices or not current_price_details:
-                logger.error("Failed to get current futures prices. Aborting monitor.")
-                return
+    Returns:
+        tuple: (futures_prices, price_details, exchange_rate, rate_details), all None if any lookup failed
+    """
+    position_map = get_position_map(composition)
+    if position_map is None:
+        return None, None, None, None
+
+    tickers = list(position_map)
+    results = await asyncio.gather(
+        *[asyncio.to_thread(get_latest_position_price, ticker, position_map[ticker]) for ticker in tickers],
+        asyncio.to_thread(get_latest_exchange_rate)
+    )
+    exchange_rate, rate_details = results[-1]
+    if any(price is None for price, _ in results):
+        return None, None, None, None
 
-            current_exchange_rate, current_rate_details = get_exchange_rate(
-                us_market_time,
-                label="MONITOR"
-            )
+    futures_prices = {ticker: price for ticker, (price, _) in zip(tickers, results)}
+    price_details = {ticker: details for ticker, (_, details) in zip(tickers, results)}
+    return futures_prices, price_details, exchange_rate, rate_details
 
-            if not current_exchange_rate or not current_rate_details:
-                logger.error("Failed to get current exchange rate. Aborting monitor.")
-                return
-
-            # Calculate current basket value
-            current_basket_value = calculate_basket_value(
-                composition,
-                current_futures_prices,
-                current_exchange_rate,
-                current_price_details,
-                current_rate_details,
-                label="MONITOR"
-            )
+def cycle_report(stats):
+    """
+    Summarize a watcher's cycle latencies against its target interval.
 
-            if not current_basket_value:
-                logger.error("Failed to calculate current basket value. Aborting monitor.")
-                return
-
-            # Check for alerts
-            is_alert = check_for_alerts(
-                current_basket_value,
-                initial_basket_value,
-                price_limits,
-                closing_price,
-                current_price_details,
-                initial_price_details,
-                current_rate_details,
-                initial_rate_details
-            )
+    Returns:
+        dict: name, interval, cycles, latency mean/p95/max (s), mean start lateness (s),
+              overruns (cycles cancelled at the interval), skipped ticks, alerts
+    """
+    latencies = np.array(stats['latencies']) if stats['latencies'] else np.array([np.nan])
+    lateness = np.array(stats['lateness']) if stats['lateness'] else np.array([np.nan])
+    return {
+        'name': stats['name'],
+        'interval': stats['interval'],
+        'cycles': len(stats['latencies']),
+        'latency_mean': float(np.mean(latencies)),
+        'latency_p95': float(np.percentile(latencies, 95)),
+        'latency_max': float(np.max(latencies)),
+        'lateness_mean': float(np.mean(lateness)),
+        'overruns': stats['overruns'],
+        'skipped': stats['skipped'],
+        'alerts': stats['alerts']
+    }
+
+def _log_cycle_report(stats):
+    report = cycle_report(stats)
+    logger.info(f"Monitor {report['name']}: {report['cycles']} cycles, latency mean {report['latency_mean']:.2f}s / "
+                f"p95 {report['latency_p95']:.2f}s / max {report['latency_max']:.2f}s against a "
+                f"{report['interval']}s target, start lateness {report['lateness_mean'] * 1000:.0f} ms, "
+                f"{report['overruns']} overruns, {report['skipped']} skipped ticks, {report['alerts']} alerts")
+
+def _write_monitor_alert(watcher, current_time, current_basket_value):
+    initial_basket_value = watcher['initial_basket_value']
+    price_limits = watcher['price_limits']
+    closing_price = watcher['closing_price']
+    name = f"_{watcher['name']}" if watcher.get('name') else ""
+
+    # Save alert to file (simplified version for monitoring)
+    alert_file = os.path.join(SAVE_DIR, f"price_alert_monitor{name}_{datetime.now().strftime('%Y%m%d%H%M')}.log")
+    with open(alert_file, "w") as f:
+        f.write(f"PRICE LIMIT ALERT (Monitoring)\n")
+        f.write(f"Time: {current_time}\n")
+        f.write(f"Basket value: {current_basket_value:.2f} JPY\n")
+        f.write(f"Initial value: {initial_basket_value:.2f} JPY\n")
+        pct_change = (current_basket_value - initial_basket_value) / initial_basket_value
+        f.write(f"Change: {pct_change:.2%}\n")
+        f.write(f"Price limits: {price_limits[0]:.2f} to {price_limits[1]:.2f} JPY\n")
+        allowed_lower_pct = (price_limits[0] - closing_price) / closing_price
+        allowed_upper_pct = (price_limits[1] - closing_price) / closing_price
+        f.write(f"Allowed range: {allowed_lower_pct:.2%} to {allowed_upper_pct:.2%}\n")
+
+def get_watcher_thresholds(watcher):
+    """
+    Breach thresholds of a watcher's basket, relative to its initial prices (see compute_breach_thresholds).
+
+    Returns:
+        dict: Thresholds, or None if the initial prices don't cover the composition
+    """
+    composition = {normalize_vix_ticker(ticker): weight for ticker, weight in watcher['composition'].items()}
+    initial_prices = {ticker: details['price'] for ticker, details in watcher['initial_price_details'].items()}
+    return compute_breach_thresholds(composition, initial_prices, watcher['initial_rate_details']['rate'],
+                                     watcher['closing_price'], watcher['price_limits'])
+
+def _log_thresholds(name, thresholds):
+    logger.info(f"Monitor {name}: alert below {thresholds['lower_value']:,.2f} or above "
+                f"{thresholds['upper_value']:,.2f} JPY (initial {thresholds['reference_value']:,.2f} JPY)")
+    for ticker, levels in thresholds['legs'].items():
+        lower, upper = (level or float('nan') for level in (levels['lower'], levels['upper']))
+        logger.info(f"  {ticker}: limits at {lower:.4f} / {upper:.4f} "
+                    f"({thresholds['sensitivities'][ticker]:,.0f} JPY per point, other legs unchanged)")
+    lower, upper = (level or float('nan') for level in (thresholds['fx']['lower'], thresholds['fx']['upper']))
+    logger.info(f"  USD/JPY: limits at {lower:.2f} / {upper:.2f} ({thresholds['fx_sensitivity']:,.0f} JPY per yen)")
+
+async def watch_basket(watcher, check_interval=60, max_alerts=5, stop=None):
+    """
+    Monitor one basket on a fixed-rate schedule.
+
+    Cycles start at t0 + k * interval regardless of how long the previous one
+    took. A cycle still fetching when the interval elapses is cancelled and
+    counted as an overrun. Ticks missed by a slow cycle are not queued: the
+    latest one starts immediately and the older ones are skipped.
+
+    The breach thresholds are computed once (see get_watcher_thresholds), so a
+    cycle within the limits is a few comparisons; only a breach goes through
+    the full basket valuation and alert check.
+
+    Args:
+        watcher (dict): name, composition, initial_basket_value, price_limits, closing_price,
+                        initial_price_details, initial_rate_details (optional check_interval)
+        check_interval (float): Target seconds between cycle starts
+        max_alerts (int): Stop after this many alerts
+        stop (asyncio.Event): Set to stop the watcher between cycles
 
-            if is_alert:
-                alert_counter += 1
-                logger.warning(f"Alert {alert_counter} of {max_alerts}")
-
-                # Save alert to file (simplified version for monitoring)
-                alert_file = os.path.join(SAVE_DIR, f"price_alert_monitor_{datetime.now().strftime('%Y%m%d%H%M')}.log")
-                with open(alert_file, "w") as f:
-                    f.write(f"PRICE LIMIT ALERT (Monitoring)\n")
-                    f.write(f"Time: {current_time}\n")
-                    f.write(f"Basket value: {current_basket_value:.2f} JPY\n")
-                    f.write(f"Initial value: {initial_basket_value:.2f} JPY\n")
-                    pct_change = (current_basket_value - initial_basket_value) / initial_basket_value
-                    f.write(f"Change: {pct_change:.2%}\n")
-                    f.write(f"Price limits: {price_limits[0]:.2f} to {price_limits[1]:.2f} JPY\n")
-                    allowed_lower_pct = (price_limits[0] - closing_price) / closing_price
-                    allowed_upper_pct = (price_limits[1] - closing_price) / closing_price
-                    f.write(f"Allowed range: {allowed_lower_pct:.2%} to {allowed_upper_pct:.2%}\n")
-
-            # Wait for next check
-            time_module.sleep(check_interval)
+    Returns:
+        dict: Cycle statistics (see cycle_report)
+    """
+    interval = watcher.get('check_interval') or check_interval
+    name = watcher.get('name') or "basket"
+    stop = stop or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    stats = {'name': name, 'interval': interval, 'latencies': [], 'lateness': [],
+             'overruns': 0, 'skipped': 0, 'alerts': 0}
+
+    logger.info(f"Starting monitor {name}. Will check every {interval} seconds.")
+    thresholds = get_watcher_thresholds(watcher)
+    if thresholds:
+        _log_thresholds(name, thresholds)
+    else:
+        logger.warning(f"Monitor {name}: no breach thresholds, valuing the full basket every cycle")
+    start = loop.time()
+    tick = 0
+    try:
+        while stats['alerts'] < max_alerts and not stop.is_set():
+            delay = start + tick * interval - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(stop.wait(), delay)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+
+            cycle_start = loop.time()
+            stats['lateness'].append(cycle_start - (start + tick * interval))
+            current_time = datetime.now()
 
+            try:
+                quotes = await asyncio.wait_for(fetch_basket_quotes(watcher['composition']), interval)
+            except asyncio.TimeoutError:
+                stats['overruns'] += 1
+                logger.warning(f"Monitor {name}: cycle cancelled after {interval}s without all quotes")
+                quotes = None
+            else:
+                current_futures_prices, current_price_details, current_exchange_rate, current_rate_details = quotes
+                if not current_futures_prices or not current_exchange_rate:
+                    logger.error(f"Monitor {name}: failed to get current prices or exchange rate. Aborting monitor.")
+                    return stats
+
+                breach = None
+                if thresholds:
+                    breach, current_basket_value = check_breach(thresholds, current_futures_prices,
+                                                                current_exchange_rate)
+                    if not breach:
+                        logger.info(f"Monitor {name}: basket {current_basket_value:,.2f} JPY within "
+                                    f"{thresholds['lower_value']:,.2f} to {thresholds['upper_value']:,.2f} JPY")
+
+                if breach != 0:
+                    # Breach (or no thresholds): value the full basket and run the alert check
+                    current_basket_value = calculate_basket_value(
+                        watcher['composition'],
+                        current_futures_prices,
+                        current_exchange_rate,
+                        current_price_details,
+                        current_rate_details,
+                        label=f"MONITOR {name}"
+                    )
+
+                    if not current_basket_value:
+                        logger.error(f"Monitor {name}: failed to calculate current basket value. Aborting monitor.")
+                        return stats
+
+                    # Check for alerts
+                    is_alert = check_for_alerts(
+                        current_basket_value,
+                        watcher['initial_basket_value'],
+                        watcher['price_limits'],
+                        watcher['closing_price'],
+                        current_price_details,
+                        watcher['initial_price_details'],
+                        current_rate_details,
+                        watcher['initial_rate_details']
+                    )
+
+                    if is_alert:
+                        stats['alerts'] += 1
+                        logger.warning(f"Monitor {name}: alert {stats['alerts']} of {max_alerts}")
+                        _write_monitor_alert(watcher, current_time, current_basket_value)
+
+            latency = loop.time() - cycle_start
+            stats['latencies'].append(latency)
+            logger.info(f"Monitor {name}: cycle {len(stats['latencies'])} took {latency:.2f}s (target {interval}s)")
+
+            # Next tick on the fixed grid: the latest one already due starts at once, older ones are skipped
+            next_tick = max(tick + 1, math.floor((loop.time() - start) / interval))
+            stats['skipped'] += next_tick - tick - 1
+            tick = next_tick
+        return stats
+    finally:
+        _log_cycle_report(stats)
+
+async def run_monitors(watchers, check_interval=60, max_alerts=5, duration=None):
+    """
+    Run several basket watchers concurrently in one event loop.
+
+    Args:
+        watchers (list): Watcher dicts (see watch_basket)
+        check_interval (float): Default target interval in seconds
+        max_alerts (int): Alerts after which a watcher stops
+        duration (float): Stop all watchers after this many seconds (default: run until cancelled)
+
+    Returns:
+        list: Cycle reports (see cycle_report), or exceptions for watchers that failed
+    """
+    loop = asyncio.get_running_loop()
+    # Lookups abandoned by cancelled cycles keep their thread until yfinance returns
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=MONITOR_WORKERS))
+    stop = asyncio.Event()
+    if duration:
+        loop.call_later(duration, stop.set)
+    results = await asyncio.gather(*[watch_basket(watcher, check_interval, max_alerts, stop) for watcher in watchers],
+                                   return_exceptions=True)
+    return [cycle_report(result) if isinstance(result, dict) else result for result in results]
+
+def monitor_basket_value(composition, initial_basket_value, price_limits, closing_price,
+                         initial_price_details, initial_rate_details, check_interval=60, duration=None):
+    """Start continuous monitoring of the basket value (see watch_basket)."""
+    watcher = {
+        'name': None,
+        'composition': composition,
+        'initial_basket_value': initial_basket_value,
+        'price_limits': price_limits,
+        'closing_price': closing_price,
+        'initial_price_details': initial_price_details,
+        'initial_rate_details': initial_rate_details
+    }
+    try:
+        return asyncio.run(run_monitors([watcher], check_interval, duration=duration))
     except KeyboardInterrupt:
         logger.info("Monitoring stopped by user.")
     except Exception as e:
@@ -732,6 +962,7 @@ def main():
                         default=True)
     parser.add_argument('--monitor', action='store_true', help='Enable continuous monitoring')
     parser.add_argument('--interval', type=int, default=60, help='Monitoring interval in seconds (default: 60)')
+    parser.add_argument('--duration', type=float, help='Stop monitoring after this many seconds (default: until interrupted)')
     args = parser.parse_args()
 
     logger.info("==================================================")
@@ -927,9 +1158,13 @@ def main():
             closing_price,
             initial_price_details,
             initial_rate_details,
-            args.interval
+            args.interval,
+            args.duration
         )
 
+    cache_stats = get_market_data().stats()
+    logger.info(f"Market data cache: {cache_stats['hits']} hits, {cache_stats['misses']} Yahoo requests")
+
     return 0
 
 
@@ -7,9 +7,216 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import pytz
+import time
 import logging
 import traceback
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import yfinance as yf
+import ohlc_warehouse
+
+# VIX futures contract multiplier (USD per index point)
+VIX_MULTIPLIER = 1000
+
+# Alternative ticker lookups in flight at once for one price
+HEDGE_FAN_OUT = 4
+
+# Seconds cached market data stays valid, per granularity (None: for the whole run)
+CACHE_TTL = {
+    'last_price': 5,
+    '1m': 30,
+    '2m': 60,
+    '5m': 120,
+    '15m': 300,
+    '30m': 600,
+    '60m': 1200,
+    '1h': 1200,
+    '1d': None,
+    '5d': None,
+    '1wk': None,
+    '1mo': None,
+}
+
+# Bar sizes requested by date rather than by time
+DAILY_INTERVALS = ('1d', '5d', '1wk', '1mo')
+
+# Session shared by every Yahoo request of the process (connection pooling, one crumb)
+_yahoo_session = None
+
+def get_yahoo_session():
+    """
+    Return the pooled session passed to yfinance, or None to let yfinance use its own.
+    
+    Recent yfinance versions only accept curl_cffi sessions; when curl_cffi isn't
+    installed yfinance's internal shared session is used instead.
+    """
+    global _yahoo_session
+    if _yahoo_session is None:
+        try:
+            from curl_cffi import requests as curl_requests
+            _yahoo_session = curl_requests.Session(impersonate="chrome")
+        except ImportError:
+            return None
+    return _yahoo_session
+
+def _naive_utc(value):
+    """Timestamp in UTC without timezone (naive values are taken as UTC)."""
+    value = pd.Timestamp(value)
+    return value.tz_convert('UTC').tz_localize(None) if value.tzinfo is not None else value
+
+def _epoch_seconds(value):
+    return int(_naive_utc(value).tz_localize('UTC').timestamp())
+
+class MarketDataCache:
+    """
+    Memoizing facade over the yfinance calls of one run.
+    
+    Daily history is kept for the run (and across runs in the OHLC
+    warehouse), intraday data and last prices for a few seconds (CACHE_TTL). A history request inside a window already
+    fetched for the same symbol and interval is sliced from it. All requests
+    share one session (and so one Yahoo crumb), and concurrent requests for
+    the same data wait for a single fetch.
+    """
+    
+    def __init__(self, ttl=None, session=None, warehouse=ohlc_warehouse.WAREHOUSE_DIR):
+        self.ttl = dict(CACHE_TTL, **(ttl or {}))
+        self.session = session
+        self.warehouse = warehouse
+        self.hits = 0
+        self.misses = 0
+        self._entries = defaultdict(list)
+        self._lock = threading.Lock()
+        self._key_locks = defaultdict(threading.Lock)
+    
+    def _ticker(self, symbol):
+        session = self.session or get_yahoo_session()
+        return yf.Ticker(symbol, session=session) if session else yf.Ticker(symbol)
+    
+    def _fresh(self, fetched, granularity):
+        ttl = self.ttl.get(granularity, self.ttl['1m'])
+        return ttl is None or time.time() - fetched < ttl
+    
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+    
+    def _cached_history(self, symbol, start, end, interval):
+        """Slice of a fresh cached window covering [start, end), or None."""
+        with self._lock:
+            for fetched, window_start, window_end, data in self._entries[('history', symbol, interval)]:
+                if window_start <= start and end <= window_end and self._fresh(fetched, interval):
+                    if (window_start, window_end) == (start, end):
+                        return data
+                    if data.index.tz is None:
+                        times = data.index
+                    elif interval in DAILY_INTERVALS:
+                        times = data.index.tz_localize(None)
+                    else:
+                        times = data.index.tz_convert('UTC').tz_localize(None)
+                    return data[(times >= start) & (times < end)]
+        return None
+    
+    def _fetch_history(self, symbol, start, end, interval='1d'):
+        if interval in DAILY_INTERVALS:
+            # Dates in the exchange timezone
+            start, end = pd.Timestamp(start).strftime('%Y-%m-%d'), pd.Timestamp(end).strftime('%Y-%m-%d')
+        else:
+            # Exact instants as epoch seconds (naive times are UTC)
+            start, end = _epoch_seconds(start), _epoch_seconds(end)
+        return self._ticker(symbol).history(start=start, end=end, interval=interval)
+    
+    def history(self, symbol, start, end, interval='1d'):
+        """
+        Price history of a symbol, like yf.Ticker(symbol).history(start=start, end=end).
+        
+        Daily bars come from the local warehouse (see ohlc_warehouse), which
+        only fetches the days it doesn't have yet.
+        
+        Args:
+            symbol (str): Yahoo ticker
+            start, end: Window as 'YYYY-MM-DD' strings or datetimes (end exclusive; intraday
+                        windows are instants, naive ones in UTC)
+            interval (str): Bar size
+            
+        Returns:
+            DataFrame: The bars (do not modify; copy first)
+        """
+        if interval in DAILY_INTERVALS:
+            # Dates as seen in the exchange timezone
+            start, end = (pd.Timestamp(value).replace(tzinfo=None) for value in (start, end))
+        else:
+            start, end = _naive_utc(start), _naive_utc(end)
+        with self._key_locks[('history', symbol, interval)]:
+            data = self._cached_history(symbol, start, end, interval)
+            if data is not None:
+                self._count(True)
+                return data
+            
+            fetches = []
+            def fetch(symbol, fetch_start, fetch_end):
+                fetches.append((fetch_start, fetch_end))
+                return self._fetch_history(symbol, fetch_start, fetch_end)
+            
+            if interval == '1d' and self.warehouse:
+                data = ohlc_warehouse.history(symbol, start, end, fetch, directory=self.warehouse)
+            else:
+                fetches.append((start, end))
+                data = self._fetch_history(symbol, start, end, interval)
+            self._count(not fetches)
+            with self._lock:
+                self._entries[('history', symbol, interval)].append((time.time(), start, end, data))
+            return data
+    
+    def last_price(self, symbol):
+        """
+        Latest price of a symbol (fast_info.last_price), cached for CACHE_TTL['last_price'] seconds.
+        
+        Returns:
+            tuple: (price, time it was fetched)
+        """
+        key = ('last_price', symbol)
+        with self._key_locks[key]:
+            with self._lock:
+                cached = self._entries.get(key)
+            if cached and self._fresh(cached[0][0], 'last_price'):
+                self._count(True)
+                return cached[0][1], cached[0][2]
+            self._count(False)
+            # fast_info memoizes inside its Ticker, so every fetch needs a new one
+            price = self._ticker(symbol).fast_info.last_price
+            fetched_at = datetime.now()
+            with self._lock:
+                self._entries[key] = [(time.time(), price, fetched_at)]
+            return price, fetched_at
+    
+    def stats(self):
+        """
+        Returns:
+            dict: hits (served from memory or the warehouse), misses (network requests) and hit_rate
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': round(self.hits / total, 3) if total else None}
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+_market_data = None
+
+def get_market_data():
+    """Return the cache of the current run (created on first use)."""
+    global _market_data
+    if _market_data is None:
+        _market_data = MarketDataCache()
+    return _market_data
 
 def get_daily_price_limits(base_price):
     """
@@ -70,6 +277,90 @@ def get_daily_price_limits(base_price):
     limit = limits_table[-1][1]
     return max(1, base_price - limit), base_price + limit
 
+def compute_breach_thresholds(composition, futures_prices, exchange_rate, closing_price, price_limits,
+                              cash=0.0, multiplier=VIX_MULTIPLIER):
+    """
+    Precompute where the basket would breach the ETF's daily price limits.
+    
+    The basket value is linear in every futures price and in USD/JPY:
+    
+        value = exchange_rate * sum(weight * multiplier * price) + cash
+    
+    and an alert is due when its change from the reference value exceeds the
+    allowed ETF change ((limit - closing_price) / closing_price). Both limits
+    therefore become fixed bounds on the USD futures sum for a given rate, so
+    a later check is a few multiply-adds and two comparisons (see check_breach).
+    Shares outstanding scale basket and ETF alike and cancel out.
+    
+    Args:
+        composition (dict): Futures ticker -> contracts held (same keys as futures_prices)
+        futures_prices (dict): Reference futures prices (e.g. at the TSE close)
+        exchange_rate (float): Reference USD/JPY rate
+        closing_price (float): ETF closing price
+        price_limits (tuple): (lower_limit, upper_limit) from get_daily_price_limits
+        cash (float): Cash component of the basket in JPY
+        multiplier (float): Contract multiplier
+        
+    Returns:
+        dict: reference_value, lower_value, upper_value (basket JPY at the limits), cash,
+              coefficients (USD per price unit of each leg), sensitivities (JPY per price unit),
+              fx_sensitivity (JPY per JPY/USD), legs (each leg's lower/upper price with the
+              others unchanged; None if unreachable) and fx (lower/upper rate), or None if invalid
+    """
+    if not composition or not exchange_rate or not closing_price or not price_limits:
+        return None
+    if any(ticker not in futures_prices for ticker in composition):
+        return None
+    
+    coefficients = {ticker: weight * multiplier for ticker, weight in composition.items()}
+    futures_usd = sum(coefficients[ticker] * futures_prices[ticker] for ticker in composition)
+    reference_value = exchange_rate * futures_usd + cash
+    if futures_usd <= 0 or reference_value <= 0:
+        return None
+    
+    lower_limit, upper_limit = price_limits
+    lower_value = reference_value * (1 + (lower_limit - closing_price) / closing_price)
+    upper_value = reference_value * (1 + (upper_limit - closing_price) / closing_price)
+    
+    def reachable(level):
+        return level if level > 0 else None
+    
+    legs = {}
+    for ticker, coefficient in coefficients.items():
+        legs[ticker] = {
+            'lower': reachable(futures_prices[ticker] + (lower_value - reference_value) / (exchange_rate * coefficient)),
+            'upper': reachable(futures_prices[ticker] + (upper_value - reference_value) / (exchange_rate * coefficient))
+        }
+    
+    return {
+        'reference_value': reference_value,
+        'lower_value': lower_value,
+        'upper_value': upper_value,
+        'cash': cash,
+        'coefficients': coefficients,
+        'sensitivities': {ticker: exchange_rate * coefficient for ticker, coefficient in coefficients.items()},
+        'fx_sensitivity': futures_usd,
+        'legs': legs,
+        'fx': {'lower': reachable((lower_value - cash) / futures_usd),
+               'upper': reachable((upper_value - cash) / futures_usd)}
+    }
+
+def check_breach(thresholds, futures_prices, exchange_rate):
+    """
+    Compare prices against precomputed thresholds (see compute_breach_thresholds).
+    
+    Returns:
+        tuple: (breach, basket_value) where breach is -1 below the lower limit,
+               1 above the upper limit and 0 within them
+    """
+    value = exchange_rate * sum(coefficient * futures_prices[ticker]
+                                for ticker, coefficient in thresholds['coefficients'].items()) + thresholds['cash']
+    if value < thresholds['lower_value']:
+        return -1, value
+    if value > thresholds['upper_value']:
+        return 1, value
+    return 0, value
+
 def get_closing_price(symbol, lookback_days=7, logger=None):
     """
     Get closing price of a symbol on its exchange.
@@ -90,8 +381,7 @@ def get_closing_price(symbol, lookback_days=7, logger=None):
         if logger:
             logger.info(f"Getting closing data for {symbol} from {start_date} to {end_date}")
         
-        stock = yf.Ticker(symbol)
-        hist = stock.history(start=start_date, end=end_date)
+        hist = get_market_data().history(symbol, start_date, end_date)
         
         if len(hist) == 0:
             if logger:
@@ -152,6 +442,84 @@ def get_closing_price(symbol, lookback_days=7, logger=None):
             logger.error(traceback.format_exc())
         return None, None, None
 
+def hedged_lookup(tickers, lookup, fan_out=HEDGE_FAN_OUT, timeout=None, hedge_after=None, logger=None):
+    """
+    Look up one price under several alternative tickers concurrently and take the first valid one.
+    
+    Up to fan_out lookups run at once (the next alternative starts whenever one
+    misses); as soon as one returns a valid price the others are abandoned, so a
+    lookup costs the latency of the fastest valid format rather than the sum of
+    the misses before it. With hedge_after the first ticker is tried alone and
+    the alternatives only start once it misses or hedge_after seconds pass.
+    
+    Args:
+        tickers (list): Alternative tickers, most likely first (e.g. from get_alternative_yfinance_tickers)
+        lookup: Callable ticker -> (price, timestamp); a miss raises or returns a missing/non-positive price
+        fan_out (int): Maximum lookups in flight
+        timeout (float): Overall seconds to wait (default: until every lookup finished)
+        hedge_after (float): Seconds to wait for the first ticker before starting the others
+        logger: Optional logger instance for logging
+        
+    Returns:
+        tuple: (price, timestamp, winning ticker, seconds taken); price and ticker are None if all missed
+    """
+    start = time.time()
+    queue = list(tickers)
+    pending = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, fan_out))
+    
+    def submit_next():
+        ticker = queue.pop(0)
+        pending[executor.submit(lookup, ticker)] = ticker
+    
+    def fill():
+        while queue and len(pending) < fan_out:
+            submit_next()
+    
+    try:
+        if hedge_after is None:
+            fill()
+        elif queue:
+            submit_next()
+        
+        while pending:
+            remaining = None if timeout is None else timeout - (time.time() - start)
+            if remaining is not None and remaining <= 0:
+                break
+            hedging = hedge_after is not None and queue and len(pending) < fan_out
+            if hedging:
+                remaining = hedge_after if remaining is None else min(remaining, hedge_after)
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done and hedging:
+                # The first choice is overdue: start the alternatives
+                if logger:
+                    logger.info(f"No price from {', '.join(pending.values())} after {hedge_after:.1f}s, "
+                                f"trying {', '.join(queue)}")
+                fill()
+                continue
+            # Lookups finishing together are taken in priority order
+            for future in sorted(done, key=lambda finished: tickers.index(pending[finished])):
+                ticker = pending.pop(future)
+                try:
+                    price, timestamp = future.result()
+                except Exception as e:
+                    if logger:
+                        logger.warning(f"Failed to get price for {ticker}: {str(e)}")
+                    price, timestamp = None, None
+                
+                if price is not None and not pd.isna(price) and price > 0:
+                    return price, timestamp, ticker, time.time() - start
+                if logger and price is not None:
+                    logger.warning(f"Invalid price for {ticker}: {price}")
+                fill()
+        
+        if logger and pending:
+            logger.warning(f"Timed out after {timeout}s waiting for {', '.join(pending.values())}")
+        return None, None, None, time.time() - start
+    finally:
+        # Queued lookups are dropped; running ones finish in the background and are ignored
+        executor.shutdown(wait=False, cancel_futures=True)
+
 def get_tse_closing_time(reference_date):
     """
     Get the Tokyo Stock Exchange closing time (15:00 JST) for the given date.
@@ -5,12 +5,14 @@ from datetime import datetime
 import logging
 import traceback
 import time
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from common import setup_logging, SAVE_DIR, MissingCriticalDataError, InvalidDataError
+from common import setup_logging, SAVE_DIR, MissingCriticalDataError, InvalidDataError, append_to_master, \
+    register_snapshot
+import columnar_store
+import browser_pool
+from http_client import USER_AGENT
 
 # Set up logging
 logger = setup_logging('simplex_nav_parser')
@@ -29,23 +31,11 @@ def parse_simplex_nav_with_browser():
         # URL of the Simplex ETF page
         url = "https://www.simplexasset.com/etf/eng/etf.html"
         
-        # Configure Chrome options for headless operation
-        chrome_options = Options()
-        chrome_options.add_argument("--headless=new")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-        
-        # Initialize the driver
-        logger.info("Initializing Chrome WebDriver")
-        driver = webdriver.Chrome(options=chrome_options)
+        # Lease a page from the shared browser (no per-run Chrome cold start)
+        logger.info("Opening page in shared browser")
+        driver = browser_pool.open_page(user_agent=USER_AGENT, page_load_timeout=30)
         
         try:
-            # Set page load timeout
-            driver.set_page_load_timeout(30)
-            
             # Load the page
             logger.info(f"Loading URL: {url}")
             driver.get(url)
@@ -231,12 +221,8 @@ def parse_simplex_nav_with_browser():
             return nav_data
             
         finally:
-            # Always close the browser
-            try:
-                driver.quit()
-                logger.info("WebDriver closed successfully")
-            except Exception as e:
-                logger.warning(f"Error closing WebDriver: {str(e)}")
+            # Always return the page to the shared browser
+            browser_pool.close_page(driver)
                 
     except Exception as e:
         logger.error(f"Error in headless browser NAV parsing: {str(e)}")
@@ -271,6 +257,9 @@ def save_nav_data(nav_data, save_dir=SAVE_DIR):
     df.to_csv(daily_file, index=False)
     logger.info(f"Saved daily NAV data to {daily_file}")
     
+    # Record the snapshot in the manifest
+    register_snapshot('nav_data', daily_file, timestamp, fund_date=nav_data.get('fund_date'), directory=save_dir)
+    
     # Master CSV path
     master_file = os.path.join(save_dir, "nav_data_master.csv")
     
@@ -278,29 +267,19 @@ def save_nav_data(nav_data, save_dir=SAVE_DIR):
     master_columns = ['timestamp', 'source', 'fund_date', 'nav']
     master_df = df[master_columns]
     
-    # Append to master file if it exists, otherwise create it
-    if os.path.exists(master_file):
-        try:
-            existing_df = pd.read_csv(master_file)
-            
-            # Check if this timestamp already exists in the master file
-            if timestamp in existing_df['timestamp'].values:
-                # Remove the existing entry with this timestamp
-                existing_df = existing_df[existing_df['timestamp'] != timestamp]
-                
-            # Append new data
-            combined_df = pd.concat([existing_df, master_df], ignore_index=True)
-            combined_df.to_csv(master_file, index=False)
-            logger.info(f"Updated master NAV data file {master_file}")
-        except Exception as e:
-            logger.error(f"Error updating master CSV: {str(e)}")
-            # If error, just write new file
-            master_df.to_csv(master_file, index=False)
-            logger.info(f"Created new master NAV data file {master_file}")
-    else:
-        # Create new master file
-        master_df.to_csv(master_file, index=False)
-        logger.info(f"Created new master NAV data file {master_file}")
+    # Append to master file (re-runs with the same timestamp replace their row)
+    try:
+        append_to_master(master_df, master_file, key_column='timestamp')
+        logger.info(f"Updated master NAV data file {master_file}")
+    except Exception as e:
+        logger.error(f"Error updating master CSV: {str(e)}")
+        raise InvalidDataError(f"Failed to write to master CSV '{master_file}': {str(e)}") from e
+    
+    # Columnar history store (secondary copy, never fails the run)
+    try:
+        columnar_store.write_partition('nav_data', df, save_dir)
+    except Exception as e:
+        logger.warning(f"Could not write NAV data to columnar store: {str(e)}")
     
     return daily_file, master_file
 
@@ -0,0 +1,247 @@
+"""
+Learned Yahoo ticker-format routing for VIX futures lookups.
+
+Yahoo lists the same contract under several symbols (dated ^VIXmm.yyyy,
+^VFTWn, ^VXINDn, VX=F) and which of them returns data changes over time.
+Instead of rediscovering it on every lookup, each attempt is recorded in a
+routing table keyed by contract and position (data/ticker_routes.json):
+
+    "VXF26:1": {"^VFTW1": {"hits": 11.6, "misses": 0.4, "latency": 0.42,
+                           "streak": 0, "last_hit": "...", "last_miss": "..."}}
+
+Hit and miss counts decay with a half-life of HALF_LIFE_DAYS, so old evidence
+fades; INVALIDATE_AFTER consecutive misses drop a route entirely. order()
+puts the best-known format first, and routed_lookup() asks only that one
+until it is overdue (a few times its usual latency) before hedging with the
+alternatives. A contract seen for the first time uses the routes learned for
+its position. record() only updates the table in memory; flush() writes it
+once per lookup (and at exit for attempts still running then).
+"""
+import os
+import json
+import atexit
+import time
+import logging
+import threading
+from datetime import datetime
+import pandas as pd
+from common import SAVE_DIR
+from price_utils import hedged_lookup
+
+logger = logging.getLogger('ticker_routing')
+
+ROUTES_PATH = os.path.join(SAVE_DIR, "ticker_routes.json")
+
+# Days for hit/miss evidence to lose half its weight
+HALF_LIFE_DAYS = 7
+
+# Consecutive misses after which a learned route is forgotten
+INVALIDATE_AFTER = 3
+
+# Success rate from which a route is trusted to be tried alone first
+CONFIDENT_SCORE = 0.75
+
+# Seconds before the alternatives are started: usual latency times HEDGE_FACTOR, within these bounds
+HEDGE_FACTOR = 3
+MIN_HEDGE_DELAY = 1.0
+MAX_HEDGE_DELAY = 10.0
+
+# Weight of the newest sample in the latency average
+LATENCY_WEIGHT = 0.3
+
+_routes = None
+_lock = threading.Lock()
+
+# Table file with updates not written yet
+_dirty_path = None
+
+def route_key(contract_code, position=None):
+    """Routing key of a contract at a position ('VXF26:1'); '*:1' is the position-wide key."""
+    return f"{contract_code or '*'}:{position if position is not None else '*'}"
+
+def _position_key(key):
+    return f"*:{key.split(':', 1)[1]}"
+
+def _load(path=ROUTES_PATH):
+    global _routes
+    if _routes is None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                _routes = json.load(f)['routes']
+        except (OSError, ValueError, KeyError):
+            _routes = {}
+    return _routes
+
+def _save(path=ROUTES_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump({'half_life_days': HALF_LIFE_DAYS, 'routes': _routes}, f, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+
+def _decay(stats, now):
+    """Decay the counts of a route to now."""
+    updated = stats.get('updated', now)
+    factor = 0.5 ** (max(0.0, now - updated) / (HALF_LIFE_DAYS * 86400))
+    stats['hits'] = round(stats.get('hits', 0.0) * factor, 4)
+    stats['misses'] = round(stats.get('misses', 0.0) * factor, 4)
+    stats['updated'] = now
+
+def score(stats, now=None):
+    """Decayed success rate of a route (0.5 with no evidence)."""
+    if not stats:
+        return 0.5
+    stats = dict(stats)
+    _decay(stats, now if now is not None else time.time())
+    return (stats['hits'] + 1) / (stats['hits'] + stats['misses'] + 2)
+
+def _update(key, ticker, ok, seconds, now):
+    stats = _routes.setdefault(key, {}).get(ticker, {})
+    _decay(stats, now)
+    stamp = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
+    if ok:
+        stats['hits'] += 1
+        stats['streak'] = 0
+        stats['last_hit'] = stamp
+        if seconds is not None:
+            previous = stats.get('latency')
+            stats['latency'] = round(seconds if previous is None
+                                     else LATENCY_WEIGHT * seconds + (1 - LATENCY_WEIGHT) * previous, 3)
+    else:
+        stats['misses'] += 1
+        stats['streak'] = stats.get('streak', 0) + 1
+        stats['last_miss'] = stamp
+        if stats['streak'] >= INVALIDATE_AFTER:
+            logger.info(f"Route {key} -> {ticker} missed {stats['streak']} times in a row, forgetting it")
+            _routes[key].pop(ticker, None)
+            return
+    _routes[key][ticker] = stats
+
+def record(key, ticker, ok, seconds=None, path=ROUTES_PATH):
+    """
+    Record one lookup attempt (also under the position-wide key); written by flush().
+
+    Args:
+        key (str): Routing key (see route_key)
+        ticker (str): Yahoo ticker that was tried
+        ok (bool): Whether it returned a valid price
+        seconds (float): Time the attempt took
+        path (str): Routing table file
+    """
+    global _dirty_path
+    now = time.time()
+    with _lock:
+        _load(path)
+        _update(key, ticker, ok, seconds, now)
+        position_key = _position_key(key)
+        if position_key != key:
+            _update(position_key, ticker, ok, seconds, now)
+        _dirty_path = path
+
+def flush():
+    """Write the routing table if attempts were recorded since the last write."""
+    global _dirty_path
+    with _lock:
+        if _dirty_path is not None and _routes is not None:
+            _save(_dirty_path)
+        _dirty_path = None
+
+atexit.register(flush)
+
+def _routes_for(key):
+    """Learned routes of a key, else those of its position."""
+    return _routes.get(key) or _routes.get(_position_key(key)) or {}
+
+def order(key, tickers, path=ROUTES_PATH):
+    """
+    Order candidate tickers best-known first.
+
+    Formats are ranked by learned success rate (untried ones count as 0.5),
+    then by latency; ties keep the given order, which is the default priority.
+
+    Returns:
+        list: The tickers, reordered
+    """
+    now = time.time()
+    with _lock:
+        _load(path)
+        routes = _routes_for(key)
+        ranked = {ticker: (score(routes.get(ticker), now), (routes.get(ticker) or {}).get('latency') or 0.0)
+                  for ticker in tickers}
+    return sorted(tickers, key=lambda ticker: (-ranked[ticker][0], ranked[ticker][1], tickers.index(ticker)))
+
+def hedge_delay(key, ticker, path=ROUTES_PATH):
+    """
+    Seconds to give a trusted route alone before starting the alternatives.
+
+    Returns:
+        float: Delay, or None if the route isn't trusted (start everything at once)
+    """
+    with _lock:
+        _load(path)
+        stats = _routes_for(key).get(ticker)
+    if not stats or score(stats) < CONFIDENT_SCORE:
+        return None
+    latency = stats.get('latency') or MIN_HEDGE_DELAY
+    return min(MAX_HEDGE_DELAY, max(MIN_HEDGE_DELAY, HEDGE_FACTOR * latency))
+
+def routed_lookup(key, tickers, lookup, timeout=None, logger=None, path=ROUTES_PATH):
+    """
+    hedged_lookup over the candidates in learned order, recording every attempt.
+
+    Args:
+        key (str): Routing key (see route_key)
+        tickers (list): Candidate tickers in default priority order
+        lookup: Callable ticker -> (price, timestamp), as for hedged_lookup
+        timeout (float): Overall seconds to wait
+        logger: Optional logger instance for logging
+        path (str): Routing table file
+
+    Returns:
+        tuple: (price, timestamp, winning ticker, seconds taken), as hedged_lookup
+    """
+    ordered = order(key, list(tickers), path)
+    delay = hedge_delay(key, ordered[0], path) if ordered else None
+
+    def attempt(ticker):
+        start = time.time()
+        try:
+            price, timestamp = lookup(ticker)
+        except Exception:
+            record(key, ticker, False, path=path)
+            raise
+        ok = price is not None and not pd.isna(price) and price > 0
+        record(key, ticker, ok, time.time() - start, path)
+        return price, timestamp
+
+    try:
+        return hedged_lookup(ordered, attempt, timeout=timeout, hedge_after=delay, logger=logger)
+    finally:
+        flush()
+
+def reset():
+    """Drop the in-process table (reloaded from disk on next use)."""
+    global _routes, _dirty_path
+    with _lock:
+        _routes = None
+        _dirty_path = None
+
+if __name__ == "__main__":
+    import argparse
+    from common import setup_logging
+    logger = setup_logging('ticker_routing')
+
+    parser = argparse.ArgumentParser(description="Learned Yahoo ticker routes")
+    parser.add_argument("--path", default=ROUTES_PATH, help="Routing table file")
+    args = parser.parse_args()
+
+    routes = _load(args.path)
+    if not routes:
+        print(f"❌ No routes learned yet in {args.path}")
+        exit(1)
+    for key in sorted(routes):
+        for ticker in order(key, list(routes[key]), args.path):
+            stats = routes[key][ticker]
+            print(f"{key:<10} {ticker:<14} score {score(stats):.2f}  latency {stats.get('latency')}s  "
+                  f"last hit {stats.get('last_hit', '-')}")
+    print(f"✅ {sum(len(tickers) for tickers in routes.values())} routes for {len(routes)} keys")
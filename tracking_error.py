@@ -0,0 +1,266 @@
+"""
+Tracking error of the estimated NAV against the published NAV.
+
+Reads estimated_navs_history.csv (see nav_history), where each estimate is
+already aligned with the published NAV of its date, and computes the daily
+error per USDJPY rate label x price source. Rolling mean, standard deviation
+and max absolute error over the last WINDOW days are maintained
+incrementally: the persisted state holds the window, running sums and a
+monotonic deque for the maximum, so each new day is an O(1) update.
+
+Daily errors and rolling statistics are appended to tracking_error.csv and a
+short summary is printed for the morning check.
+"""
+import os
+import json
+import math
+import argparse
+import traceback
+from collections import deque
+import pandas as pd
+from common import setup_logging, SAVE_DIR, MissingCriticalDataError, InvalidDataError, append_to_master, \
+    write_master, read_master_keys
+from nav_history import HISTORY_FILE
+
+# Set up logging
+logger = setup_logging('tracking_error')
+
+ERRORS_FILE = "tracking_error.csv"
+STATE_FILE = "tracking_error_state.json"
+
+# Columns identifying one error series (USDJPY rate label x price source)
+SERIES_COLUMNS = ['usdjpy_rate_type', 'price_source']
+
+# Rolling window in observation days
+WINDOW = 20
+
+# Relative error (in %) above which the morning summary flags an estimate
+ALERT_THRESHOLD_PCT = 1.0
+
+def _new_stats(window):
+    return {'window': window, 'count': 0, 'values': deque(), 'sum': 0.0, 'sum_sq': 0.0, 'max_abs': deque()}
+
+def _push(stats, value):
+    """Add one observation to the rolling window (amortized O(1))."""
+    index = stats['count']
+    stats['count'] += 1
+    stats['values'].append(value)
+    stats['sum'] += value
+    stats['sum_sq'] += value * value
+
+    # Monotonic deque of (index, |value|): front is the window maximum
+    max_abs = stats['max_abs']
+    while max_abs and max_abs[-1][1] <= abs(value):
+        max_abs.pop()
+    max_abs.append((index, abs(value)))
+
+    if len(stats['values']) > stats['window']:
+        dropped = stats['values'].popleft()
+        stats['sum'] -= dropped
+        stats['sum_sq'] -= dropped * dropped
+    while max_abs[0][0] <= index - stats['window']:
+        max_abs.popleft()
+
+def _pop_last(stats):
+    """Remove the newest observation (a re-computed day replaces it)."""
+    values = list(stats['values'])[:-1]
+    first_index = stats['count'] - len(stats['values'])
+    stats.update(_new_stats(stats['window']))
+    stats['count'] = first_index
+    for value in values:
+        _push(stats, value)
+
+def _summary(stats):
+    """Rolling mean, sample standard deviation and max absolute value of the window."""
+    n = len(stats['values'])
+    if n == 0:
+        return None, None, None
+    mean = stats['sum'] / n
+    std = None
+    if n > 1:
+        variance = max(stats['sum_sq'] - n * mean * mean, 0.0) / (n - 1)
+        std = math.sqrt(variance)
+    return mean, std, stats['max_abs'][0][1]
+
+def _stats_to_dict(stats):
+    return {'window': stats['window'], 'count': stats['count'], 'values': list(stats['values'])}
+
+def _stats_from_dict(data, window):
+    stats = _new_stats(window)
+    values = data['values'][-window:]
+    stats['count'] = data['count'] - len(values)
+    for value in values:
+        _push(stats, value)
+    return stats
+
+def load_state(save_dir=SAVE_DIR, window=WINDOW):
+    """
+    Load the persisted rolling state.
+
+    Returns:
+        dict: key ("label|source") -> {'last_date', 'last_error_pct', 'stats'}
+    """
+    path = os.path.join(save_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get('window') != window:
+        logger.info(f"Rolling window changed ({data.get('window')} -> {window}), rebuilding state")
+        return {}
+    return {key: {'last_date': entry['last_date'], 'last_error_pct': entry['last_error_pct'],
+                  'stats': _stats_from_dict(entry['stats'], window)}
+            for key, entry in data['series'].items()}
+
+def save_state(state, save_dir=SAVE_DIR, window=WINDOW):
+    """Atomically persist the rolling state."""
+    path = os.path.join(save_dir, STATE_FILE)
+    data = {
+        'window': window,
+        'series': {key: {'last_date': entry['last_date'], 'last_error_pct': entry['last_error_pct'],
+                         'stats': _stats_to_dict(entry['stats'])}
+                   for key, entry in state.items()}
+    }
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(temp_path, path)
+
+def daily_errors(history):
+    """
+    Compute the daily estimate error wherever a published NAV is available.
+
+    Returns:
+        pandas.DataFrame: nav_date, usdjpy_rate_type, price_source, estimated_nav_per_share,
+                          published_nav, error, error_pct (sorted by date)
+    """
+    rows = history.dropna(subset=['published_nav', 'estimated_nav_per_share'])
+    rows = rows[rows['published_nav'] > 0]
+    errors = rows[['nav_date', 'usdjpy_rate_type', 'price_source',
+                   'estimated_nav_per_share', 'published_nav']].copy()
+    errors['error'] = errors['estimated_nav_per_share'] - errors['published_nav']
+    errors['error_pct'] = errors['error'] / errors['published_nav'] * 100
+    return errors.sort_values(['nav_date', 'usdjpy_rate_type', 'price_source'], kind='stable')
+
+def merge_rows(stored, new_rows):
+    """
+    Merge error rows into the stored ones, replacing only the same (nav_date, label, source).
+
+    Returns:
+        pandas.DataFrame: The merged rows, sorted by date and series
+    """
+    keys = ['nav_date'] + SERIES_COLUMNS
+    new_keys = pd.MultiIndex.from_frame(new_rows[keys].astype(str))
+    kept = stored[~pd.MultiIndex.from_frame(stored[keys].astype(str)).isin(new_keys)]
+    merged = pd.concat([kept, new_rows], ignore_index=True)
+    return merged.sort_values(keys, kind='stable').reset_index(drop=True)
+
+def update(save_dir=SAVE_DIR, window=WINDOW, rebuild=False):
+    """
+    Fold the days not yet seen into the rolling statistics and append them to the error file.
+
+    Args:
+        save_dir (str): Data directory
+        window (int): Rolling window in observation days
+        rebuild (bool): Discard the state and recompute from the full history
+
+    Returns:
+        tuple: (state dict, DataFrame of the rows written)
+    """
+    history_path = os.path.join(save_dir, HISTORY_FILE)
+    if not os.path.exists(history_path):
+        raise MissingCriticalDataError(f"Estimated NAV history not found: {history_path} (run nav_history.py)")
+
+    errors = daily_errors(pd.read_csv(history_path))
+    if errors.empty:
+        raise InvalidDataError("No estimate in the history has a published NAV to compare against.")
+
+    state = {} if rebuild else load_state(save_dir, window)
+
+    written = []
+    # Unchanged observations of the latest day, re-emitted if that day's block is rewritten
+    carried = []
+    for row in errors.itertuples(index=False):
+        key = f"{row.usdjpy_rate_type}|{row.price_source}"
+        entry = state.setdefault(key, {'last_date': None, 'last_error_pct': None, 'stats': _new_stats(window)})
+
+        if entry['last_date'] is not None and row.nav_date < entry['last_date']:
+            continue
+        target = written
+        if row.nav_date == entry['last_date']:
+            if row.error_pct == entry['last_error_pct']:
+                target = carried
+            else:
+                # The latest day was re-estimated: replace its observation
+                _pop_last(entry['stats'])
+
+        if target is written:
+            _push(entry['stats'], row.error_pct)
+            entry['last_date'] = row.nav_date
+            entry['last_error_pct'] = row.error_pct
+
+        mean, std, max_abs = _summary(entry['stats'])
+        target.append(dict(row._asdict(), rolling_mean_pct=mean, rolling_std_pct=std,
+                           rolling_max_abs_pct=max_abs, window_days=len(entry['stats']['values'])))
+
+    written_dates = {row['nav_date'] for row in written}
+    written_df = pd.DataFrame(written + [row for row in carried if row['nav_date'] in written_dates])
+
+    errors_path = os.path.join(save_dir, ERRORS_FILE)
+    if rebuild or not os.path.exists(errors_path) or not read_master_keys(errors_path, 'nav_date'):
+        if not written_df.empty:
+            write_master(written_df, errors_path, key_column='nav_date')
+    elif not written_df.empty:
+        stored_dates = read_master_keys(errors_path, 'nav_date')
+        if min(written_dates) > max(stored_dates):
+            # Only new days: one appended block per day
+            for nav_date, date_rows in written_df.groupby('nav_date', sort=True):
+                append_to_master(date_rows.sort_values(SERIES_COLUMNS, kind='stable'), errors_path,
+                                 key_column='nav_date')
+        else:
+            # Days already stored (a re-estimated latest day, or a new series backfilled into
+            # older days): merge row by row so the other series of those days are kept
+            write_master(merge_rows(pd.read_csv(errors_path), written_df), errors_path, key_column='nav_date')
+
+    save_state(state, save_dir, window)
+    logger.info(f"Tracking error updated: {len(written)} new observations across {len(state)} series")
+    return state, written_df
+
+def morning_summary(state, threshold_pct=ALERT_THRESHOLD_PCT):
+    """
+    Build the compact per-series summary of the latest error and rolling statistics.
+
+    Returns:
+        str: One line per FX label x price source, flagged when the latest error
+             exceeds the threshold or 3 rolling standard deviations
+    """
+    lines = [f"{'series':<22} {'date':<10} {'err%':>8} {'mean%':>8} {'std%':>8} {'maxabs%':>8}  status"]
+    for key in sorted(state):
+        entry = state[key]
+        mean, std, max_abs = _summary(entry['stats'])
+        latest = entry['last_error_pct']
+        flagged = abs(latest) > threshold_pct or (std and abs(latest - mean) > 3 * std)
+        fmt = lambda value: f"{value:8.3f}" if value is not None else f"{'-':>8}"
+        lines.append(f"{key:<22} {entry['last_date']:<10} {fmt(latest)} {fmt(mean)} {fmt(std)} {fmt(max_abs)}  "
+                     f"{'CHECK' if flagged else 'ok'}")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimated vs published NAV tracking error")
+    parser.add_argument("--window", type=int, default=WINDOW, help="Rolling window in days")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute from the full history")
+    parser.add_argument("--threshold", type=float, default=ALERT_THRESHOLD_PCT, help="Alert threshold in %%")
+    args = parser.parse_args()
+
+    try:
+        state, written = update(window=args.window, rebuild=args.rebuild)
+        print(morning_summary(state, args.threshold))
+        print(f"✅ Tracking error updated with {len(written)} new observations")
+    except (MissingCriticalDataError, InvalidDataError) as e:
+        print(f"❌ Tracking error update failed: {e}")
+        logger.error(traceback.format_exc())
+        exit(1)
+    except Exception as e:
+        print(f"❌ Unexpected error during tracking error update: {e}")
+        logger.error(traceback.format_exc())
+        exit(1)
@@ -0,0 +1,245 @@
+"""
+VIX futures expiry calendar.
+
+A VIX future settles on the Wednesday 30 days before the third Friday of the
+following month (the standard SPX option expiration). If that Friday is an
+exchange holiday, the 30 days are counted from the business day before it;
+if the Wednesday itself is a holiday, settlement moves to the business day
+before it. Trading in the expiring contract ends on the morning of the
+settlement date.
+
+The calendar is computed once for CALENDAR_START..CALENDAR_END and held as
+a DataFrame plus a dict keyed by (year, month) and a sorted array of
+settlement dates, so:
+
+- expiry lookups are dict hits,
+- the contract at a position on a date is one searchsorted away,
+- whole date columns are mapped with a single vectorized searchsorted.
+
+Positions follow the roll: on a settlement date the expiring contract has
+already settled, so position 1 is the next contract.
+"""
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import vix_contracts
+
+CALENDAR_START = 2010
+CALENDAR_END = datetime.now().year + 10
+
+# Monthly contracts listed at any time (a new month is listed when one settles)
+LISTED_CONTRACTS = 9
+
+def _easter(year):
+    """Gregorian Easter Sunday (anonymous Gregorian algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th (1-based) weekday of a month; n=-1 for the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _observed(day):
+    """Weekend holidays are observed on the adjacent Friday/Monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+@lru_cache(maxsize=None)
+def exchange_holidays(year):
+    """US exchange (CBOE/NYSE) full-day holidays of a year."""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),            # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),            # Presidents' Day
+        _easter(year) - timedelta(days=2),      # Good Friday
+        _nth_weekday(year, 5, 0, -1),           # Memorial Day
+        _observed(date(year, 7, 4)),            # Independence Day
+        _nth_weekday(year, 9, 0, 1),            # Labor Day
+        _nth_weekday(year, 11, 3, 4),           # Thanksgiving
+        _observed(date(year, 12, 25)),          # Christmas
+    }
+    # New Year's Day falling on a Saturday is not observed on the previous Friday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays)
+
+def is_business_day(day):
+    return day.weekday() < 5 and day not in exchange_holidays(day.year)
+
+def previous_business_day(day):
+    day -= timedelta(days=1)
+    while not is_business_day(day):
+        day -= timedelta(days=1)
+    return day
+
+def next_business_day(day):
+    day += timedelta(days=1)
+    while not is_business_day(day):
+        day += timedelta(days=1)
+    return day
+
+def settlement_date(year, month):
+    """Final settlement date of the VIX future of a contract month."""
+    spx_year, spx_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    spx_expiry = _nth_weekday(spx_year, spx_month, 4, 3)
+    if not is_business_day(spx_expiry):
+        spx_expiry = previous_business_day(spx_expiry)
+    settlement = spx_expiry - timedelta(days=30)
+    if not is_business_day(settlement):
+        settlement = previous_business_day(settlement)
+    return settlement
+
+@lru_cache(maxsize=None)
+def calendar():
+    """
+    The precomputed calendar.
+
+    Returns:
+        pandas.DataFrame: One row per contract month, ordered by settlement: contract (VIXContract),
+                          code, year, month, first_trading_day, last_trading_day, settlement_date
+    """
+    rows = []
+    for year in range(CALENDAR_START, CALENDAR_END + 1):
+        for month in range(1, 13):
+            rows.append({
+                'contract': vix_contracts.contract(month, year),
+                'code': vix_contracts.contract(month, year).code,
+                'year': year,
+                'month': month,
+                'settlement_date': settlement_date(year, month)
+            })
+    table = pd.DataFrame(rows)
+    settlements = table['settlement_date'].tolist()
+    # A month is listed the business day after the contract LISTED_CONTRACTS months earlier settles
+    table['first_trading_day'] = [
+        next_business_day(settlements[i - LISTED_CONTRACTS]) if i >= LISTED_CONTRACTS else None
+        for i in range(len(table))
+    ]
+    table['last_trading_day'] = table['settlement_date']
+    return table[['contract', 'code', 'year', 'month', 'first_trading_day', 'last_trading_day', 'settlement_date']]
+
+@lru_cache(maxsize=None)
+def _index():
+    table = calendar()
+    by_month = {(row.year, row.month): row for row in table.itertuples(index=False)}
+    settlements = pd.to_datetime(table['settlement_date']).values.astype('datetime64[D]')
+    # Absolute month number (year * 12 + month - 1) per row, for vectorized offsets
+    month_numbers = (table['year'] * 12 + table['month'] - 1).to_numpy()
+    return by_month, settlements, table['contract'].tolist(), month_numbers
+
+def _to_day(value):
+    if value is None:
+        return np.datetime64(date.today(), 'D')
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+def contract_info(vix_contract):
+    """Calendar row (first/last trading day, settlement date) of a VIXContract."""
+    return _index()[0].get((vix_contract.year, vix_contract.month))
+
+def front_index(on_date=None):
+    """Calendar row number of the front (position 1) contract on a date."""
+    settlements = _index()[1]
+    return int(np.searchsorted(settlements, _to_day(on_date), side='right'))
+
+def contracts_on(on_date=None, count=3):
+    """
+    The first `count` contracts by position on a date.
+
+    Returns:
+        list: VIXContract, position 1 first
+    """
+    start = front_index(on_date)
+    return _index()[2][start:start + count]
+
+def contract_at(position, on_date=None):
+    """VIXContract at a position (1 = front month) on a date."""
+    if position < 1:
+        raise ValueError(f"Invalid position: {position} (must be >= 1)")
+    return contracts_on(on_date, position)[position - 1]
+
+def position_of(code, on_date=None, max_position=LISTED_CONTRACTS):
+    """
+    Position (1 = front month) of a contract code on a date.
+
+    Args:
+        code (str): Contract code in any format vix_contracts parses (VXM5, VX/M5, ...)
+        on_date: Date (default today)
+        max_position (int): Positions searched
+
+    Returns:
+        int: Position, or None if the contract isn't among the first max_position on that date
+    """
+    parsed = vix_contracts.parse_contract(code)
+    if parsed is None:
+        return None
+    for position, listed in enumerate(contracts_on(on_date, max_position), 1):
+        if listed.code == parsed.code:
+            return position
+    return None
+
+def positions(codes, dates, max_position=LISTED_CONTRACTS):
+    """
+    Vectorized position_of for whole columns.
+
+    Args:
+        codes (pandas.Series): Contract codes
+        dates (pandas.Series): Dates (same index as codes)
+        max_position (int): Positions searched
+
+    Returns:
+        pandas.Series: Nullable Int64 positions indexed like codes
+    """
+    _, settlements, _, month_numbers = _index()
+    days = pd.to_datetime(dates).values.astype('datetime64[D]')
+    front = np.searchsorted(settlements, days, side='right')
+    front_number = np.where(front < len(month_numbers), month_numbers[np.minimum(front, len(month_numbers) - 1)], np.nan)
+    front_year = front_number // 12
+
+    # Codes only carry a year digit: take the first matching year not before the front contract's
+    parsed = vix_contracts.parse_series(codes.astype(str))
+    month = parsed['month'].to_numpy(dtype='float64', na_value=np.nan)
+    year = front_year - front_year % 10 + parsed['year'].to_numpy(dtype='float64', na_value=np.nan) % 10
+    year = np.where(year < front_year, year + 10, year)
+    offset = year * 12 + month - 1 - front_number
+
+    valid = ~np.isnan(offset) & (offset >= 0) & (offset < max_position)
+    return pd.Series(np.where(valid, offset + 1, np.nan), index=codes.index).astype('Int64')
+
+def contracts_at(position, dates):
+    """Vectorized contract_at: contract code at a position for each date of a column."""
+    _, settlements, contracts, _ = _index()
+    days = pd.to_datetime(dates).values.astype('datetime64[D]')
+    rows = np.searchsorted(settlements, days, side='right') + (position - 1)
+    codes = [contracts[i].code if i < len(contracts) else None for i in rows]
+    return pd.Series(codes, index=dates.index)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show the VIX futures contracts by position on a date")
+    parser.add_argument("--date", help="Date (YYYY-MM-DD, default today)")
+    parser.add_argument("--count", type=int, default=LISTED_CONTRACTS, help="Number of positions")
+    args = parser.parse_args()
+
+    for position, listed in enumerate(contracts_on(args.date, args.count), 1):
+        info = contract_info(listed)
+        print(f"{position}: {listed.code} ({listed.year}-{listed.month:02d}) settles {info.settlement_date}")
@@ -0,0 +1,148 @@
+"""
+VIX futures contract symbols.
+
+One compiled grammar recognizes every symbol format the sources use:
+
+    VXH5, VXH25, /VXH5, CBOE:VXH5   standard code (month letter + year)
+    VX/H5, VX09/H5                  CBOE monthly / weekly
+    VIX MAR 25, VIX FUTURE MAR-25   month name + 2-digit year
+    CBOEVIX 2506                    PCF description (YYMM)
+    ^VIX06.2025                     Yahoo Finance
+
+parse_contract() returns an interned VIXContract, so every spelling of a
+contract yields the same object; results are memoized with an LRU cache.
+Single-digit years are resolved to the first matching year not before the
+reference year (the current year unless as_of_year is given, e.g. the fund
+date year in backfills). parse_series() applies the parser to a whole
+pandas Series, parsing each distinct value once.
+"""
+import re
+from collections import namedtuple
+from datetime import datetime
+from functools import lru_cache
+import pandas as pd
+
+# code: normalized code (VXM5); month_code: F..Z; month: 1-12; year: full year
+VIXContract = namedtuple('VIXContract', ['code', 'month_code', 'month', 'year'])
+
+MONTH_CODES = {
+    'F': 1, 'G': 2, 'H': 3, 'J': 4, 'K': 5, 'M': 6,
+    'N': 7, 'Q': 8, 'U': 9, 'V': 10, 'X': 11, 'Z': 12
+}
+MONTH_LETTERS = {month: code for code, month in MONTH_CODES.items()}
+MONTH_NAMES = {
+    'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6,
+    'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12
+}
+
+_LETTER = '[FGHJKMNQUVXZ]'
+_NAME = '|'.join(MONTH_NAMES)
+
+# Alternatives are tried at each position in this order; the leftmost match wins
+CONTRACT_GRAMMAR = re.compile(
+    rf'(?:VX(?P<week>\d{{1,2}})?/(?P<slash_month>{_LETTER})(?P<slash_year>\d{{1,2}}))'  # VX/H5, VX09/H5
+    rf'|(?:CBOEVIX\s*(?P<yymm>\d{{4}}))'                                                # CBOEVIX 2506
+    rf'|(?:\^?VIX(?P<yahoo_month>\d{{2}})\.(?P<yahoo_year>\d{{4}}))'                    # ^VIX06.2025
+    rf'|(?:VIX\s*(?:FUTURES?|FUT)?[\s-]*(?P<name>{_NAME})[^0-9]*(?P<name_year>\d{{2}}))'  # VIX MAR 25
+    rf'|(?:VX(?P<month>{_LETTER})(?P<year>\d{{1,2}})(?!\d))',                           # VXH5, VXH25
+    re.IGNORECASE
+)
+
+# Standard code only (what normalize_code rewrites)
+STANDARD_CODE = re.compile(r'VX([A-Z])(\d{1,2})')
+
+# Interned contracts: (month, year) -> VIXContract
+_contracts = {}
+
+def contract(month, year):
+    """Return the interned contract for a month (1-12) and full year."""
+    key = (month, year)
+    found = _contracts.get(key)
+    if found is None:
+        letter = MONTH_LETTERS[month]
+        found = _contracts.setdefault(key, VIXContract(f"VX{letter}{year % 10}", letter, month, year))
+    return found
+
+def resolve_year(digits, as_of_year):
+    """Expand a 1- or 2-digit contract year to the first matching year not before as_of_year."""
+    if len(digits) == 4:
+        return int(digits)
+    if len(digits) == 2:
+        year = as_of_year // 100 * 100 + int(digits)
+        return year + 100 if year < as_of_year - 50 else year
+    year = as_of_year // 10 * 10 + int(digits)
+    return year + 10 if year < as_of_year else year
+
+@lru_cache(maxsize=4096)
+def _parse(symbol, as_of_year):
+    match = CONTRACT_GRAMMAR.search(symbol)
+    if not match:
+        return None
+    groups = match.groupdict()
+
+    if groups['slash_month']:
+        month, digits = MONTH_CODES[groups['slash_month'].upper()], groups['slash_year']
+    elif groups['yymm']:
+        month, digits = int(groups['yymm'][2:]), groups['yymm'][:2]
+    elif groups['yahoo_month']:
+        month, digits = int(groups['yahoo_month']), groups['yahoo_year']
+    elif groups['name']:
+        month, digits = MONTH_NAMES[groups['name'].upper()], groups['name_year']
+    else:
+        month, digits = MONTH_CODES[groups['month'].upper()], groups['year']
+
+    if not 1 <= month <= 12:
+        return None
+    return contract(month, resolve_year(digits, as_of_year))
+
+def parse_contract(symbol, as_of_year=None):
+    """
+    Parse a VIX futures symbol in any source format.
+
+    Args:
+        symbol (str): Symbol, code or description (e.g. 'VX/H5', 'CBOEVIX 2506', '^VIX06.2025')
+        as_of_year (int): Reference year for single-digit years (default: current year)
+
+    Returns:
+        VIXContract: Interned contract, or None if the text holds no VIX futures symbol
+    """
+    if symbol is None or not isinstance(symbol, str):
+        return None
+    return _parse(symbol, as_of_year or datetime.now().year)
+
+@lru_cache(maxsize=1024)
+def normalize_code(ticker):
+    """Rewrite a standard code with a 2-digit year (VXH25) to the 1-digit form (VXH5); other text is returned unchanged."""
+    match = STANDARD_CODE.fullmatch(ticker)
+    if match:
+        return f"VX{match.group(1)}{match.group(2)[-1]}"
+    return ticker
+
+def yahoo_ticker(vix_contract):
+    """Yahoo Finance ticker of a contract (^VIX06.2025)."""
+    return f"^VIX{vix_contract.month:02d}.{vix_contract.year}"
+
+def parse_series(values, as_of_year=None):
+    """
+    Parse a whole Series of symbols, each distinct value once.
+
+    Args:
+        values (pandas.Series): Symbols in any supported format
+        as_of_year (int): Reference year for single-digit years (default: current year)
+
+    Returns:
+        pandas.DataFrame: code, month_code, month, year per input row (missing where unparsable),
+                          indexed like values
+    """
+    as_of_year = as_of_year or datetime.now().year
+    uniques = pd.unique(values.dropna())
+    parsed = {value: _parse(value, as_of_year) for value in uniques if isinstance(value, str)}
+    rows = [parsed.get(value) if isinstance(value, str) else None for value in values]
+    frame = pd.DataFrame([row if row is not None else (None, None, None, None) for row in rows],
+                         columns=list(VIXContract._fields), index=values.index)
+    return frame.astype({'month': 'Int64', 'year': 'Int64'})
+
+def normalize_series(values):
+    """normalize_code() applied to a Series, each distinct value once."""
+    mapping = {value: normalize_code(value) for value in pd.unique(values.dropna()) if isinstance(value, str)}
+    return values.map(lambda value: mapping.get(value, value))
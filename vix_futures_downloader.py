@@ -3,6 +3,8 @@ import pandas as pd
 import traceback
 import sys
 import logging
+import queue
+import threading
 from datetime import datetime
 import time
 
@@ -10,7 +12,8 @@ import time
 from cboe_vix_downloader import download_vix_futures_from_cboe
 from yahoo_vix_downloader import download_vix_futures_from_yfinance
 from pcf_vix_extractor import extract_vix_futures_from_pcf, find_latest_etf_file
-from common import MissingCriticalDataError, InvalidDataError # Ensure these are imported
+from common import MissingCriticalDataError, InvalidDataError, append_to_master, register_snapshot # Ensure these are imported
+import columnar_store
 
 # Set up logging with more detailed format
 logging.basicConfig(
@@ -27,6 +30,16 @@ logger = logging.getLogger('vix_futures_downloader')
 SAVE_DIR = "data"
 os.makedirs(SAVE_DIR, exist_ok=True)
 
+# Seconds each source may take before it is abandoned as timed out
+SOURCE_TIMEOUTS = {
+    'CBOE': 180,   # Headless Chrome cold start + page render
+    'Yahoo': 60,
+    'PCF': 30      # Local file parse
+}
+
+# Seconds after which the run proceeds with whatever sources have arrived
+OVERALL_DEADLINE = 240
+
 def format_vix_data_for_output(cboe_data, yfinance_data, simplex_data):
     """
     Formats all VIX futures data into a standardized format for output
@@ -184,9 +197,14 @@ def format_vix_data_for_output(cboe_data, yfinance_data, simplex_data):
     
     return df
 
-def save_vix_data(df, save_dir=SAVE_DIR):
+def save_vix_data(df, save_dir=SAVE_DIR, timed_out=None):
     """
     Save the VIX futures data to CSV files
+    
+    Args:
+        df (pandas.DataFrame): Formatted VIX futures data
+        save_dir (str): Data directory
+        timed_out (dict): Sources that missed their deadline (recorded in the manifest)
     """
     if df.empty:
         raise InvalidDataError("Cannot save an empty VIX futures DataFrame.")
@@ -200,70 +218,116 @@ def save_vix_data(df, save_dir=SAVE_DIR):
     # Save daily snapshot
     df.to_csv(csv_path, index=False)
     
+    # Record the snapshot in the manifest
+    price_date = df['price_date'].max() if 'price_date' in df.columns else None
+    register_snapshot('vix_futures', csv_path, timestamp, fund_date=price_date, directory=save_dir,
+                      timed_out=timed_out or {})
+    
     # Master CSV path - always append to this file
     master_csv_path = os.path.join(save_dir, "vix_futures_master.csv")
     
-    # Append to master CSV if it exists, otherwise create it
-    if os.path.exists(master_csv_path):
+    # Append only the new rows; re-runs with the same timestamp replace their rows
+    try:
+        append_to_master(df, master_csv_path, key_column='timestamp')
+    except Exception as e:
+        logger.error(f"Error updating master CSV: {str(e)}") # Keep log for context
+        raise InvalidDataError(f"Failed to write to master CSV '{master_csv_path}': {str(e)}") from e
+    
+    # Columnar history store (secondary copy, never fails the run)
+    try:
+        columnar_store.write_partition('vix_futures', df, save_dir)
+    except Exception as e:
+        logger.warning(f"Could not write VIX futures data to columnar store: {str(e)}")
+    
+    return True
+
+def _fetch_pcf_prices():
+    """Extract VIX futures prices from the latest Simplex PCF file."""
+    logger.info("Attempting to get VIX futures from PCF data")
+    latest_etf_file = find_latest_etf_file() # find_latest_etf_file itself logs errors if no file
+    if not latest_etf_file:
+        logger.warning("No ETF file found for PCF extraction by find_latest_etf_file.")
+        return None
+    return extract_vix_futures_from_pcf(latest_etf_file)
+
+def run_sources(sources, timeouts=None, overall_deadline=OVERALL_DEADLINE):
+    """
+    Run the source downloaders concurrently and collect what arrives before the deadlines.
+    
+    Each source runs in its own daemon thread, so a hung source (e.g. a stuck
+    Chrome session) neither delays the other sources nor blocks interpreter exit.
+    
+    Args:
+        sources (dict): Source name -> callable returning the source's data dict
+        timeouts (dict): Source name -> seconds allowed (default SOURCE_TIMEOUTS)
+        overall_deadline (float): Seconds after which all pending sources are abandoned
+    
+    Returns:
+        tuple: (results dict name -> data or None, timed_out dict name -> seconds waited,
+                durations dict name -> seconds taken by the sources that finished)
+    """
+    timeouts = timeouts or SOURCE_TIMEOUTS
+    start = time.monotonic()
+    finished = queue.Queue()
+    
+    def worker(name, fetch):
+        source_start = time.monotonic()
         try:
-            # Read existing master CSV
-            master_df = pd.read_csv(master_csv_path)
-            
-            # Get current timestamp
-            current_timestamp = df['timestamp'].iloc[0]
-            
-            # Remove data with the same timestamp (to avoid duplicates from the same run)
-            # This is important because re-runs might happen in development/testing
-            master_df = master_df[master_df['timestamp'] != current_timestamp]
-            
-            # Append new data
-            combined_df = pd.concat([master_df, df], ignore_index=True)
-            combined_df.to_csv(master_csv_path, index=False)
+            data, error = fetch(), None
+        except (MissingCriticalDataError, InvalidDataError) as e:
+            data, error = None, e
         except Exception as e:
-            logger.error(f"Error updating master CSV: {str(e)}") # Keep log for context
-            raise InvalidDataError(f"Failed to write to master CSV '{master_csv_path}': {str(e)}") from e
-    else:
-        # Create new master file
+            logger.error(f"Unexpected error from {name}: {str(e)}")
+            logger.error(traceback.format_exc())
+            data, error = None, e
+        finished.put((name, data, error, time.monotonic() - source_start))
+    
+    deadlines = {}
+    for name, fetch in sources.items():
+        deadlines[name] = start + min(timeouts.get(name, overall_deadline), overall_deadline)
+        threading.Thread(target=worker, args=(name, fetch), name=f"vix-source-{name}", daemon=True).start()
+    
+    results = {name: None for name in sources}
+    durations = {}
+    timed_out = {}
+    pending = set(sources)
+    while pending:
+        now = time.monotonic()
+        for name in [name for name in pending if deadlines[name] <= now]:
+            timed_out[name] = round(now - start, 1)
+            pending.discard(name)
+            logger.warning(f"{name}: timed out after {timed_out[name]}s, continuing without it")
+        if not pending:
+            break
+        
+        wait = min(deadlines[name] for name in pending) - now
         try:
-        df.to_csv(master_csv_path, index=False)
-        except Exception as e:
-            logger.error(f"Error creating new master CSV: {str(e)}") # Keep log for context
-            raise InvalidDataError(f"Failed to create new master CSV '{master_csv_path}': {str(e)}") from e
+            name, data, error, elapsed = finished.get(timeout=max(wait, 0))
+        except queue.Empty:
+            continue
+        if name not in pending:
+            continue  # Arrived after its deadline
+        pending.discard(name)
+        durations[name] = round(elapsed, 1)
+        if error is not None:
+            logger.warning(f"Failed to retrieve data from {name}: {error}")
+        else:
+            results[name] = data
+            logger.info(f"{name}: finished in {durations[name]}s")
     
-    return True
+    return results, timed_out, durations
 
 def download_vix_futures():
-    """Download VIX futures data from all sources and combine them"""
+    """Download VIX futures data from all sources concurrently and combine them"""
     overall_start_time = time.time()
-    cboe_data, yfinance_data, simplex_data = None, None, None # Initialize
     
-    # Download from CBOE
-    try:
-        cboe_data = download_vix_futures_from_cboe()
-    except (MissingCriticalDataError, InvalidDataError) as e:
-        logger.warning(f"Failed to retrieve data from CBOE: {e}")
-        cboe_data = None
-    
-    # Download from Yahoo Finance
-    try:
-        yfinance_data = download_vix_futures_from_yfinance()
-    except (MissingCriticalDataError, InvalidDataError) as e:
-        logger.warning(f"Failed to retrieve data from Yahoo Finance: {e}")
-        yfinance_data = None
-    
-    # Try to get PCF data from the ETF files
-    logger.info("Attempting to get VIX futures from PCF data")
-    try:
-        latest_etf_file = find_latest_etf_file() # find_latest_etf_file itself logs errors if no file
-        if latest_etf_file:
-            simplex_data = extract_vix_futures_from_pcf(latest_etf_file)
-        else:
-            # This case might be redundant if find_latest_etf_file raises an error or returns None and that's handled
-            logger.warning("No ETF file found for PCF extraction by find_latest_etf_file.")
-            simplex_data = None
-    except (MissingCriticalDataError, InvalidDataError) as e:
-        logger.warning(f"Failed to retrieve data from Simplex PCF: {e}")
-        simplex_data = None
+    # CBOE (Chrome), Yahoo Finance and the Simplex PCF file run side by side
+    results, timed_out, durations = run_sources({
+        'CBOE': download_vix_futures_from_cboe,
+        'Yahoo': download_vix_futures_from_yfinance,
+        'PCF': _fetch_pcf_prices
+    })
+    cboe_data, yfinance_data, simplex_data = results['CBOE'], results['Yahoo'], results['PCF']
     
     # Log summary of results from each source
     logger.info("=== SOURCE SUMMARY ===")
@@ -285,11 +349,16 @@ def download_vix_futures():
     else:
         logger.info("Simplex ETF: No data retrieved")
     
+    logger.info(f"Source durations: {durations}")
+    if timed_out:
+        logger.warning(f"Timed out sources: {', '.join(f'{name} ({seconds}s)' for name, seconds in timed_out.items())}")
+    
     logger.info("=====================")
     
     # Check if we got data from any source
     if not cboe_data and not yfinance_data and not simplex_data:
-        raise MissingCriticalDataError("Failed to retrieve VIX futures data from all available sources (CBOE, Yahoo, PCF).")
+        raise MissingCriticalDataError("Failed to retrieve VIX futures data from all available sources (CBOE, Yahoo, PCF)"
+                                       + (f"; timed out: {', '.join(timed_out)}" if timed_out else "") + ".")
     
     # Format data into new structure
     df = format_vix_data_for_output(cboe_data, yfinance_data, simplex_data)
@@ -298,26 +367,26 @@ def download_vix_futures():
         raise MissingCriticalDataError("Formatting VIX data resulted in an empty dataset, even though some sources might have provided data.")
     
     # Save the data
-    save_vix_data(df, SAVE_DIR) # This will now raise an error on failure
+    save_vix_data(df, SAVE_DIR, timed_out=timed_out) # This will now raise an error on failure
     
     # Log results (if save_vix_data was successful)
     logger.info(f"Saved VIX futures data with {len(df)} price records")
     logger.info("Data sample:")
-        logger.info(df.head(10).to_string())
-        
-        # Log any duplicate prices for the same future to highlight discrepancies
-        futures = df['vix_future'].unique()
-        for future in futures:
-            future_df = df[df['vix_future'] == future]
-            if len(future_df) > 1:
-                prices = future_df['price'].tolist()
-                max_diff = max(prices) - min(prices)
-                if max_diff > 0.1:  # Threshold for significant difference
-                    logger.warning(f"Price discrepancy for {future}: max diff = {max_diff:.4f}")
-                    logger.warning(future_df[['source', 'symbol', 'price']].to_string())
-        
-        logger.info(f"Total processing time: {time.time() - overall_start_time:.2f}s")
-        return True
+    logger.info(df.head(10).to_string())
+    
+    # Log any duplicate prices for the same future to highlight discrepancies
+    futures = df['vix_future'].unique()
+    for future in futures:
+        future_df = df[df['vix_future'] == future]
+        if len(future_df) > 1:
+            prices = future_df['price'].tolist()
+            max_diff = max(prices) - min(prices)
+            if max_diff > 0.1:  # Threshold for significant difference
+                logger.warning(f"Price discrepancy for {future}: max diff = {max_diff:.4f}")
+                logger.warning(future_df[['source', 'symbol', 'price']].to_string())
+    
+    logger.info(f"Total processing time: {time.time() - overall_start_time:.2f}s")
+    return True
     # Removed else block as save_vix_data now raises error
 
 if __name__ == "__main__":
@@ -4,8 +4,15 @@ import time
 from datetime import datetime, timedelta
 import pandas as pd
 import os
+import json
+import argparse
 import pytz
-from common import setup_logging, SAVE_DIR, format_vix_data, MissingCriticalDataError, InvalidDataError
+import vix_calendar
+import cassette
+import ticker_routing
+from price_utils import get_yahoo_session
+from common import setup_logging, SAVE_DIR, format_vix_data, MissingCriticalDataError, InvalidDataError, \
+    register_snapshot
 import requests # For requests.exceptions.RequestException
 
 # Set up logging
@@ -71,14 +78,70 @@ def determine_yahoo_trading_date(timestamp):
             # Before 5 PM -> current day's session
             return ct_date.strftime("%Y-%m-%d")
 
-def download_vix_futures_from_yfinance():
+# Tickers fetched from Yahoo: the VIX index plus two patterns for the first three futures positions
+YAHOO_INDEX_TICKER = "^VIX"
+YAHOO_FUTURES_PATTERNS = [
+    ['^VFTW1', '^VFTW2', '^VFTW3'],  # Front-month patterns
+    ['^VXIND1', '^VXIND2', '^VXIND3']  # Alternative index patterns
+]
+YAHOO_TICKERS = [YAHOO_INDEX_TICKER] + [ticker for group in YAHOO_FUTURES_PATTERNS for ticker in group]
+
+def fetch_latest_closes(tickers, downloader=None, session=None):
+    """
+    Fetch the latest close of several tickers in one batched Yahoo request.
+    
+    Args:
+        tickers (list): Yahoo tickers
+        downloader: yf.download-compatible callable (default yf.download; see cassette_downloader)
+        session: Session to pass to the downloader (default: pooled session; False for none)
+    
+    Returns:
+        dict: ticker -> (close, timestamp of the close) for tickers that returned data
+    """
+    downloader = downloader or yf.download
+    kwargs = {'period': "1d", 'progress': False, 'group_by': 'ticker'}
+    if session is None:
+        session = get_yahoo_session()
+    if session:
+        kwargs['session'] = session
+    
+    data = downloader(list(tickers), **kwargs)
+    
+    closes = {}
+    if data is None or data.empty:
+        return closes
+    
+    # Split the (ticker, field) column index back into one series per ticker
+    for ticker in tickers:
+        if isinstance(data.columns, pd.MultiIndex):
+            if ticker not in data.columns.get_level_values(0):
+                continue
+            frame = data[ticker]
+        else:
+            frame = data
+        if 'Close' not in frame.columns:
+            continue
+        close = frame['Close'].dropna()
+        if close.empty:
+            continue
+        closes[ticker] = (float(close.iloc[-1]), close.index[-1])
+    
+    return closes
+
+def download_vix_futures_from_yfinance(downloader=None):
     """
     Download VIX futures data from Yahoo Finance
     
+    Args:
+        downloader: yf.download-compatible callable (default yf.download, through the
+                    cassette store when CASSETTE_MODE is record or replay)
+    
     Returns:
         dict: Dictionary with VIX futures prices
     """
     start_time = time.time()
+    if downloader is None and cassette.mode() != 'live':
+        downloader = cassette_downloader()
     try:
         logger.info("Downloading VIX futures data from Yahoo Finance...")
         
@@ -89,111 +152,79 @@ def download_vix_futures_from_yfinance():
             'timestamp': current_date.strftime("%Y%m%d%H%M")
         }
         
-        # Track the timestamp of the data we download to determine trading date
-        data_timestamp = None
-        
-        # Get the VIX index price as a fallback for the front month
+        # One batched request for the index and every futures ticker
         try:
-            vix_data = yf.download("^VIX", period="1d", progress=False)
-            if not vix_data.empty and 'Close' in vix_data.columns:
-                # Extract the numeric value properly
-                vix_value = float(vix_data['Close'].iloc[-1])
-                futures_data['VX=F'] = vix_value
-                futures_data['YAHOO:VIX'] = vix_value  # Standardized format
-                logger.info(f"Yahoo: ^VIX = {vix_value}")
-                
-                # Save the timestamp for date validation
-                data_timestamp = vix_data.index[-1]
-                logger.info(f"Yahoo data timestamp: {data_timestamp}")
-            else:
-                logger.warning("Could not download ^VIX data from Yahoo Finance")
-                raise MissingCriticalDataError("Could not download ^VIX index data from Yahoo Finance, which is essential (empty or no 'Close' column).")
+            closes = fetch_latest_closes(YAHOO_TICKERS, downloader)
         except Exception as e:
-            logger.error(f"Error downloading ^VIX: {str(e)}")
+            logger.error(f"Error downloading {YAHOO_TICKERS}: {str(e)}")
             raise MissingCriticalDataError(f"Could not download ^VIX index data from Yahoo Finance due to error: {str(e)}") from e
+        logger.info(f"Yahoo batch returned {len(closes)}/{len(YAHOO_TICKERS)} tickers in {time.time() - start_time:.2f}s")
         
-        # Try different ticker patterns for VIX futures
-        vix_patterns = [
-            ['^VFTW1', '^VFTW2', '^VFTW3'],  # Front-month patterns
-            ['^VXIND1', '^VXIND2', '^VXIND3']  # Alternative index patterns
-        ]
+        # Get the VIX index price as a fallback for the front month
+        if YAHOO_INDEX_TICKER not in closes:
+            logger.warning("Could not download ^VIX data from Yahoo Finance")
+            raise MissingCriticalDataError("Could not download ^VIX index data from Yahoo Finance, which is essential (empty or no 'Close' column).")
         
-        # Map the positions to VIX ticker format
-        month_map = {1: 'F', 2: 'G', 3: 'H', 4: 'J', 5: 'K', 6: 'M', 
-                    7: 'N', 8: 'Q', 9: 'U', 10: 'V', 11: 'X', 12: 'Z'}
-        current_month = current_date.month
-        year_suffix = str(current_date.year)[-1]
+        vix_value, data_timestamp = closes[YAHOO_INDEX_TICKER]
+        futures_data['VX=F'] = vix_value
+        futures_data['YAHOO:VIX'] = vix_value  # Standardized format
+        logger.info(f"Yahoo: ^VIX = {vix_value}")
+        logger.info(f"Yahoo data timestamp: {data_timestamp}")
         
-        # Try to map the positions to actual contract months
-        position_to_contract = {}
-        for i in range(1, 4):
-            month_idx = (current_month + i - 1) % 12 + 1  # 1-indexed month
-            if month_idx <= current_month:
-                next_year_suffix = str(current_date.year + 1)[-1]
-                position_to_contract[i] = f"/VX{month_map[month_idx]}{next_year_suffix}"
-            else:
-                position_to_contract[i] = f"/VX{month_map[month_idx]}{year_suffix}"
+        # Map the positions (1 = front month, rolling at expiry) to actual contract months
+        position_to_contract = {
+            i: f"/{listed.code}" for i, listed in enumerate(vix_calendar.contracts_on(data_timestamp, 3), 1)
+        }
         
         logger.debug(f"Position to contract mapping: {position_to_contract}")
         
         futures_found = False
         
-        # Try each of the ticker patterns
-        for pattern_group in vix_patterns:
-            logger.info(f"Trying ticker pattern group: {pattern_group}")
-            
+        # Walk the ticker patterns in priority order
+        for pattern_group in YAHOO_FUTURES_PATTERNS:
             for i, ticker in enumerate(pattern_group, 1):
-                try:
-                    logger.debug(f"Downloading {ticker} from Yahoo Finance")
-                    data = yf.download(ticker, period="1d", progress=False)
+                if ticker not in closes:
+                    logger.warning(f"No data found for ticker {ticker}")
+                    continue
+                
+                settlement_price = closes[ticker][0]
+                
+                # Map to the corresponding VIX contract ticker format
+                if i in position_to_contract:
+                    # Standard format
+                    contract_ticker = position_to_contract[i]
+                    
+                    # Store with standard format
+                    futures_data[contract_ticker] = settlement_price
                     
-                    if not data.empty and 'Close' in data.columns and len(data['Close']) > 0:
-                        # Extract numeric value properly
-                        settlement_price = float(data['Close'].iloc[-1])
-                        
-                        # Update data timestamp if not already set
-                        if data_timestamp is None:
-                            data_timestamp = data.index[-1]
-                            logger.info(f"Yahoo data timestamp from {ticker}: {data_timestamp}")
-                        
-                        # Map to the corresponding VIX contract ticker format
-                        if i in position_to_contract:
-                            # Standard format
-                            contract_ticker = position_to_contract[i]
-                            # Get the month code and year digit from the standard format
-                            month_code = contract_ticker[3:4]  # Extract 'H' from '/VXH5'
-                            year_digit = contract_ticker[4:5]  # Extract '5' from '/VXH5'
-                            
-                            # Store with standard format
-                            futures_data[contract_ticker] = settlement_price
-                            
-                            # Store with the standardized source prefix
-                            yahoo_ticker = f"YAHOO:VX{month_code}{year_digit}"
-                            futures_data[yahoo_ticker] = settlement_price
-                            
-                            logger.info(f"Yahoo: {ticker} → {yahoo_ticker} = {settlement_price}")
-                            futures_found = True
-                        
-                        # Also store with the original Yahoo ticker without a series structure
-                        futures_data[f"YAHOO:{ticker}"] = settlement_price
-                    else:
-                        logger.warning(f"No data found for ticker {ticker}")
-                except Exception as e:
-                    logger.warning(f"Error downloading {ticker} from Yahoo: {str(e)}")
-                    # No retry attempts - we remove the fallback
+                    # Store with the standardized source prefix
+                    yahoo_ticker = f"YAHOO:{contract_ticker[1:]}"
+                    futures_data[yahoo_ticker] = settlement_price
+                    
+                    logger.info(f"Yahoo: {ticker} → {yahoo_ticker} = {settlement_price}")
+                    futures_found = True
+                
+                # Also store with the original Yahoo ticker without a series structure
+                futures_data[f"YAHOO:{ticker}"] = settlement_price
         
-        # If we have a timestamp, determine the trading date
-        if data_timestamp is not None:
-            try:
-                trading_date = determine_yahoo_trading_date(data_timestamp)
-                logger.info(f"Determined trading date for Yahoo data: {trading_date}")
-                futures_data['date'] = trading_date
-            except InvalidDataError as e: # Catch error from determine_yahoo_trading_date
-                logger.error(f"Failed to determine trading date: {str(e)}")
-                raise MissingCriticalDataError(f"Failed to determine Yahoo trading date: {str(e)}") from e
-        else:
-            # We need a valid trading date
-            raise MissingCriticalDataError("No valid data timestamp obtained from Yahoo Finance to determine trading date.")
+        # Share which formats answered with the routing table used by the tracker
+        # (without latencies: one batched request says nothing about each format's own response time)
+        if cassette.mode() != 'replay':
+            for pattern_group in YAHOO_FUTURES_PATTERNS:
+                for i, ticker in enumerate(pattern_group, 1):
+                    if i in position_to_contract:
+                        key = ticker_routing.route_key(position_to_contract[i][1:], i)
+                        ticker_routing.record(key, ticker, ticker in closes)
+            ticker_routing.flush()
+        
+        # Determine the trading date from the data timestamp
+        try:
+            trading_date = determine_yahoo_trading_date(data_timestamp)
+            logger.info(f"Determined trading date for Yahoo data: {trading_date}")
+            futures_data['date'] = trading_date
+        except InvalidDataError as e: # Catch error from determine_yahoo_trading_date
+            logger.error(f"Failed to determine trading date: {str(e)}")
+            raise MissingCriticalDataError(f"Failed to determine Yahoo trading date: {str(e)}") from e
         
         if not futures_found:
             raise MissingCriticalDataError("No VIX futures contracts (e.g., ^VFTW1) were successfully retrieved from Yahoo Finance.")
@@ -209,6 +240,97 @@ def download_vix_futures_from_yfinance():
         logger.error(traceback.format_exc())
         raise MissingCriticalDataError(f"An unexpected error occurred with Yahoo Finance VIX downloader: {str(e)}") from e
 
+def to_recording(data):
+    """Serialize a batched yf.download result to the JSON recording format."""
+    recording = {}
+    if data is not None and not data.empty and isinstance(data.columns, pd.MultiIndex):
+        for ticker in data.columns.get_level_values(0).unique():
+            frame = data[ticker]
+            recording[ticker] = {
+                'index': [ts.isoformat() for ts in frame.index],
+                'columns': {col: [None if pd.isna(v) else float(v) for v in frame[col]] for col in frame.columns}
+            }
+    return {'tickers': recording}
+
+def frames_from_recording(recording):
+    """Per-ticker DataFrames of a recording."""
+    frames = {}
+    for ticker, data in recording['tickers'].items():
+        index = pd.DatetimeIndex(pd.to_datetime(data['index']))
+        frames[ticker] = pd.DataFrame(data['columns'], index=index)
+    return frames
+
+def _serve(frames, tickers):
+    tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+    available = {ticker: frames[ticker] for ticker in tickers if ticker in frames}
+    if not available:
+        return pd.DataFrame()
+    return pd.concat(available, axis=1)
+
+def parse_recording(content, tickers=YAHOO_TICKERS):
+    """Latest closes from a JSON recording (the parse stage of a replayed run)."""
+    frames = frames_from_recording(json.loads(content))
+    return fetch_latest_closes(tickers, downloader=lambda requested, **kwargs: _serve(frames, requested), session=False)
+
+def cassette_downloader(downloader=None, latency=0.0):
+    """
+    Wrap yf.download in the cassette store (CASSETTE_MODE): batched responses are
+    saved in record mode and served without calling Yahoo in replay mode.
+    
+    A replayed request for tickers that weren't recorded together is served
+    from the recording of the full YAHOO_TICKERS batch, and each replayed call
+    sleeps `latency` seconds to model one HTTP round trip, so sequential and
+    batched fetching can be compared offline.
+    
+    Args:
+        downloader: Downloader to wrap (default yf.download)
+        latency (float): Simulated round-trip time per replayed call in seconds
+    """
+    downloader = downloader or yf.download
+    
+    def download(tickers, **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        key = ",".join(sorted(tickers))
+        if cassette.mode() == 'replay':
+            time.sleep(latency)
+            try:
+                content = cassette.load('yahoo', key)[0]
+            except MissingCriticalDataError:
+                if not set(tickers) <= set(YAHOO_TICKERS):
+                    raise
+                content = cassette.load('yahoo', ",".join(sorted(YAHOO_TICKERS)))[0]
+        else:
+            content = cassette.through('yahoo', key, lambda: json.dumps(to_recording(downloader(tickers, **kwargs))))
+        return _serve(frames_from_recording(json.loads(content)), tickers)
+    
+    return download
+
+def benchmark_batching(downloader, tickers=YAHOO_TICKERS, rounds=3):
+    """
+    Compare one request per ticker (the old behavior) with a single batched request.
+    
+    Returns:
+        dict: Best-of-rounds seconds for 'sequential' and 'batched', and the 'speedup'
+    """
+    def run_sequential():
+        for ticker in tickers:
+            fetch_latest_closes([ticker], downloader, session=False)
+    
+    def run_batched():
+        fetch_latest_closes(tickers, downloader, session=False)
+    
+    timings = {}
+    for name, run in (('sequential', run_sequential), ('batched', run_batched)):
+        best = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+    timings['speedup'] = timings['sequential'] / timings['batched'] if timings['batched'] else None
+    return timings
+
 def save_yahoo_data(futures_data, save_dir=SAVE_DIR):
     """Save Yahoo futures data as CSV"""
     if not futures_data or len(futures_data) <= 2: # Check if only contains timestamp/date
@@ -229,6 +351,10 @@ def save_yahoo_data(futures_data, save_dir=SAVE_DIR):
         df.to_csv(csv_path, index=False)
         logger.info(f"Saved Yahoo futures data to {csv_path}")
         
+        # Record the snapshot in the manifest
+        register_snapshot('vix_futures_yahoo', csv_path, timestamp,
+                          fund_date=futures_data.get('date'), directory=save_dir)
+        
         return csv_path
     
     except Exception as e:
@@ -237,9 +363,32 @@ def save_yahoo_data(futures_data, save_dir=SAVE_DIR):
         return None
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download VIX futures prices from Yahoo Finance")
+    parser.add_argument("--record", metavar="DIR", help="Save the batched Yahoo response to the cassette store DIR")
+    parser.add_argument("--replay", metavar="DIR", help="Serve Yahoo responses from the cassette store DIR (offline)")
+    parser.add_argument("--benchmark", action="store_true", help="Compare sequential and batched fetching (needs --replay)")
+    parser.add_argument("--latency", type=float, default=0.3, help="Simulated round trip in seconds for --replay")
+    args = parser.parse_args()
+    
+    # Shorthands for CASSETTE_MODE/CASSETTE_DIR (see cassette.py)
+    downloader = None
+    if args.replay or args.record:
+        os.environ[cassette.MODE_ENV] = 'replay' if args.replay else 'record'
+        os.environ[cassette.DIR_ENV] = args.replay or args.record
+        downloader = cassette_downloader(latency=args.latency if args.replay else 0.0)
+    
+    if args.benchmark:
+        if not args.replay:
+            print("❌ --benchmark needs a recording (--replay PATH)")
+            exit(1)
+        timings = benchmark_batching(downloader)
+        print(f"✅ {len(YAHOO_TICKERS)} tickers: sequential {timings['sequential']:.3f}s, "
+              f"batched {timings['batched']:.3f}s ({timings['speedup']:.1f}x)")
+        exit(0)
+    
     try:
         # Download VIX futures from Yahoo Finance
-        yahoo_data = download_vix_futures_from_yfinance()
+        yahoo_data = download_vix_futures_from_yfinance(downloader)
         
         # Save to CSV if data was found (should be true if no exception)
         if yahoo_data: